@@ -4,123 +4,206 @@ import threading
 import time
 import pickle
 import shutil
-import sqlite3
 import hashlib
-import re
 from tkinter import *
 from tkinter import ttk, messagebox, filedialog, Menu, simpledialog
 from tkinter.font import Font
-from PIL import Image, ImageTk
-import fitz  # PyMuPDF
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from multiprocessing import Pool, cpu_count
-from collections import defaultdict
-try:
-    from pybloom_live import ScalableBloomFilter
-except ImportError:
-    ScalableBloomFilter = None  # Fallback si no está instalado
-import pandas as pd
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from functools import partial
+from motor_busqueda import StreamingExporter, NetworkOptimizedSearcher, StatFilter, index_folder
 
-# ==================== VALIDADOR DE RUTAS ====================
-class PathValidator:
-    @staticmethod
-    def is_safe_path(base_path, target_path):
-        """Verifica que la ruta objetivo esté dentro de la ruta base permitida."""
-        try:
-            base_path = os.path.abspath(base_path)
-            target_path = os.path.abspath(target_path)
-            return os.path.commonpath([base_path, target_path]) == base_path
-        except:
-            return False
+# ==================== CACHÉ DE MINIATURAS ====================
+class ThumbnailCache:
+    """Miniaturas en memoria (LRU) y en disco, indexadas por ruta+mtime+tamaño.
 
-    @staticmethod
-    def sanitize_filename(filename):
-        """Limpia un nombre de archivo para que sea seguro."""
-        return re.sub(r'[\\/*?:"<>|]', "_", filename)
+    Si el archivo cambia, cambia la clave y la miniatura vieja deja de usarse.
+    Un hilo genera por adelantado las miniaturas de las filas cercanas a la
+    selección. Solo hay miniaturas de imágenes: los PDF se muestran en
+    PDFViewer.
+    """
+
+    SIZE = (300, 300)
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+    MAX_MEMORY = 200
+    MAX_DISK_BYTES = 200 * 1024 * 1024
+    PRUNE_EVERY = 50  # miniaturas guardadas entre dos revisiones del tope en disco
+
+    def __init__(self, cache_dir="thumbnail_cache", max_memory=MAX_MEMORY,
+                 max_disk_bytes=MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()  # clave -> imagen PIL
+        self.cond = threading.Condition()
+        self.pending = deque()
+        self.thread = None
+        self.running = True
+        self.saves = 0
+        self.pruning = False
 
-# ==================== BUSCADOR DE CONTENIDO ====================
-class ContentSearcher:
     @staticmethod
-    def search_in_file(file_path, pattern, chunk_size=4096):
-        """Busca un patrón regex en un archivo de manera eficiente."""
+    def key(path):
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".png")
+
+    def get(self, path):
+        """Miniatura de `path`: de memoria, de disco o generándola."""
+        key = self.key(path)
+        with self.cond:
+            image = self.memory.get(key)
+            if image is not None:
+                self.memory.move_to_end(key)
+                return image
+        image = self._load_disk(key)
+        if image is None:
+            image = self._generate(path)
+            self._save_disk(key, image)
+        self._remember(key, image)
+        return image
+
+    def prefetch(self, paths):
+        """Genera en segundo plano las miniaturas de `paths` que falten.
+
+        Reemplaza lo pendiente: solo interesan los vecinos de la selección actual.
+        """
+        paths = [p for p in paths if p.lower().endswith(self.IMAGE_EXTENSIONS)]
+        with self.cond:
+            self.pending.clear()
+            self.pending.extend(paths)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def clear(self):
+        """Vacía la memoria y borra las miniaturas guardadas en disco."""
+        with self.cond:
+            self.memory.clear()
+            self.pending.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.pending.clear()
+            self.cond.notify()
+
+    def _run(self):
+        self._prune_disk()
+        while True:
+            with self.cond:
+                while self.running and not self.pending:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                path = self.pending.popleft()
+            try:
+                key = self.key(path)
+                with self.cond:
+                    if key in self.memory:
+                        continue
+                if os.path.exists(self._disk_path(key)):
+                    continue
+                image = self._generate(path)
+                self._save_disk(key, image)
+                self._remember(key, image)
+            except Exception:
+                continue  # la vista previa mostrará el error si se selecciona
+
+    def _remember(self, key, image):
+        with self.cond:
+            self.memory[key] = image
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory:
+                self.memory.popitem(last=False)
+
+    def _generate(self, path):
+        from PIL import Image
+
+        with Image.open(path) as source:
+            # En JPEG, draft decodifica directamente a 1/2, 1/4 u 1/8 de resolución
+            source.draft('RGB', self.SIZE)
+            img = source.copy()
+        img.thumbnail(self.SIZE, Image.Resampling.LANCZOS)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        return img
+
+    def _load_disk(self, key):
+        from PIL import Image
+
         try:
-            compiled_pattern = re.compile(pattern, re.IGNORECASE)
-            with open(file_path, 'rb') as f:
-                while True:
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    if compiled_pattern.search(chunk.decode('utf-8', errors='ignore')):
-                        return True
-        except Exception as e:
-            print(f"Error buscando en {file_path}: {str(e)}")
-        return False
+            with Image.open(self._disk_path(key)) as img:
+                img.load()
+                return img
+        except (OSError, ValueError):
+            return None
 
-# ==================== EXPORTADOR DE RESULTADOS ====================
-class Exporter:
-    @staticmethod
-    def to_excel(results, filename):
-        """Exporta resultados a un archivo Excel con estadísticas."""
+    def _save_disk(self, key, image):
+        target = self._disk_path(key)
         try:
-            # Convertir resultados a DataFrame
-            df = pd.DataFrame(results)
-            
-            # Convertir tamaño a KB para cálculo
-            def size_to_kb(size_str):
-                parts = size_str.split()
-                if len(parts) != 2:
-                    return 0
-                value, unit = float(parts[0]), parts[1]
-                if unit == 'B':
-                    return value / 1024
-                elif unit == 'KB':
-                    return value
-                elif unit == 'MB':
-                    return value * 1024
-                elif unit == 'GB':
-                    return value * 1024 * 1024
-                else:
-                    return 0
-            
-            # Crear copia para no modificar los datos originales
-            df_stats = df.copy()
-            df_stats['size_kb'] = df_stats['size'].apply(size_to_kb)
-            
-            with pd.ExcelWriter(filename) as writer:
-                # Hoja de resultados
-                df.to_excel(writer, sheet_name='Resultados', index=False)
-                
-                # Hoja de estadísticas
-                stats = df_stats.groupby('type').agg({
-                    'size_kb': ['count', 'sum'],
-                    'modified': ['min', 'max']
-                })
-                stats.columns = ['Cantidad', 'Tamaño Total (KB)', 'Fecha Mínima', 'Fecha Máxima']
-                stats.to_excel(writer, sheet_name='Estadísticas')
-            return True
-        except Exception as e:
-            print(f"Error al exportar a Excel: {str(e)}")
-            return False
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp = f"{target}.{threading.get_ident()}.tmp"
+            image.save(temp, format='PNG')
+            os.replace(temp, target)
+        except OSError:
+            return  # sin disco la caché sigue funcionando en memoria
+        self._count_save()
 
-    @staticmethod
-    def to_csv(results, filename):
-        """Exporta resultados a un archivo CSV."""
+    def _count_save(self):
+        """Cada PRUNE_EVERY miniaturas nuevas revisa el tope en disco, en otro hilo."""
+        with self.cond:
+            self.saves += 1
+            if self.saves < self.PRUNE_EVERY or self.pruning:
+                return
+            self.saves = 0
+            self.pruning = True
+        threading.Thread(target=self._prune_disk, daemon=True).start()
+
+    def _prune_disk(self):
+        """Borra las miniaturas más antiguas si la caché en disco excede su tope."""
         try:
-            df = pd.DataFrame(results)
-            df.to_csv(filename, index=False, encoding='utf-8')
-            return True
-        except Exception as e:
-            print(f"Error al exportar a CSV: {str(e)}")
-            return False
+            self._prune_oldest()
+        finally:
+            with self.cond:
+                self.pruning = False
+
+    def _prune_oldest(self):
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
 
 # ==================== VISOR DE MINIATURAS ====================
 class ThumbnailViewer(ttk.Frame):
-    def __init__(self, parent):
+    def __init__(self, parent, cache=None):
         super().__init__(parent)
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill=BOTH, expand=True)
         self.tabs = {}
         self.current_images = []  # Para mantener referencias a las imágenes
+        self.cache = cache or ThumbnailCache()
         
     def add_thumbnail_tab(self, file_path):
         """Añade una pestaña con vista previa del archivo."""
@@ -133,29 +216,15 @@ class ThumbnailViewer(ttk.Frame):
         
         try:
             # Vista previa para imágenes
-            if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                img = Image.open(file_path)
-                img.thumbnail((300, 300), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
+            if file_path.lower().endswith(ThumbnailCache.IMAGE_EXTENSIONS):
+                # PIL se carga con la primera vista previa, no al iniciar
+                from PIL import ImageTk
+                photo = ImageTk.PhotoImage(self.cache.get(file_path))
                 label = Label(tab, image=photo)
                 label.image = photo  # Mantener referencia
                 self.current_images.append(photo)  # Evitar garbage collection
                 label.pack(pady=10)
                 
-            # Vista previa para PDF (primera página)
-            elif file_path.lower().endswith('.pdf'):
-                doc = fitz.open(file_path)
-                page = doc.load_page(0)
-                pix = page.get_pixmap()
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                img.thumbnail((300, 300), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                label = Label(tab, image=photo)
-                label.image = photo
-                self.current_images.append(photo)
-                label.pack(pady=10)
-                doc.close()
-                
             # Vista previa para otros tipos de archivo
             else:
                 Label(tab, text=f"Vista previa no disponible\n{os.path.basename(file_path)}", 
@@ -170,256 +239,147 @@ class ThumbnailViewer(ttk.Frame):
         self.notebook.select(tab)
         
     def clear(self):
-        """Limpia todas las pestañas y miniaturas."""
+        """Limpia todas las pestañas; las miniaturas quedan en la caché."""
         for tab_id in list(self.tabs.keys()):
             self.notebook.forget(self.tabs[tab_id])
             del self.tabs[tab_id]
         self.current_images = []
 
-# ==================== CACHÉ DE BASE DE DATOS MEJORADO ====================
-class EnhancedFileCacheDB:
-    def __init__(self):
-        self.db_path = "file_search_cache.db"
-        self._init_db()
-    
-    def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("PRAGMA journal_mode=WAL")
-            conn.execute("PRAGMA synchronous=NORMAL")
-            conn.execute("PRAGMA cache_size=-10000")  # 10MB cache
-            
-            cursor = conn.cursor()
-            # Tabla principal
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS file_cache (
-                    path_hash TEXT PRIMARY KEY,
-                    path TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    size INTEGER NOT NULL,
-                    modified INTEGER NOT NULL,
-                    type TEXT NOT NULL,
-                    full_path TEXT NOT NULL,
-                    last_scanned REAL NOT NULL,
-                    indexed_at REAL NOT NULL
-                )
-            """)
-            
-            # Tabla FTS5 para búsqueda rápida
-            cursor.execute("""
-                CREATE VIRTUAL TABLE IF NOT EXISTS file_cache_fts 
-                USING fts5(path, name, type, content=file_cache)
-            """)
-            
-            # Índices adicionales
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_size ON file_cache(size)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_modified ON file_cache(modified)")
-            conn.commit()
-    
-    def get_cached_results(self, path, max_age_days=7):
-        cutoff_time = time.time() - (max_age_days * 24 * 3600)
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Búsqueda más eficiente usando FTS5
-            cursor.execute("""
-                SELECT path, name, size, modified, type, full_path 
-                FROM file_cache
-                WHERE path LIKE ? AND last_scanned > ?
-                LIMIT 1000
-            """, (f"{path}%", cutoff_time))
-            
-            return [dict(row) for row in cursor.fetchall()]
-    
-    def update_cache(self, results):
-        current_time = time.time()
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            for result in results:
-                path_hash = hashlib.md5(result['full_path'].encode()).hexdigest()
-                try:
-                    # Convertir tamaño a KB para almacenamiento
-                    size_parts = result['size'].split()
-                    if len(size_parts) == 2:
-                        size_val, unit = float(size_parts[0]), size_parts[1]
-                        if unit == 'B':
-                            size_kb = size_val / 1024
-                        elif unit == 'KB':
-                            size_kb = size_val
-                        elif unit == 'MB':
-                            size_kb = size_val * 1024
-                        elif unit == 'GB':
-                            size_kb = size_val * 1024 * 1024
-                        else:
-                            size_kb = 0
-                    else:
-                        size_kb = 0
-                    
-                    # Convertir fecha a timestamp
-                    try:
-                        modified_time = time.mktime(time.strptime(result['modified'], '%Y-%m-%d %H:%M:%S'))
-                    except:
-                        modified_time = time.time()
-                    
-                    cursor.execute("""
-                        INSERT OR REPLACE INTO file_cache 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        path_hash, result['path'], result['name'], size_kb,
-                        modified_time, result['type'], result['full_path'],
-                        current_time, current_time
-                    ))
-                except Exception as e:
-                    print(f"Error actualizando caché para {result.get('full_path', '')}: {str(e)}")
-            conn.commit()
-    
-    def clear_old_entries(self, max_age_days=30):
-        cutoff_time = time.time() - (max_age_days * 24 * 3600)
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM file_cache WHERE last_scanned < ?", (cutoff_time,))
-            conn.commit()
-    
-    def clear_cache(self):
-        try:
-            if os.path.exists(self.db_path):
-                os.remove(self.db_path)
-            self._init_db()  # Recrear la base de datos
-            return True
-        except Exception as e:
-            print(f"Error al limpiar caché: {str(e)}")
-            return False
+# ==================== RENDERIZADO DE PÁGINAS PDF ====================
+class PDFPageRenderer:
+    """Rasteriza páginas PDF en un hilo propio con caché LRU y precarga.
 
-# ==================== SISTEMA DE INDEXACIÓN MEJORADO ====================
-class EnhancedFileIndexer:
-    def __init__(self):
-        self.index = defaultdict(list)
-        self.type_index = defaultdict(list)
-        self.path_index = defaultdict(list)
-        self.bloom_filter = ScalableBloomFilter(initial_capacity=100000, error_rate=0.001) if ScalableBloomFilter else None
-        self.last_index_time = 0
-        
-    def build_index(self, root_path):
-        """Construye el índice usando multiprocesamiento."""
-        start_time = time.time()
-        self.index.clear()
-        self.type_index.clear()
-        self.path_index.clear()
-        if self.bloom_filter:
-            self.bloom_filter = ScalableBloomFilter(initial_capacity=100000, error_rate=0.001)
-        
-        # Procesamiento en paralelo
-        with Pool(cpu_count()) as pool:
-            file_list = list(self._get_all_files(root_path))
-            results = pool.map(self._process_file_for_index, file_list)
-            
-        for file_path, file_name, file_ext in results:
-            if file_path and file_name and file_ext:
-                file_lower = file_name.lower()
-                file_type = self._get_file_type(file_ext)
-                
-                self.index[file_lower].append(file_path)
-                self.type_index[file_type].append(file_path)
-                self.path_index[os.path.dirname(file_path)].append(file_name)
-                if self.bloom_filter:
-                    self.bloom_filter.add(file_lower)
-        
-        self.last_index_time = time.time()
-        print(f"Índice construido en {self.last_index_time - start_time:.2f} segundos")
-    
-    def _get_all_files(self, root_path):
-        """Generador para obtener todos los archivos de forma eficiente."""
-        for root, _, files in os.walk(root_path):
-            for file in files:
-                yield os.path.join(root, file), file
-    
-    def _process_file_for_index(self, file_info):
-        """Procesa un archivo para indexación (usado en multiprocesamiento)."""
-        try:
-            file_path, file_name = file_info
-            file_ext = os.path.splitext(file_name.lower())[1]
-            return file_path, file_name.lower(), file_ext
-        except:
-            return None, None, None
-    
-    def search_index(self, name_part=None, file_type=None, path_part=None):
-        """Busca en el índice usando el filtro Bloom para descartes rápidos."""
-        results = set()
-        
-        # Búsqueda por nombre con Bloom filter primero
-        if name_part:
-            name_part = name_part.lower()
-            if self.bloom_filter and not any(name_part in key for key in self.index.keys() if self.bloom_filter.contains(name_part)):
-                return results
-                
-            for file_name, paths in self.index.items():
-                if name_part in file_name:
-                    results.update(paths)
-        
-        # Búsqueda por tipo
-        if file_type:
-            results.update(self.type_index.get(file_type, []))
-        
-        # Búsqueda por ruta
-        if path_part:
-            path_part = path_part.lower()
-            for path, files in self.path_index.items():
-                if path_part in path.lower():
-                    results.update(os.path.join(path, f) for f in files)
-        
-        return results
-    
-    def get_all_files(self):
-        """Obtiene todos los archivos indexados con información completa."""
-        all_files = []
-        for paths in self.index.values():
-            for path in paths:
-                try:
-                    stat = os.stat(path)
-                    all_files.append({
-                        'name': os.path.basename(path),
-                        'path': os.path.dirname(path),
-                        'size': self._format_size(stat.st_size),
-                        'modified': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stat.st_mtime)),
-                        'type': self._get_file_type(os.path.splitext(path)[1]),
-                        'full_path': path
-                    })
-                except:
-                    continue
-        return all_files
-    
-    def _get_file_type(self, extension):
-        """Determina el tipo de archivo basado en la extensión."""
-        types = {
-            'Imágenes': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'],
-            'Documentos': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt'],
-            'Hojas de cálculo': ['.xls', '.xlsx', '.csv', '.ods'],
-            'Presentaciones': ['.ppt', '.pptx', '.odp'],
-            'Videos': ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'],
-            'Audio': ['.mp3', '.wav', '.ogg', '.flac', '.aac'],
-            'Archivos comprimidos': ['.zip', '.rar', '.7z', '.tar', '.gz'],
-            'Ejecutables': ['.exe', '.msi', '.bat', '.sh'],
-            'Código fuente': ['.py', '.java', '.cpp', '.c', '.h', '.html', '.css', '.js']
-        }
-        for typ, exts in types.items():
-            if extension.lower() in exts:
-                return typ
-        return "Otro"
-    
-    def _format_size(self, size):
-        """Formatea el tamaño del archivo para mostrarlo."""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f} {unit}"
-            size /= 1024.0
-        return f"{size:.1f} TB"
+    PyMuPDF no admite uso concurrente, así que todo acceso a fitz ocurre en
+    este hilo. Solo se atiende la última petición visible: si el usuario pasa
+    varias páginas seguidas, las intermedias se descartan. Al terminar la
+    página visible se rasterizan las vecinas para que pasar página sea
+    inmediato. Los resultados llegan al hilo de Tk con ``widget.after``.
+    """
+
+    PREFETCH_OFFSETS = (1, -1, 2)
+    CACHE_BYTES = 128 * 1024 * 1024
+
+    def __init__(self, widget, max_bytes=CACHE_BYTES):
+        self.widget = widget
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()  # (ruta, página, zoom) -> imagen PIL
+        self.cache_bytes = 0
+        self.cond = threading.Condition()
+        self.wanted = None
+        self.prefetch = deque()
+        self.generation = 0
+        self.doc = None
+        self.doc_path = None
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def request(self, path, page_index, view, callback):
+        """Pide la página visible; ``view`` es (ancho, alto, factor de zoom).
+
+        ``callback(generación, imagen, nº de páginas, error)`` se ejecuta en
+        el hilo de Tk. Devuelve la generación de la petición para que el
+        visor descarte entregas antiguas.
+        """
+        with self.cond:
+            self.generation += 1
+            self.wanted = (self.generation, path, page_index, view, callback)
+            self.prefetch.clear()
+            self.cond.notify()
+            return self.generation
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.wanted = None
+            self.prefetch.clear()
+            self.cond.notify()
+
+    @staticmethod
+    def zoom_for(page_rect, view):
+        """Zoom para encajar la página en el lienzo, redondeado para la caché."""
+        width, height, zoom_factor = view
+        if width > 0 and height > 0:
+            zoom_x = (width / page_rect.width) * zoom_factor
+            zoom_y = ((height - 20) / page_rect.height) * zoom_factor
+            zoom = max(0.1, min(zoom_x, zoom_y, 4.0))
+        else:
+            zoom = zoom_factor
+        return round(zoom, 2)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and self.wanted is None and not self.prefetch:
+                    self.cond.wait()
+                if not self.running:
+                    break
+                if self.wanted is not None:
+                    task, self.wanted = self.wanted, None
+                    visible = True
+                else:
+                    task = self.prefetch.popleft()
+                    visible = False
+            generation, path, page_index, view, callback = task
+            try:
+                image, page_count = self._render(path, page_index, view)
+            except Exception as e:
+                if visible:
+                    self.widget.after(0, partial(callback, generation, None, 0, str(e)))
+                continue
+            if not visible:
+                continue
+            self.widget.after(0, partial(callback, generation, image, page_count, None))
+            with self.cond:
+                if self.wanted is None and generation == self.generation:
+                    for offset in self.PREFETCH_OFFSETS:
+                        neighbour = page_index + offset
+                        if 0 <= neighbour < page_count:
+                            self.prefetch.append((generation, path, neighbour, view, None))
+        if self.doc is not None:
+            self.doc.close()
+
+    def _render(self, path, page_index, view):
+        import fitz
+        from PIL import Image
+
+        if path != self.doc_path:
+            if self.doc is not None:
+                self.doc.close()
+            self.doc, self.doc_path = None, None
+            self.doc = fitz.open(path)
+            self.doc_path = path
+        page = self.doc.load_page(page_index)
+        zoom = self.zoom_for(page.rect, view)
+        key = (path, page_index, zoom)
+        with self.cond:
+            image = self.cache.get(key)
+            if image is not None:
+                self.cache.move_to_end(key)
+                return image, len(self.doc)
+
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        size = pix.width * pix.height * 3
+        with self.cond:
+            self.cache[key] = image
+            self.cache_bytes += size
+            while self.cache_bytes > self.max_bytes and len(self.cache) > 1:
+                _, old = self.cache.popitem(last=False)
+                self.cache_bytes -= old.width * old.height * 3
+        return image, len(self.doc)
 
 # ==================== VISOR DE PDF ====================
 class PDFViewer:
+    RESIZE_DELAY = 150  # ms de espera tras el último <Configure>
+
     def __init__(self, parent_frame, bg_color="white"):
         self.parent = parent_frame
         self.bg_color = bg_color
-        self.doc = None
+        self.renderer = None
+        self.render_generation = 0
+        self._resize_job = None
+        self.page_count = 0
         self.page_index = 0
         self.photo = None
         self.image_on_canvas = None
@@ -499,404 +459,104 @@ class PDFViewer:
             return
             
         self.current_path = path
-        try:
-            if self.doc:
-                self.doc.close()
-            self.doc = fitz.open(path)
-            self.page_index = 0
-            self.zoom_factor = 1.0
-            self._render_page()
-            self.prev_btn.config(state=NORMAL)
-            self.next_btn.config(state=NORMAL)
-            self._update_page_controls()
-            self.zoom_label.config(text=f"{int(self.zoom_factor * 100)}%")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo cargar el PDF:\n{str(e)}")
+        self.page_count = 0
+        self.page_index = 0
+        self.zoom_factor = 1.0
+        self.zoom_label.config(text=f"{int(self.zoom_factor * 100)}%")
+        self.page_label.config(text="Cargando...")
+        self._render_page()
     
     def _render_page(self):
-        if not self.doc:
+        """Pide la página actual al hilo de renderizado; no bloquea la interfaz."""
+        self._resize_job = None
+        if not self.current_path:
             return
-            
-        page = self.doc.load_page(self.page_index)
-        
-        if self.canvas_width > 0 and self.canvas_height > 0:
-            zoom_x = (self.canvas_width / page.rect.width) * self.zoom_factor
-            zoom_y = ((self.canvas_height - 20) / page.rect.height) * self.zoom_factor
-            zoom = min(zoom_x, zoom_y)
-            zoom = max(0.1, min(zoom, 4.0))
-        else:
-            zoom = 1.0 * self.zoom_factor
-            
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
+        if self.renderer is None:
+            self.renderer = PDFPageRenderer(self.canvas)
+        view = (self.canvas_width, self.canvas_height, self.zoom_factor)
+        self.render_generation = self.renderer.request(
+            self.current_path, self.page_index, view, self._show_page)
+    
+    def _show_page(self, generation, image, page_count, error):
+        if generation != self.render_generation:
+            return  # el usuario ya pidió otra página o zoom
+        if error is not None:
+            self.current_path = None
+            self.page_count = 0
+            self._update_page_controls()
+            messagebox.showerror("Error", f"No se pudo cargar el PDF:\n{error}")
+            return
+        from PIL import ImageTk
         
-        image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        self.page_count = page_count
         self.photo = ImageTk.PhotoImage(image)
         
         self.canvas.delete("all")
         
-        x = (self.canvas_width - pix.width) / 2 if self.canvas_width > pix.width else 0
-        y = (self.canvas_height - pix.height) / 2 if self.canvas_height > pix.height else 0
+        x = (self.canvas_width - image.width) / 2 if self.canvas_width > image.width else 0
+        y = (self.canvas_height - image.height) / 2 if self.canvas_height > image.height else 0
         
         self.image_on_canvas = self.canvas.create_image(x, y, anchor=NW, image=self.photo)
         
         self.canvas.config(scrollregion=(
             0, 0, 
-            max(self.canvas_width, pix.width), 
-            max(self.canvas_height, pix.height)
+            max(self.canvas_width, image.width), 
+            max(self.canvas_height, image.height)
         ))
         
-        self.page_label.config(text=f"Página {self.page_index + 1} de {len(self.doc)}")
+        self._update_page_controls()
     
     def change_page(self, delta):
-        if not self.doc:
+        if not self.page_count:
             return
             
         new_page = self.page_index + delta
-        if 0 <= new_page < len(self.doc):
+        if 0 <= new_page < self.page_count:
             self.page_index = new_page
             self._render_page()
             self._update_page_controls()
     
     def _update_page_controls(self):
-        if self.doc:
-            self.page_label.config(text=f"Página {self.page_index + 1}/{len(self.doc)}")
+        if self.page_count:
+            self.page_label.config(text=f"Página {self.page_index + 1}/{self.page_count}")
             self.prev_btn.config(state=NORMAL if self.page_index > 0 else DISABLED)
-            self.next_btn.config(state=NORMAL if self.page_index < len(self.doc) - 1 else DISABLED)
+            self.next_btn.config(state=NORMAL if self.page_index < self.page_count - 1 else DISABLED)
+        else:
+            self.page_label.config(text="Página 0/0")
+            self.prev_btn.config(state=DISABLED)
+            self.next_btn.config(state=DISABLED)
     
     def adjust_zoom(self, factor):
         self.zoom_factor = max(0.1, min(self.zoom_factor * factor, 4.0))
         self.zoom_label.config(text=f"{int(self.zoom_factor * 100)}%")
-        if self.doc:
-            self._render_page()
+        self._render_page()
     
     def fit_to_width(self):
         self.zoom_factor = 1.0
         self.zoom_label.config(text="100%")
-        if self.doc:
-            self._render_page()
+        self._render_page()
     
     def _on_canvas_configure(self, event):
         self.canvas_width = event.width
         self.canvas_height = event.height
-        if self.doc:
-            self._render_page()
+        # Un redimensionado genera decenas de eventos: solo se renderiza
+        # cuando el tamaño lleva RESIZE_DELAY ms sin cambiar
+        if self._resize_job is not None:
+            self.canvas.after_cancel(self._resize_job)
+        if self.current_path:
+            self._resize_job = self.canvas.after(self.RESIZE_DELAY, self._render_page)
+        else:
+            self._resize_job = None
+    
+    def close(self):
+        """Detiene el hilo de renderizado."""
+        if self.renderer is not None:
+            self.renderer.close()
+            self.renderer = None
     
     def _on_mousewheel(self, event):
         self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
 
-# ==================== BUSCADOR MEJORADO PARA RED ====================
-class NetworkOptimizedSearcher:
-    def __init__(self):
-        self.stop_event = threading.Event()
-        self.pause_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=4)
-        self.max_results = 10000
-        self.timeout = 600  # 10 minutos para redes lentas
-        self.batch_size = 500  # Tamaño de lote reducido para red
-        self.file_cache = {}
-        self.cache_limit = 100000
-        self.cache_hits = 0
-        self.cache_misses = 0
-        self.max_retries = 3  # Reintentos para operaciones de red
-        self.db = EnhancedFileCacheDB()
-        self.indexer = EnhancedFileIndexer()
-        self.use_cache = True
-        self.use_index = True
-        self.path_validator = PathValidator()
-
-    def search(self, path, search_term, extension, type_extensions, callback, progress_callback, 
-              search_content=False, content_pattern=None):
-        """Realiza una búsqueda optimizada para red."""
-        self.stop_event.clear()
-        self.pause_event.clear()
-        self.file_cache.clear()
-        self.cache_hits = 0
-        self.cache_misses = 0
-        
-        start_time = time.time()
-        result_count = 0
-        
-        search_term = search_term.lower() if search_term else None
-        extension = extension.lower() if extension else None
-        
-        try:
-            if not os.path.isdir(path):
-                progress_callback(0, 0)
-                return
-
-            # Fase 1: Buscar en el índice
-            if self.use_index:
-                indexed_results = self.indexer.search_index(
-                    search_term,
-                    None if not type_extensions else self.indexer._get_file_type(extension) if extension else None,
-                    path
-                )
-                
-                for full_path in indexed_results:
-                    if self.stop_event.is_set():
-                        break
-                    
-                    # Validar ruta segura
-                    if not self.path_validator.is_safe_path(path, full_path):
-                        continue
-                    
-                    file = os.path.basename(full_path)
-                    file_lower = file.lower()
-                    file_ext = os.path.splitext(file_lower)[1]
-                    
-                    if extension and file_ext != extension:
-                        continue
-                    if type_extensions and file_ext not in type_extensions:
-                        continue
-                    if search_term and search_term not in file_lower:
-                        continue
-                    if search_content and content_pattern:
-                        if not ContentSearcher.search_in_file(full_path, content_pattern):
-                            continue
-                    
-                    try:
-                        stat = os.stat(full_path)
-                        callback({
-                            'name': file,
-                            'path': os.path.dirname(full_path),
-                            'size': self._format_size(stat.st_size),
-                            'modified': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stat.st_mtime)),
-                            'type': self._get_file_type(file_ext),
-                            'full_path': full_path
-                        })
-                        result_count += 1
-                    except:
-                        continue
-
-            # Fase 2: Buscar en la caché de la base de datos
-            if self.use_cache and result_count < 100:
-                cached_results = self.db.get_cached_results(path)
-                for result in cached_results:
-                    if self.stop_event.is_set():
-                        break
-                    
-                    file_lower = result['name'].lower()
-                    file_ext = os.path.splitext(file_lower)[1]
-                    
-                    if extension and file_ext != extension:
-                        continue
-                    if type_extensions and file_ext not in type_extensions:
-                        continue
-                    if search_term and search_term not in file_lower:
-                        continue
-                    
-                    callback(result)
-                    result_count += 1
-
-            # Fase 3: Búsqueda en disco si es necesario
-            if result_count < 50 or not self.use_index:
-                total_files = self._count_files(path)
-                if total_files == 0:
-                    progress_callback(100, result_count)
-                    return
-
-                processed_files = 0
-                last_update_time = time.time()
-                
-                for root, dirs, files in os.walk(path):
-                    if self.stop_event.is_set() or (time.time() - start_time) > self.timeout:
-                        break
-                        
-                    batch = []
-                    for file in files:
-                        if self.stop_event.is_set() or result_count >= self.max_results:
-                            break
-                            
-                        while self.pause_event.is_set():
-                            time.sleep(0.1)
-                            if self.stop_event.is_set():
-                                break
-                        
-                        batch.append((root, file))
-                        processed_files += 1
-                        
-                        if len(batch) >= self.batch_size:
-                            self._process_batch(batch, search_term, extension, 
-                                             type_extensions, callback, search_content, content_pattern)
-                            result_count = len(self.file_cache)
-                            batch = []
-                            
-                            current_time = time.time()
-                            if current_time - last_update_time > 0.5:
-                                progress = min(100, processed_files / total_files * 100)
-                                progress_callback(progress, result_count)
-                                last_update_time = current_time
-                    
-                    if batch:
-                        self._process_batch(batch, search_term, extension, 
-                                         type_extensions, callback, search_content, content_pattern)
-                        result_count = len(self.file_cache)
-                
-                # Actualizar la caché de la base de datos
-                if self.file_cache:
-                    self.db.update_cache(self.file_cache.values())
-            
-            progress_callback(100, result_count)
-        except Exception as e:
-            progress_callback(0, 0)
-            print(f"Error en la búsqueda: {str(e)}")
-
-    def _process_batch(self, batch, search_term, extension, type_extensions, 
-                     callback, search_content=False, content_pattern=None):
-        """Procesa un lote de archivos con reintentos para red."""
-        futures = []
-        
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            for root, file in batch:
-                futures.append(executor.submit(
-                    self._process_network_file,
-                    root, file, search_term, extension, 
-                    type_extensions, search_content, content_pattern
-                ))
-            
-            for future in as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        file_id = f"{result['path']}/{result['name']}"
-                        if file_id not in self.file_cache:
-                            self.file_cache[file_id] = result
-                            if len(self.file_cache) > self.cache_limit:
-                                oldest = sorted(self.file_cache.items(), 
-                                              key=lambda x: x[1]['modified'])[:self.cache_limit//10]
-                                for key, _ in oldest:
-                                    del self.file_cache[key]
-                except Exception as e:
-                    print(f"Error procesando lote: {str(e)}")
-
-    def _process_network_file(self, root, file, search_term, extension, 
-                            type_extensions, search_content, content_pattern):
-        """Procesa un archivo con reintentos para operaciones de red."""
-        retries = 0
-        while retries < self.max_retries:
-            try:
-                return self._process_file(root, file, search_term, extension, 
-                                       type_extensions, search_content, content_pattern)
-            except (OSError, TimeoutError) as e:
-                retries += 1
-                time.sleep(1)  # Esperar antes de reintentar
-        return None
-
-    def _process_file(self, root, file, search_term, extension, 
-                     type_extensions, search_content, content_pattern):
-        """Procesa un archivo individual con todas las comprobaciones."""
-        try:
-            file_lower = file.lower()
-            file_ext = os.path.splitext(file_lower)[1]
-            
-            if extension and file_ext != extension:
-                return None
-            if type_extensions and file_ext not in type_extensions:
-                return None
-            if search_term and search_term not in file_lower:
-                return None
-            
-            full_path = os.path.join(root, file)
-            if not os.path.isfile(full_path):
-                return None
-                
-            # Validar ruta segura
-            if not self.path_validator.is_safe_path(root, full_path):
-                return None
-                
-            # Búsqueda en contenido si está habilitada
-            if search_content and content_pattern:
-                if not ContentSearcher.search_in_file(full_path, content_pattern):
-                    return None
-                
-            file_id = f"{root}/{file}"
-            
-            if file_id in self.file_cache:
-                self.cache_hits += 1
-                return self.file_cache[file_id]
-            
-            self.cache_misses += 1
-            info = self._get_file_info(full_path)
-            if not info:
-                return None
-                
-            return {
-                'name': file,
-                'path': root,
-                'size': self._format_size(info['size']),
-                'modified': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info['modified'])),
-                'type': self._get_file_type(file_ext),
-                'full_path': full_path
-            }
-        except Exception as e:
-            print(f"Error procesando archivo {file}: {str(e)}")
-            return None
-
-    def _get_file_info(self, full_path):
-        """Obtiene información del archivo con manejo de errores."""
-        try:
-            stat = os.stat(full_path)
-            return {
-                'size': stat.st_size,
-                'modified': stat.st_mtime
-            }
-        except:
-            return None
-    
-    def _format_size(self, size):
-        """Formatea el tamaño del archivo para mostrarlo."""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f} {unit}"
-            size /= 1024.0
-        return f"{size:.1f} TB"
-    
-    def _get_file_type(self, extension):
-        """Determina el tipo de archivo basado en la extensión."""
-        types = {
-            'Imágenes': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'],
-            'Documentos': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt'],
-            'Hojas de cálculo': ['.xls', '.xlsx', '.csv', '.ods'],
-            'Presentaciones': ['.ppt', '.pptx', '.odp'],
-            'Videos': ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'],
-            'Audio': ['.mp3', '.wav', '.ogg', '.flac', '.aac'],
-            'Archivos comprimidos': ['.zip', '.rar', '.7z', '.tar', '.gz'],
-            'Ejecutables': ['.exe', '.msi', '.bat', '.sh'],
-            'Código fuente': ['.py', '.java', '.cpp', '.c', '.h', '.html', '.css', '.js']
-        }
-        
-        for typ, exts in types.items():
-            if extension.lower() in exts:
-                return typ
-        return "Otro"
-    
-    def _count_files(self, path):
-        """Cuenta archivos de forma eficiente con manejo de errores."""
-        count = 0
-        try:
-            for root, dirs, files in os.walk(path):
-                if self.stop_event.is_set():
-                    return 0
-                count += len(files)
-        except Exception as e:
-            print(f"Error al contar archivos: {str(e)}")
-            return 0
-        return count
-    
-    def stop(self):
-        """Detiene la búsqueda actual."""
-        self.stop_event.set()
-        self.executor.shutdown(wait=False)
-    
-    def pause(self):
-        """Pausa la búsqueda actual."""
-        self.pause_event.set()
-    
-    def resume(self):
-        """Reanuda la búsqueda pausada."""
-        self.pause_event.clear()
-
 # ==================== BARRA DE PROGRESO ====================
 class ProgressBar:
     def __init__(self, parent):
@@ -938,6 +598,9 @@ class ProgressBar:
     def update_result_count(self, count):
         self.result_count.config(text=f"{count} archivos encontrados")
 
+    def update_scanned(self, dirs_done, files_seen):
+        self.progress_label.config(text=f"Buscando... {dirs_done} carpetas, {files_seen} archivos revisados")
+
 # ==================== PANEL DE BÚSQUEDA MEJORADO ====================
 class EnhancedSearchPanel:
     def __init__(self, parent, controller):
@@ -966,6 +629,12 @@ class EnhancedSearchPanel:
         self.path_entry.grid(row=1, column=1, sticky=EW, padx=5)
         ttk.Button(self.frame, text="Examinar...", command=self._browse_path).grid(row=1, column=2, padx=5)
         ttk.Button(self.frame, text="Escanear", command=self.controller.scan_folder).grid(row=1, column=3, padx=5)
+        self.index_content_var = BooleanVar(value=False)
+        ttk.Checkbutton(self.frame, text="Indexar contenido", variable=self.index_content_var).grid(
+            row=1, column=4, sticky=W, padx=5)
+        self.watch_var = BooleanVar(value=False)
+        ttk.Checkbutton(self.frame, text="Vigilar cambios", variable=self.watch_var,
+                       command=self.toggle_watch).grid(row=1, column=5, sticky=W, padx=5)
         
         Label(self.frame, text="Nombre:", bg="white", fg="#333333").grid(row=2, column=0, sticky=W, pady=(10, 0))
         self.search_entry = ttk.Entry(self.frame, width=40, font=Font(family="Segoe UI", size=10))
@@ -992,23 +661,46 @@ class EnhancedSearchPanel:
         
         self.sort_order = StringVar(value="reciente")
         ttk.Radiobutton(self.frame, text="Más reciente", variable=self.sort_order, 
-                       value="reciente").grid(row=4, column=1, sticky=W, pady=(5, 0))
+                       value="reciente", command=self.controller._update_ui).grid(row=4, column=1, sticky=W, pady=(5, 0))
         ttk.Radiobutton(self.frame, text="Más antiguo", variable=self.sort_order, 
-                       value="antiguo").grid(row=4, column=2, sticky=W, pady=(5, 0))
+                       value="antiguo", command=self.controller._update_ui).grid(row=4, column=2, sticky=W, pady=(5, 0))
+        
+        date_frame = Frame(self.frame, bg="white")
+        date_frame.grid(row=4, column=3, sticky=W, padx=5, pady=(5, 0))
+        Label(date_frame, text="Modificado:", bg="white", fg="#333333").pack(side=LEFT)
+        self.date_combobox = ttk.Combobox(date_frame, width=15, state="readonly",
+                                          font=Font(family="Segoe UI", size=10))
+        self.date_combobox['values'] = [''] + list(self.controller.DATE_RANGES)
+        self.date_combobox.pack(side=LEFT, padx=5)
+        
+        # Solo los N primeros en el orden elegido: el buscador guarda un heap acotado
+        top_frame = Frame(self.frame, bg="white")
+        top_frame.grid(row=4, column=4, columnspan=2, sticky=W, padx=5, pady=(5, 0))
+        Label(top_frame, text="Primeros:", bg="white", fg="#333333").pack(side=LEFT)
+        self.top_k_combobox = ttk.Combobox(top_frame, width=6, state="readonly",
+                                           font=Font(family="Segoe UI", size=10))
+        self.top_k_combobox['values'] = ['', '100', '200', '500', '1000']
+        self.top_k_combobox.pack(side=LEFT, padx=5)
     
     def _create_advanced_filters(self):
         Label(self.frame, text="Tamaño:", bg="white", fg="#333333").grid(row=5, column=0, sticky=W, pady=(5, 0))
-        self.size_combobox = ttk.Combobox(self.frame, width=15, font=Font(family="Segoe UI", size=10))
-        self.size_combobox['values'] = ['', 'pequeño (<1MB)', 'mediano (1-10MB)', 'grande (>10MB)']
+        self.size_combobox = ttk.Combobox(self.frame, width=15, state="readonly",
+                                          font=Font(family="Segoe UI", size=10))
+        self.size_combobox['values'] = [''] + list(self.controller.SIZE_RANGES)
         self.size_combobox.grid(row=5, column=1, sticky=W, padx=5, pady=(5, 0))
         
         self.search_content_var = BooleanVar()
         ttk.Checkbutton(self.frame, text="Buscar en contenido", variable=self.search_content_var).grid(
             row=5, column=2, sticky=W, padx=5, pady=(5, 0))
         
-        self.content_pattern_entry = ttk.Entry(self.frame, width=20, font=Font(family="Segoe UI", size=10))
-        self.content_pattern_entry.grid(row=5, column=3, sticky=W, padx=5, pady=(5, 0))
+        content_frame = Frame(self.frame, bg="white")
+        content_frame.grid(row=5, column=3, sticky=W, padx=5, pady=(5, 0))
+        self.content_pattern_entry = ttk.Entry(content_frame, width=20, font=Font(family="Segoe UI", size=10))
+        self.content_pattern_entry.pack(side=LEFT)
         self.content_pattern_entry.insert(0, ".*")  # Patrón por defecto: cualquier contenido
+        # Con palabras separadas por "|": exigir todas en lugar de una cualquiera
+        self.content_all_var = BooleanVar(value=False)
+        ttk.Checkbutton(content_frame, text="Todas", variable=self.content_all_var).pack(side=LEFT, padx=(5, 0))
         
         self.use_cache_var = BooleanVar(value=True)
         ttk.Checkbutton(self.frame, text="Usar caché", variable=self.use_cache_var,
@@ -1026,6 +718,11 @@ class EnhancedSearchPanel:
         """Activa/desactiva el uso de caché."""
         self.controller.searcher.use_cache = self.use_cache_var.get()
     
+    def toggle_watch(self):
+        """Al desactivar la vigilancia se detienen los vigilantes en curso."""
+        if not self.watch_var.get():
+            self.controller.searcher.watcher.stop()
+    
     def _browse_path(self):
         """Abre un diálogo para seleccionar una carpeta."""
         path = filedialog.askdirectory(initialdir=self.path_entry.get())
@@ -1041,8 +738,11 @@ class EnhancedSearchPanel:
             'extension': self.extension_combobox.get().strip().lower(),
             'doc_type': self.doc_type_combobox.get().strip(),
             'size_filter': self.size_combobox.get().strip(),
+            'date_filter': self.date_combobox.get().strip(),
+            'top_k': int(self.top_k_combobox.get()) if self.top_k_combobox.get() else None,
             'search_content': self.search_content_var.get(),
             'content_pattern': self.content_pattern_entry.get().strip(),
+            'content_all': self.content_all_var.get(),
             'sort_order': self.sort_order.get()
         }
     
@@ -1059,6 +759,12 @@ class EnhancedResultsPanel:
         self.parent = parent
         self.controller = controller
         self.current_preview_path = None
+        # Vista virtual: solo existen en el Treeview las filas visibles
+        self.view_results = []   # resultados ordenados por fecha
+        self.merged_count = 0    # cuántos resultados del controlador ya se incorporaron
+        self.sort_reverse = True
+        self.selected = set()    # FileResult seleccionados (visibles o no)
+        self.offset = 0          # índice del primer resultado visible
         self._setup_ui()
     
     def _setup_ui(self):
@@ -1092,9 +798,10 @@ class EnhancedResultsPanel:
         self.tree.heading('modified', text='Modificado', anchor=W)
         self.tree.heading('type', text='Tipo', anchor=W)
         
-        self.vsb = ttk.Scrollbar(self.tree_frame, orient="vertical", command=self.tree.yview)
+        # La barra vertical desplaza la ventana de resultados, no el Treeview
+        self.vsb = ttk.Scrollbar(self.tree_frame, orient="vertical", command=self._on_scrollbar)
         self.hsb = ttk.Scrollbar(self.tree_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=self.vsb.set, xscrollcommand=self.hsb.set)
+        self.tree.configure(xscrollcommand=self.hsb.set)
         
         self.tree.grid(row=0, column=0, sticky="nsew")
         self.vsb.grid(row=0, column=1, sticky="ns")
@@ -1103,10 +810,84 @@ class EnhancedResultsPanel:
         self.tree_frame.grid_rowconfigure(0, weight=1)
         self.tree_frame.grid_columnconfigure(0, weight=1)
         
-        self.tree.bind("<<TreeviewSelect>>", lambda e: self.controller.update_preview())
-        self.tree.bind("<Configure>", lambda e: self._adjust_tree_columns())
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Configure>", lambda e: [self._adjust_tree_columns(), self._refresh_rows()])
         self.tree.bind("<Double-1>", lambda e: self.controller._open_selected_file())  # Doble click
         self.tree.bind("<Return>", lambda e: self.controller._open_selected_file())     # Enter
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", lambda e: self._scroll_rows(-3 * int(e.delta / 120)))
+        self.tree.bind("<Button-4>", lambda e: self._scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_rows(3))
+        self.tree.bind("<Up>", lambda e: self._on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self._on_arrow(1))
+    
+    def _visible_row_count(self):
+        """Número de filas que caben en el Treeview (descontando el encabezado)."""
+        return max(1, (self.tree.winfo_height() - 25) // 25)
+    
+    def _refresh_rows(self):
+        """Materializa en el Treeview solo la ventana de resultados visible."""
+        total = len(self.view_results)
+        visible = self._visible_row_count()
+        self.offset = max(0, min(self.offset, total - visible))
+        window = self.view_results[self.offset:self.offset + visible]
+        
+        items = self.tree.get_children()
+        if len(items) > len(window):
+            self.tree.delete(*items[len(window):])
+        for i, result in enumerate(window):
+            iid = f"row{i}"
+            if i < len(items):
+                self.tree.item(iid, text=str(self.offset + i + 1), values=result.as_row())
+            else:
+                self.tree.insert('', 'end', iid=iid, text=str(self.offset + i + 1), values=result.as_row())
+        self.tree.selection_set([f"row{i}" for i, result in enumerate(window) if result in self.selected])
+        
+        if total:
+            self.vsb.set(self.offset / total, (self.offset + len(window)) / total)
+        else:
+            self.vsb.set(0, 1)
+    
+    def _scroll_rows(self, delta):
+        self.offset += delta
+        self._refresh_rows()
+        return "break"
+    
+    def _on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self.offset = int(float(args[0]) * len(self.view_results))
+            self._refresh_rows()
+        elif action == 'scroll':
+            amount, unit = int(args[0]), args[1]
+            self._scroll_rows(amount * (self._visible_row_count() if unit == 'pages' else 1))
+    
+    def _on_arrow(self, delta):
+        """Con las flechas en el borde de la ventana, desplaza en lugar de salir de ella."""
+        items = self.tree.get_children()
+        if not items or self.tree.focus() != (items[0] if delta < 0 else items[-1]):
+            return None
+        index = self.offset + items.index(self.tree.focus()) + delta
+        if not 0 <= index < len(self.view_results):
+            return "break"
+        self.selected = {self.view_results[index]}
+        return self._scroll_rows(delta)
+    
+    def _on_click(self, event):
+        # Un clic sin Shift/Ctrl reemplaza la selección, incluidas las filas no visibles
+        if not event.state & 0x0005:
+            self.selected.clear()
+    
+    def _on_select(self, event):
+        """Sincroniza la selección de las filas visibles con `selected`."""
+        selection = set(self.tree.selection())
+        for i, iid in enumerate(self.tree.get_children()):
+            result = self.view_results[self.offset + i]
+            if iid in selection:
+                self.selected.add(result)
+            else:
+                self.selected.discard(result)
+        self.controller.update_preview()
+    
     def _adjust_tree_columns(self):
         """Ajusta dinámicamente el ancho de las columnas."""
         total_width = self.tree.winfo_width()
@@ -1150,13 +931,69 @@ class EnhancedResultsPanel:
     
     def clear_results(self):
         """Limpia todos los resultados mostrados."""
-        self.tree.delete(*self.tree.get_children())
+        self.view_results = []
+        self.merged_count = 0
+        self.selected = set()
+        self.offset = 0
+        self._refresh_rows()
     
-    def add_result(self, idx, result):
-        """Añade un resultado al árbol de visualización."""
-        self.tree.insert('', 'end', text=str(idx), values=(
-            result['name'], result['path'], result['size'],
-            result['modified'], result['type']))
+    def _sort_key(self, result):
+        return -result.mtime if self.sort_reverse else result.mtime
+    
+    def sync_results(self, results, reverse):
+        """Incorpora en orden los resultados nuevos de `results` y redibuja la ventana visible.
+
+        Solo se insertan los resultados añadidos desde la última llamada; se
+        reordena todo únicamente si cambió el orden elegido.
+        """
+        count = len(results)
+        if reverse != self.sort_reverse or count < self.merged_count:
+            self.sort_reverse = reverse
+            self.view_results = sorted(results[:count], key=self._sort_key)
+        else:
+            new_results = results[self.merged_count:count]
+            if len(new_results) > 64:
+                # Lotes grandes: Timsort aprovecha que la lista ya está ordenada
+                self.view_results.extend(new_results)
+                self.view_results.sort(key=self._sort_key)
+            else:
+                for result in new_results:
+                    insort(self.view_results, result, key=self._sort_key)
+        self.merged_count = count
+        self._refresh_rows()
+    
+    def selected_results(self):
+        """FileResult seleccionados, en el orden en que se muestran."""
+        if len(self.selected) <= 1:
+            return list(self.selected)
+        return [result for result in self.view_results if result in self.selected]
+    
+    def neighbours(self, result, radius):
+        """Resultados a hasta `radius` filas de `result`, los más cercanos primero."""
+        index = bisect_left(self.view_results, self._sort_key(result), key=self._sort_key)
+        while index < len(self.view_results) and self.view_results[index] is not result:
+            index += 1
+        if index == len(self.view_results):
+            return []
+        nearby = []
+        for distance in range(1, radius + 1):
+            for i in (index + distance, index - distance):
+                if 0 <= i < len(self.view_results):
+                    nearby.append(self.view_results[i])
+        return nearby
+    
+    def result_at(self, item):
+        """FileResult mostrado en una fila del Treeview."""
+        index = self.offset + self.tree.index(item)
+        return self.view_results[index] if index < len(self.view_results) else None
+    
+    def select_all(self):
+        self.selected = set(self.view_results)
+        self._refresh_rows()
+    
+    def select_none(self):
+        self.selected = set()
+        self._refresh_rows()
     
     def show_pdf_preview(self, file_path):
         """Muestra la vista previa de un PDF."""
@@ -1194,6 +1031,9 @@ class EnhancedFileSearchController:
         self.search_active = False
         self.searcher = NetworkOptimizedSearcher()
         self.results = []
+        self.export_lock = threading.Lock()
+        self.live_export = None  # (StreamingExporter, mensaje) mientras exporta durante la búsqueda
+        self.export_thread = None
         self.document_types = {
             "Imágenes": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp"],
             "Documentos": [".doc", ".docx", ".odt", ".pdf", ".rtf", ".txt"],
@@ -1294,6 +1134,8 @@ class EnhancedFileSearchController:
     
     def _clear_cache(self):
         if messagebox.askyesno("Limpiar caché", "¿Está seguro que desea limpiar toda la caché de búsqueda?"):
+            self.searcher.file_cache.clear()
+            self.results_panel.thumbnail_viewer.cache.clear()
             if self.searcher.db.clear_cache():
                 messagebox.showinfo("Éxito", "La caché ha sido limpiada correctamente")
             else:
@@ -1316,12 +1158,20 @@ class EnhancedFileSearchController:
         progress_bar = ttk.Progressbar(progress_dialog, variable=progress_var, maximum=100)
         progress_bar.pack(fill=X, padx=20, pady=10)
         
+        index_content = self.search_panel.index_content_var.get()
+        watch = self.search_panel.watch_var.get()
+        
         def do_scan():
             try:
-                self.searcher.indexer.build_index(path)
-                self.searcher.db.update_cache(self.searcher.indexer.get_all_files())
+                summary = index_folder(path, index_content, self.searcher)
+                message = f"Carpeta indexada correctamente\nArchivos indexados: {summary['indexed_files']}"
+                if index_content:
+                    message += f"\nContenido actualizado: {summary['content_updated']} archivos"
+                if watch:
+                    self.searcher.watcher.watch(path)
+                    message += "\nLos cambios en la carpeta se aplicarán al índice automáticamente"
                 progress_dialog.after(100, lambda: progress_dialog.destroy())
-                messagebox.showinfo("Éxito", f"Carpeta indexada correctamente\nArchivos indexados: {len(self.searcher.indexer.index)}")
+                messagebox.showinfo("Éxito", message)
             except Exception as e:
                 progress_dialog.after(100, lambda: progress_dialog.destroy())
                 messagebox.showerror("Error", f"No se pudo indexar la carpeta: {str(e)}")
@@ -1355,24 +1205,61 @@ class EnhancedFileSearchController:
         self.search_thread = threading.Thread(
             target=self._run_search,
             args=(params['path'], params['search_term'], params['extension'], 
-                 type_extensions, params['search_content'], params['content_pattern']),
+                 type_extensions, params['search_content'], params['content_pattern'],
+                 self._stat_filter(params['size_filter'], params['date_filter']),
+                 params['top_k'], 'recientes' if params['sort_order'] == "reciente" else 'antiguos',
+                 params['content_all']),
             daemon=True
         )
         self.search_thread.start()
     
-    def _run_search(self, path, search_term, extension, type_extensions, search_content, content_pattern):
-        """Ejecuta la búsqueda mejorada con todas las características."""
+    MB = 1024 * 1024
+    SIZE_RANGES = {  # etiqueta -> (mínimo, máximo) en bytes
+        'pequeño (<1MB)': (None, MB),
+        'mediano (1-10MB)': (MB, 10 * MB),
+        'grande (>10MB)': (10 * MB, None),
+    }
+    DATE_RANGES = {  # etiqueta -> días hacia atrás (0: desde hoy a las 00:00)
+        'hoy': 0,
+        'última semana': 7,
+        'último mes': 30,
+        'último año': 365,
+    }
+    
+    def _stat_filter(self, size_label, date_label):
+        """StatFilter con los rangos elegidos; el buscador lo aplica antes de entregar resultados."""
+        min_size, max_size = self.SIZE_RANGES.get(size_label, (None, None))
+        modified_after = None
+        if date_label in self.DATE_RANGES:
+            days = self.DATE_RANGES[date_label]
+            today = time.localtime()
+            midnight = time.mktime((today.tm_year, today.tm_mon, today.tm_mday, 0, 0, 0, 0, 0, -1))
+            modified_after = midnight - days * 24 * 3600
+        return StatFilter(min_size, max_size, modified_after)
+    
+    def _run_search(self, path, search_term, extension, type_extensions, search_content, content_pattern,
+                    stat_filter=None, top_k=None, order='recientes', content_all=False):
+        """Ejecuta la búsqueda mejorada con todas las características.
+
+        Con `top_k` los resultados llegan todos juntos al final, ya que hasta
+        entonces no se sabe cuáles son los primeros.
+        """
         def callback(result):
-            self.results.append(result)
+            with self.export_lock:
+                self.results.append(result)
+                live_export = self.live_export
+            if live_export is not None:
+                live_export[0].write(result)
             if len(self.results) % 100 == 0:
                 self.root.after(0, self._update_ui)
         
-        def progress_callback(progress, count):
+        def progress_callback(progress, count, scanned=None):
             current_time = time.time() - self.search_start_time
             self.root.after(0, lambda: [
                 self.progress_bar.update_progress(progress),
                 self.progress_bar.update_result_count(count),
                 self.progress_bar.update_time(current_time),
+                self.progress_bar.update_scanned(*scanned) if scanned and self.search_active else None,
                 self._update_ui()
             ])
         
@@ -1384,23 +1271,20 @@ class EnhancedFileSearchController:
             callback,
             progress_callback,
             search_content,
-            content_pattern
+            content_pattern,
+            stat_filter,
+            top_k,
+            order,
+            content_all
         )
         
         self.root.after(0, self._finalize_search)
     
     def _update_ui(self):
-        """Actualiza la interfaz de usuario con los resultados actuales."""
-        self.results_panel.tree.delete(*self.results_panel.tree.get_children())
-        
+        """Incorpora a la vista los resultados llegados desde la última actualización."""
+        # Se ordena por el mtime ya capturado por el buscador, sin volver a consultar el disco
         reverse_order = self.search_panel.sort_order.get() == "reciente"
-        self.results.sort(
-            key=lambda x: os.path.getmtime(x['full_path']) if os.path.exists(x['full_path']) else 0,
-            reverse=reverse_order
-        )
-        
-        for idx, result in enumerate(self.results, 1):
-            self.results_panel.add_result(idx, result)
+        self.results_panel.sync_results(self.results, reverse_order)
     
     def _finalize_search(self):
         """Finaliza la búsqueda y actualiza la interfaz."""
@@ -1408,7 +1292,15 @@ class EnhancedFileSearchController:
         self.progress_bar.update_time(current_time)
         self.search_active = False
         self.search_panel.set_search_state(False)
-        self.progress_bar.update_status("Búsqueda completada", "#4e8cff")
+        unreachable = self.searcher.summary()['unreachable_dirs']
+        if unreachable:
+            # El cortacircuitos dejó carpetas sin revisar: el resultado puede estar incompleto
+            self.progress_bar.update_status(
+                f"Búsqueda completada ({len(unreachable)} carpetas sin respuesta)", "#ffaa00")
+            print("Carpetas sin respuesta:\n" + "\n".join(unreachable))
+        else:
+            self.progress_bar.update_status("Búsqueda completada", "#4e8cff")
+        self._end_live_export()
         self._update_ui()
     
     def _update_time_label(self):
@@ -1442,97 +1334,131 @@ class EnhancedFileSearchController:
         self.progress_bar.update_status("Búsqueda detenida", "#ff5555")
         self.search_panel.set_search_state(False)
     
+    THUMBNAIL_PREFETCH = 5  # filas a cada lado de la selección
+    
     def update_preview(self):
         """Actualiza la vista previa basada en la selección actual."""
-        selected_items = self.results_panel.tree.selection()
+        selected = self.results_panel.selected_results()
         
-        if not selected_items or len(selected_items) > 1:
+        if len(selected) != 1:
             self.results_panel.show_no_preview()
             return
         
-        item = selected_items[0]
-        values = self.results_panel.tree.item(item, 'values')
-        full_path = os.path.join(values[1], values[0])
-        file_type = values[4]
+        result = selected[0]
+        full_path = result.full_path
+        file_type = result.type
         
         if not os.path.exists(full_path):
             self.results_panel.show_no_preview()
             return
         
         # Vista previa para PDF
-        if file_type == "Documentos" and values[0].lower().endswith('.pdf'):
+        if file_type == "Documentos" and result.name.lower().endswith('.pdf'):
             self.results_panel.show_pdf_preview(full_path)
         # Vista previa para imágenes
         elif file_type == "Imágenes":
             self.results_panel.show_thumbnail_preview(full_path)
+            # Adelantar las miniaturas de las filas cercanas
+            nearby = self.results_panel.neighbours(result, self.THUMBNAIL_PREFETCH)
+            self.results_panel.thumbnail_viewer.cache.prefetch(
+                [r.full_path for r in nearby if r.type == "Imágenes"])
         else:
             self.results_panel.show_no_preview()
     
+    EXPORT_FILETYPES = [("Excel", "*.xlsx"), ("CSV", "*.csv"), ("JSON Lines", "*.jsonl"),
+                        ("Parquet", "*.parquet"), ("Todos los archivos", "*.*")]
+    
     def export_results(self):
-        """Exporta todos los resultados a un archivo."""
-        if not self.results:
+        """Exporta todos los resultados a un archivo.
+
+        Si la búsqueda sigue en curso, los resultados que lleguen después se
+        siguen escribiendo hasta que termine.
+        """
+        if not self.results and not self.search_active:
             messagebox.showwarning("Advertencia", "No hay resultados para exportar")
             return
             
         filename = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv"), ("Todos los archivos", "*.*")]
-        )
+            defaultextension=".xlsx", filetypes=self.EXPORT_FILETYPES)
         
         if filename:
-            if filename.endswith('.xlsx'):
-                success = Exporter.to_excel(self.results, filename)
-            else:
-                success = Exporter.to_csv(self.results, filename)
-            
-            if success:
-                messagebox.showinfo("Éxito", f"Resultados exportados a {filename}")
-            else:
-                messagebox.showerror("Error", "No se pudieron exportar los resultados")
+            self._start_export(filename, self.results, self.search_active,
+                               f"Resultados exportados a {filename}")
     
     def _export_selected_files(self):
         """Exporta los archivos seleccionados a un archivo."""
-        selected_items = self.results_panel.tree.selection()
-        if not selected_items:
+        selected_results = self.results_panel.selected_results()
+        if not selected_results:
             messagebox.showwarning("Advertencia", "No hay archivos seleccionados")
             return
-        
-        selected_results = []
-        for item in selected_items:
-            values = self.results_panel.tree.item(item, 'values')
-            selected_results.append({
-                'name': values[0],
-                'path': values[1],
-                'size': values[2],
-                'modified': values[3],
-                'type': values[4],
-                'full_path': os.path.join(values[1], values[0])
-            })
             
         filename = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv"), ("Todos los archivos", "*.*")]
-        )
+            defaultextension=".xlsx", filetypes=self.EXPORT_FILETYPES)
         
         if filename:
-            if filename.endswith('.xlsx'):
-                success = Exporter.to_excel(selected_results, filename)
-            else:
-                success = Exporter.to_csv(selected_results, filename)
-            
-            if success:
-                messagebox.showinfo("Éxito", f"Archivos seleccionados exportados a {filename}")
-            else:
-                messagebox.showerror("Error", "No se pudieron exportar los archivos seleccionados")
+            self._start_export(filename, selected_results, False,
+                               f"Archivos seleccionados exportados a {filename}")
+    
+    def _start_export(self, filename, results, live, message):
+        """Escribe `results` en un hilo con StreamingExporter, sin cargarlos en memoria otra vez.
+
+        Con `live`, el exportador queda conectado a la búsqueda y se cierra en
+        _finalize_search.
+        """
+        try:
+            exporter = StreamingExporter(filename)
+        except (ValueError, ImportError, OSError) as e:
+            messagebox.showerror("Error", f"No se pudieron exportar los resultados:\n{str(e)}")
+            return
+        
+        with self.export_lock:
+            # Lo que llegue después de este punto lo escribe el callback de la búsqueda
+            count = len(results)
+            if live:
+                self.live_export = (exporter, message)
+        
+        def write_existing():
+            try:
+                for i in range(count):
+                    exporter.write(results[i])
+            except Exception as e:
+                print(f"Error al exportar: {str(e)}")
+            if not live:
+                self._close_export(exporter, message)
+        
+        self.export_thread = threading.Thread(target=write_existing, daemon=True)
+        self.export_thread.start()
+        self.progress_bar.update_status("Exportando...", "#4e8cff")
+    
+    def _close_export(self, exporter, message):
+        # Llamar fuera del hilo de Tk: cerrar un xlsx grande puede tardar
+        try:
+            exporter.close()
+            self.root.after(0, lambda: messagebox.showinfo(
+                "Éxito", f"{message}\n({exporter.count} filas)"))
+        except Exception as e:
+            error = str(e)  # `e` deja de existir al salir del except
+            self.root.after(0, lambda: messagebox.showerror(
+                "Error", f"No se pudieron exportar los resultados:\n{error}"))
+    
+    def _end_live_export(self):
+        """Cierra la exportación conectada a la búsqueda, si la hay."""
+        with self.export_lock:
+            live_export, self.live_export = self.live_export, None
+        if live_export is not None:
+            export_thread = self.export_thread
+            def finish():
+                export_thread.join()
+                self._close_export(*live_export)
+            threading.Thread(target=finish, daemon=True).start()
     
     def _open_selected_file(self):
-        selected_items = self.results_panel.tree.selection()
-        if not selected_items:
+        selected_results = self.results_panel.selected_results()
+        if not selected_results:
             return
         
-        for item in selected_items:
-            values = self.results_panel.tree.item(item, 'values')
-            full_path = os.path.join(values[1], values[0])
+        for result in selected_results:
+            full_path = result.full_path
             
             if not os.path.exists(full_path):
                 messagebox.showerror("Error", f"El archivo no existe: {full_path}")
@@ -1549,13 +1475,11 @@ class EnhancedFileSearchController:
                     messagebox.showerror("Error", f"No se pudo abrir el archivo: {full_path}")
     
     def _open_file_location(self):
-        selected_items = self.results_panel.tree.selection()
-        if not selected_items:
+        selected_results = self.results_panel.selected_results()
+        if not selected_results:
             return
         
-        item = selected_items[0]
-        values = self.results_panel.tree.item(item, 'values')
-        folder_path = values[1]
+        folder_path = selected_results[0].path
         
         if not os.path.exists(folder_path):
             messagebox.showerror("Error", f"La ubicación no existe: {folder_path}")
@@ -1572,8 +1496,8 @@ class EnhancedFileSearchController:
                 messagebox.showerror("Error", f"No se pudo abrir la ubicación: {folder_path}")
     
     def _copy_selected_files(self):
-        selected_items = self.results_panel.tree.selection()
-        if not selected_items:
+        selected_results = self.results_panel.selected_results()
+        if not selected_results:
             messagebox.showwarning("Advertencia", "No hay archivos seleccionados")
             return
         
@@ -1581,14 +1505,13 @@ class EnhancedFileSearchController:
         if not dest_folder:
             return
         
-        total_files = len(selected_items)
+        total_files = len(selected_results)
         copied_files = 0
         errors = []
         
-        for item in selected_items:
-            values = self.results_panel.tree.item(item, 'values')
-            full_path = os.path.join(values[1], values[0])
-            original_name = values[0]
+        for result in selected_results:
+            full_path = result.full_path
+            original_name = result.name
             
             if not os.path.exists(full_path):
                 errors.append(f"{original_name}: El archivo no existe")
@@ -1617,8 +1540,8 @@ class EnhancedFileSearchController:
         messagebox.showinfo("Resultado", message)
     
     def _copy_with_new_name(self):
-        selected_items = self.results_panel.tree.selection()
-        if not selected_items:
+        selected_results = self.results_panel.selected_results()
+        if not selected_results:
             messagebox.showwarning("Advertencia", "No hay archivos seleccionados")
             return
         
@@ -1630,17 +1553,16 @@ class EnhancedFileSearchController:
         if prefix is None:
             return
         
-        total_files = len(selected_items)
+        total_files = len(selected_results)
         copied_files = 0
         errors = []
         
-        for idx, item in enumerate(selected_items, 1):
-            values = self.results_panel.tree.item(item, 'values')
-            full_path = os.path.join(values[1], values[0])
-            name, ext = os.path.splitext(values[0])
+        for idx, result in enumerate(selected_results, 1):
+            full_path = result.full_path
+            name, ext = os.path.splitext(result.name)
             
             if not os.path.exists(full_path):
-                errors.append(f"{values[0]}: El archivo no existe")
+                errors.append(f"{result.name}: El archivo no existe")
                 continue
             
             new_name = f"{prefix}_{idx}{ext}"
@@ -1650,7 +1572,7 @@ class EnhancedFileSearchController:
                 shutil.copy2(full_path, dest_path)
                 copied_files += 1
             except Exception as e:
-                errors.append(f"{values[0]}: {str(e)}")
+                errors.append(f"{result.name}: {str(e)}")
         
         message = f"Se copiaron {copied_files} de {total_files} archivos."
         if errors:
@@ -1659,15 +1581,16 @@ class EnhancedFileSearchController:
         messagebox.showinfo("Resultado", message)
     
     def _select_all_files(self):
-        self.results_panel.tree.selection_set(self.results_panel.tree.get_children())
+        self.results_panel.select_all()
     
     def _deselect_all_files(self):
-        self.results_panel.tree.selection_set([])
+        self.results_panel.select_none()
     
     def _show_context_menu(self, event):
         item = self.results_panel.tree.identify_row(event.y)
         if item:
-            if not self.results_panel.tree.selection():
+            if not self.results_panel.selected:
+                self.results_panel.selected.add(self.results_panel.result_at(item))
                 self.results_panel.tree.selection_set(item)
             self.context_menu.post(event.x_root, event.y_root)
     
@@ -1681,11 +1604,46 @@ class EnhancedFileSearchController:
         
         if self.after_id:
             self.root.after_cancel(self.after_id)
+        self.searcher.watcher.stop()
+        self.results_panel.pdf_viewer.close()
+        self.results_panel.thumbnail_viewer.cache.close()
         self._save_config()
         self.root.destroy()
 
+# ==================== MEDICIÓN DEL ARRANQUE ====================
+HEAVY_MODULES = ('fitz', 'PIL', 'xlsxwriter', 'pyarrow', 'multiprocessing', 'asyncio')
+STARTUP_BUDGET = 0.5  # segundos para importar Buscador en un proceso nuevo
+
+def measure_startup(repeat=5):
+    """Importa Buscador en procesos nuevos.
+
+    Devuelve el mejor tiempo de importación y las dependencias pesadas que
+    quedaron cargadas (deberían cargarse recién al usarse).
+    """
+    import subprocess
+    code = ("import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import Buscador\n"
+            "print(time.perf_counter() - start)\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    times, loaded = [], set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split('\n')
+        times.append(float(output[0]))
+        loaded.update(name for name in output[1].split(',') if name)
+    return min(times), sorted(loaded)
+
 # ==================== EJECUCIÓN PRINCIPAL ====================
 if __name__ == "__main__":
+    if '--medir-inicio' in sys.argv:
+        # Control de regresiones: falla si el arranque se vuelve lento o carga dependencias pesadas
+        elapsed, loaded = measure_startup()
+        print(f"Importación de Buscador: {elapsed * 1000:.0f} ms (límite {STARTUP_BUDGET * 1000:.0f} ms)")
+        if loaded:
+            print(f"Dependencias cargadas al iniciar: {', '.join(loaded)}")
+        sys.exit(1 if loaded or elapsed > STARTUP_BUDGET else 0)
+    
     root = Tk()
     root.title("🔍 Buscador Avanzado de Archivos (Optimizado)")
     
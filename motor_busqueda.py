@@ -0,0 +1,3577 @@
+"""Motor de búsqueda de archivos del Buscador, sin interfaz gráfica.
+
+Contiene el índice, la caché, los recorridos de disco y la búsqueda en
+contenido que usa Buscador.py, más una API para usarlos desde otros
+programas y una línea de comandos:
+
+    python motor_busqueda.py buscar RUTA -n "informe 2023" -f jsonl
+    python motor_busqueda.py buscar RUTA -t Videos --min-tamano 1G --desde 2024-01-01
+    python motor_busqueda.py buscar RUTA -e .log --primeros 20 --orden grandes
+    python motor_busqueda.py escanear RUTA --contenido
+
+No importa tkinter, PIL ni PyMuPDF al cargarse (PyMuPDF solo al extraer
+texto de un PDF), así que sirve en tareas programadas y servidores.
+"""
+import os
+import sys
+import threading
+import time
+import queue
+import sqlite3
+import hashlib
+import re
+import weakref
+import mmap
+import zlib
+import zipfile
+import errno
+import random
+import heapq
+import select
+import struct
+import ctypes
+import json
+import csv
+import argparse
+import contextlib
+import importlib.util
+import xml.etree.ElementTree as ET
+from stat import S_ISREG
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor, as_completed
+from collections import OrderedDict, defaultdict, deque
+from functools import partial, lru_cache
+from array import array
+from bisect import bisect_right
+
+# ==================== VALIDADOR DE RUTAS ====================
+class PathValidator:
+    @staticmethod
+    def is_safe_path(base_path, target_path):
+        """Verifica que la ruta objetivo esté dentro de la ruta base permitida."""
+        try:
+            base_path = os.path.abspath(base_path)
+            target_path = os.path.abspath(target_path)
+            return os.path.commonpath([base_path, target_path]) == base_path
+        except:
+            return False
+
+    @staticmethod
+    def sanitize_filename(filename):
+        """Limpia un nombre de archivo para que sea seguro."""
+        return re.sub(r'[\\/*?:"<>|]', "_", filename)
+
+# ==================== CONSULTA POR NOMBRE ====================
+class NameQuery:
+    """Consulta de nombre con varios términos.
+
+    Los términos separados por espacios deben aparecer todos (AND) y los
+    grupos separados por '|' son alternativas (OR). Las comillas agrupan
+    frases literales, p. ej.: "informe final" 2023 | acta
+    """
+    def __init__(self, text):
+        self.text = text or ''
+        self.groups = []
+        for part in self.text.lower().split('|'):
+            terms = [quoted or word for quoted, word in re.findall(r'"([^"]+)"|(\S+)', part)]
+            if terms:
+                self.groups.append(terms)
+
+    def __bool__(self):
+        return bool(self.groups)
+
+    def matches(self, name_lower):
+        """Indica si un nombre (en minúsculas) cumple la consulta."""
+        return any(all(term in name_lower for term in terms) for terms in self.groups)
+
+class StatFilter:
+    """Rangos de tamaño (bytes) y de fecha de modificación (epoch) de una búsqueda.
+
+    Los límites inferiores son inclusivos y los superiores exclusivos, como
+    en get_cached_results. Se evalúa con el stat que ya obtuvo el recorrido,
+    antes de crear, guardar o mostrar el resultado.
+    """
+    SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+                  'G': 1024 ** 3, 'GB': 1024 ** 3, 'T': 1024 ** 4, 'TB': 1024 ** 4}
+
+    def __init__(self, min_size=None, max_size=None, modified_after=None, modified_before=None):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+
+    def __bool__(self):
+        return any(limit is not None for limit in
+                   (self.min_size, self.max_size, self.modified_after, self.modified_before))
+
+    def matches(self, size, mtime):
+        return ((self.min_size is None or size >= self.min_size)
+                and (self.max_size is None or size < self.max_size)
+                and (self.modified_after is None or mtime >= self.modified_after)
+                and (self.modified_before is None or mtime < self.modified_before))
+
+    def query_args(self):
+        """Argumentos de get_cached_results: la consulta usa idx_size e idx_modified."""
+        return {'min_size': self.min_size, 'max_size': self.max_size,
+                'modified_after': self.modified_after, 'modified_before': self.modified_before}
+
+    @classmethod
+    def parse_size(cls, text):
+        """Convierte '500K', '10MB' o '2g' en bytes."""
+        match = re.fullmatch(r'\s*(\d+(?:[.,]\d+)?)\s*([a-zA-Z]*)\s*', text)
+        if not match or match.group(2).upper() not in cls.SIZE_UNITS:
+            raise ValueError(f"tamaño no válido: {text} (use p. ej. 500K, 10M, 2G)")
+        return int(float(match.group(1).replace(',', '.')) * cls.SIZE_UNITS[match.group(2).upper()])
+
+    @staticmethod
+    def parse_date(text):
+        """Convierte 'AAAA-MM-DD' en el epoch de esa fecha a las 00:00 (hora local)."""
+        try:
+            return time.mktime(time.strptime(text.strip(), '%Y-%m-%d'))
+        except ValueError:
+            raise ValueError(f"fecha no válida: {text} (use AAAA-MM-DD)") from None
+
+# ==================== RESULTADOS DE BÚSQUEDA ====================
+FILE_TYPES = {
+    'Imágenes': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'],
+    'Documentos': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt'],
+    'Hojas de cálculo': ['.xls', '.xlsx', '.csv', '.ods'],
+    'Presentaciones': ['.ppt', '.pptx', '.odp'],
+    'Videos': ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'],
+    'Audio': ['.mp3', '.wav', '.ogg', '.flac', '.aac'],
+    'Archivos comprimidos': ['.zip', '.rar', '.7z', '.tar', '.gz'],
+    'Ejecutables': ['.exe', '.msi', '.bat', '.sh'],
+    'Código fuente': ['.py', '.java', '.cpp', '.c', '.h', '.html', '.css', '.js']
+}
+TYPE_NAMES = list(FILE_TYPES) + ["Otro"]
+TYPE_CODES = {ext: code for code, exts in enumerate(FILE_TYPES.values()) for ext in exts}
+OTHER_TYPE_CODE = len(TYPE_NAMES) - 1
+
+class PathTable:
+    """Tabla de carpetas: cada ruta se guarda una sola vez y la comparten sus resultados.
+
+    Las entradas son débiles: cuando ya no queda ningún resultado de una
+    carpeta desaparece de la tabla, así no crece con cada búsqueda.
+    """
+    class Folder:
+        __slots__ = ('path', '__weakref__')
+
+        def __init__(self, path):
+            self.path = path
+
+    def __init__(self):
+        self._folders = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._folders)
+
+    def intern(self, path):
+        folder = self._folders.get(path)
+        if folder is None:
+            with self._lock:
+                folder = self._folders.get(path)
+                if folder is None:
+                    folder = self.Folder(path)
+                    self._folders[path] = folder
+        return folder
+
+class FileResult:
+    """Resultado de búsqueda compacto con los valores crudos de stat.
+
+    Guarda tamaño en bytes, mtime, código de tipo y la carpeta; el
+    texto para mostrar (tamaño legible, fecha) solo se genera al visualizar o
+    exportar.
+    """
+    __slots__ = ('folder', 'name', 'size', 'mtime', 'type_code')
+    paths = PathTable()
+
+    def __init__(self, path, name, size, mtime, type_code=None):
+        self.folder = self.paths.intern(path)
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.type_code = self.type_code_for(name) if type_code is None else type_code
+
+    @staticmethod
+    def type_code_for(name):
+        """Código de tipo a partir de la extensión del nombre."""
+        return TYPE_CODES.get(os.path.splitext(name.lower())[1], OTHER_TYPE_CODE)
+
+    @staticmethod
+    def format_size(size):
+        """Formatea el tamaño del archivo para mostrarlo."""
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if size < 1024.0:
+                return f"{size:.1f} {unit}"
+            size /= 1024.0
+        return f"{size:.1f} TB"
+
+    @staticmethod
+    def format_time(mtime):
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mtime))
+
+    @property
+    def path(self):
+        return self.folder.path
+
+    @property
+    def full_path(self):
+        return os.path.join(self.path, self.name)
+
+    @property
+    def type(self):
+        return TYPE_NAMES[self.type_code]
+
+    def as_row(self):
+        """Valores para el Treeview: nombre, ruta, tamaño, fecha y tipo."""
+        return (self.name, self.path, self.format_size(self.size),
+                self.format_time(self.mtime), self.type)
+
+    def as_dict(self):
+        """Diccionario con los campos formateados (exportación)."""
+        return {
+            'name': self.name,
+            'path': self.path,
+            'size': self.format_size(self.size),
+            'modified': self.format_time(self.mtime),
+            'type': self.type,
+            'full_path': self.full_path
+        }
+
+    def as_record(self):
+        """Diccionario con los valores crudos (bytes, mtime) para salida procesable."""
+        return {
+            'name': self.name,
+            'path': self.path,
+            'full_path': self.full_path,
+            'size': self.size,
+            'mtime': self.mtime,
+            'modified': self.format_time(self.mtime),
+            'type': self.type
+        }
+
+class TopK:
+    """Los `k` mejores resultados según un orden, en un heap acotado.
+
+    La raíz del heap es el peor de los conservados: cada candidato se compara
+    solo con ella y la memoria no pasa de `k` resultados aunque coincidan
+    millones de archivos. Los empates se resuelven por ruta completa, así el
+    resultado no depende del orden en que aparecieron los archivos.
+    """
+    ORDERS = {
+        'recientes': lambda result: (-result.mtime, result.full_path),
+        'antiguos': lambda result: (result.mtime, result.full_path),
+        'grandes': lambda result: (-result.size, result.full_path),
+        'pequeños': lambda result: (result.size, result.full_path),
+        'nombre': lambda result: (result.name.lower(), result.full_path),
+    }
+
+    class Entry:
+        __slots__ = ('key', 'result')
+
+        def __init__(self, key, result):
+            self.key = key
+            self.result = result
+
+        def __lt__(self, other):
+            return other.key < self.key  # invertido: la raíz es la clave mayor (la peor)
+
+    def __init__(self, k, order='recientes'):
+        if order not in self.ORDERS:
+            raise ValueError(f"orden no válido: {order}")
+        self.k = k
+        self.order = order
+        self.key = self.ORDERS[order]
+        self.heap = []
+        self.members = {}  # (carpeta, nombre) -> Entry, para no repetir un archivo
+
+    def __len__(self):
+        return len(self.heap)
+
+    @property
+    def full(self):
+        return len(self.heap) >= self.k
+
+    def offer(self, result):
+        """Considera un resultado; devuelve True si quedó entre los `k` mejores.
+
+        Si el archivo ya estaba con otros datos (otra fase lo vio después de
+        un cambio), vale el último.
+        """
+        ident = (result.folder, result.name)
+        entry = self.Entry(self.key(result), result)
+        current = self.members.get(ident)
+        if current is not None:
+            if current.key == entry.key:
+                return False
+            self.heap.remove(current)
+            heapq.heapify(self.heap)
+            del self.members[ident]
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry.key < self.heap[0].key:
+            worst = heapq.heapreplace(self.heap, entry)
+            del self.members[(worst.result.folder, worst.result.name)]
+        else:
+            return False
+        self.members[ident] = entry
+        return True
+
+    def clear(self):
+        self.heap.clear()
+        self.members.clear()
+
+    def results(self):
+        """Los resultados conservados, del mejor al peor."""
+        return [entry.result for entry in sorted(self.heap, key=lambda entry: entry.key)]
+
+# ==================== BUSCADOR DE CONTENIDO ====================
+class AhoCorasick:
+    """Autómata Aho-Corasick para buscar muchos literales en una sola pasada."""
+    def __init__(self, literals):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+        for idx, literal in enumerate(literals):
+            state = 0
+            for ch in literal:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                state = next_state
+            self.output[state].add(idx)
+        
+        # Enlaces de fallo por anchura
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] |= self.output[self.fail[next_state]]
+
+    def search(self, text, found, wanted):
+        """Añade a `found` los índices de literales presentes en `text`.
+
+        Se detiene en cuanto `found` alcanza `wanted` elementos.
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found |= output[state]
+                if len(found) >= wanted:
+                    break
+        return found
+
+# ==================== EXTRACCIÓN DE TEXTO ====================
+class TextExtractor:
+    """Extrae el texto de formatos contenedores para la búsqueda en contenido.
+
+    Un PDF (flujos comprimidos) o un DOCX/XLSX (zip con XML) no contienen el
+    texto en bruto, así que se extrae con el extractor registrado para su
+    extensión en `extractors`. El texto se guarda comprimido en `cache_db`
+    con clave ruta + mtime + tamaño, y las búsquedas siguientes lo reutilizan
+    mientras el archivo no cambie.
+    """
+    extractors = {}
+
+    def __init__(self, cache_db="file_search_cache.db"):
+        self.cache_db = cache_db
+        # Una conexión por hilo: el matcher en caché lo comparten todas las búsquedas
+        # y sqlite3 no permite usar una conexión desde otro hilo
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Las conexiones no se envían a los procesos del pool: cada uno abre las suyas
+        return {'cache_db': self.cache_db}
+
+    def __setstate__(self, state):
+        self.__init__(state['cache_db'])
+
+    @classmethod
+    def register(cls, extension, extract):
+        """Registra una función `extract(ruta)` que genera fragmentos de texto."""
+        cls.extractors[extension.lower()] = extract
+
+    def handles(self, file_path):
+        return os.path.splitext(file_path)[1].lower() in self.extractors
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.cache_db, timeout=30)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extracted_text (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    text BLOB NOT NULL
+                )
+            """)
+        return conn
+
+    def extract(self, file_path):
+        """Texto del archivo sin consultar ni llenar la caché; None si no hay extractor."""
+        extract = self.extractors.get(os.path.splitext(file_path)[1].lower())
+        if extract is None:
+            return None
+        return '\n'.join(extract(file_path))
+
+    def get_text(self, file_path):
+        """Texto del archivo, desde la caché si no cambió; None si no hay extractor.
+
+        Los archivos ya escaneados en el índice de contenido (ContentIndex)
+        se leen de ahí, para no guardar dos copias del mismo texto.
+        """
+        if not self.handles(file_path):
+            return None
+        stat = os.stat(file_path)
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT text FROM extracted_text WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (file_path, stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row:
+            return zlib.decompress(row[0]).decode('utf-8')
+        try:
+            row = conn.execute(
+                "SELECT content FROM content_files WHERE path = ? AND size = ? AND mtime = ?",
+                (file_path, stat.st_size, int(stat.st_mtime))).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # base sin índice de contenido
+        if row:
+            return row[0]
+        
+        text = self.extract(file_path)
+        conn.execute("INSERT OR REPLACE INTO extracted_text VALUES (?, ?, ?, ?)",
+                     (file_path, stat.st_size, stat.st_mtime_ns, zlib.compress(text.encode('utf-8'))))
+        conn.commit()
+        return text
+
+    @staticmethod
+    def _local_name(tag):
+        return tag.rsplit('}', 1)[-1]
+
+    @staticmethod
+    def extract_pdf(file_path):
+        """Texto de cada página con PyMuPDF."""
+        import fitz  # PyMuPDF, solo si hay PDFs que leer
+        with fitz.open(file_path) as doc:
+            for page in doc:
+                yield page.get_text()
+
+    @staticmethod
+    def extract_docx(file_path):
+        """Párrafos del cuerpo, encabezados y pies, leyendo el XML en streaming."""
+        with zipfile.ZipFile(file_path) as zf:
+            names = zf.namelist()
+            members = [n for n in names if n == 'word/document.xml'
+                       or re.match(r'word/(header|footer)\d*\.xml$', n)]
+            for member in members:
+                with zf.open(member) as stream:
+                    parts = []
+                    for _, elem in ET.iterparse(stream):
+                        tag = TextExtractor._local_name(elem.tag)
+                        if tag == 't' and elem.text:
+                            parts.append(elem.text)
+                        elif tag == 'p':
+                            yield ''.join(parts)
+                            parts = []
+                            elem.clear()
+                    if parts:
+                        yield ''.join(parts)
+
+    @staticmethod
+    def extract_xlsx(file_path):
+        """Cadenas compartidas y valores de celdas de todas las hojas, en streaming."""
+        with zipfile.ZipFile(file_path) as zf:
+            names = zf.namelist()
+            if 'xl/sharedStrings.xml' in names:
+                with zf.open('xl/sharedStrings.xml') as stream:
+                    parts = []
+                    for _, elem in ET.iterparse(stream):
+                        tag = TextExtractor._local_name(elem.tag)
+                        if tag == 't' and elem.text:
+                            parts.append(elem.text)
+                        elif tag == 'si':
+                            yield ''.join(parts)
+                            parts = []
+                            elem.clear()
+            sheets = sorted(n for n in names if n.startswith('xl/worksheets/') and n.endswith('.xml'))
+            for member in sheets:
+                with zf.open(member) as stream:
+                    for _, elem in ET.iterparse(stream):
+                        tag = TextExtractor._local_name(elem.tag)
+                        if tag == 'c':
+                            # Las celdas 's' apuntan a cadenas compartidas, ya emitidas
+                            if elem.get('t') != 's':
+                                values = [e.text for e in elem.iter()
+                                          if e.text and TextExtractor._local_name(e.tag) in ('v', 't')]
+                                if values:
+                                    yield ' '.join(values)
+                            elem.clear()
+                        elif tag == 'row':
+                            elem.clear()
+
+TextExtractor.register('.pdf', TextExtractor.extract_pdf)
+TextExtractor.register('.docx', TextExtractor.extract_docx)
+TextExtractor.register('.xlsx', TextExtractor.extract_xlsx)
+
+class ContentMatcher:
+    """Criterio de búsqueda en contenido, compilado una sola vez.
+
+    Un patrón formado solo por literales separados por '|' se resuelve sin
+    regex: con `in` (búsqueda de subcadenas en C, más rápida que una regex
+    con alternativas) y con Aho-Corasick solo si son cientos. Con
+    `match_all` el archivo debe contener todos los literales, no uno.
+    Cualquier otro patrón se compila como regex. Los archivos se recorren con mmap en
+    ventanas de CHUNK_SIZE que se solapan, para no perder coincidencias que
+    crucen el borde entre dos ventanas. El objeto es serializable para
+    enviarlo a los procesos de búsqueda. Si se indica un TextExtractor, los
+    formatos que soporta (PDF, DOCX, XLSX...) se buscan sobre su texto
+    extraído en lugar de sobre los bytes del archivo.
+    """
+    CHUNK_SIZE = 1024 * 1024
+    REGEX_OVERLAP = 4096  # longitud máxima esperada de una coincidencia regex
+    AHO_CORASICK_MIN = 200  # a partir de cuántos literales el autómata supera a `in`
+    REGEX_CHARS = set('.^$*+?{}[]\\()')
+
+    def __init__(self, pattern=None, literals=None, match_all=False, extractor=None):
+        self.extractor = extractor
+        self.regex = None
+        self.literals = None
+        self.automaton = None
+        if literals is None and pattern and not self.REGEX_CHARS.intersection(pattern):
+            literals = [part for part in pattern.split('|') if part]
+        
+        if literals:
+            self.literals = [literal.lower() for literal in literals]
+            self.wanted = len(self.literals) if match_all else 1
+            self.overlap = max(len(literal.encode('utf-8')) for literal in self.literals)
+            if len(self.literals) >= self.AHO_CORASICK_MIN:
+                self.automaton = AhoCorasick(self.literals)
+        else:
+            self.regex = re.compile(pattern or '', re.IGNORECASE)
+            self.wanted = 1
+            self.overlap = self.REGEX_OVERLAP
+
+    def _windows(self, file_path):
+        """Genera el texto del archivo en ventanas solapadas sobre un mmap."""
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos = 0
+                while True:
+                    yield mm[pos:pos + self.CHUNK_SIZE + self.overlap].decode('utf-8', errors='ignore')
+                    if pos + self.CHUNK_SIZE + self.overlap >= size:
+                        break
+                    pos += self.CHUNK_SIZE
+
+    def find_in_text(self, text, found):
+        """Añade a `found` lo que coincide en `text` (índices de literal, o 0 para regex)."""
+        if self.regex is not None:
+            if self.regex.search(text):
+                found.add(0)
+        elif self.automaton is not None:
+            self.automaton.search(text.lower(), found, self.wanted)
+        else:
+            text = text.lower()
+            for idx, literal in enumerate(self.literals):
+                if idx not in found and literal in text:
+                    found.add(idx)
+                    if len(found) >= self.wanted:
+                        break
+        return found
+
+    def find_in_file(self, file_path):
+        """Conjunto de coincidencias en el archivo (índices de literal, o {0} para regex)."""
+        found = set()
+        if self.extractor is not None and self.extractor.handles(file_path):
+            try:
+                return self.find_in_text(self.extractor.get_text(file_path), found)
+            except Exception as e:
+                # Archivo dañado o no soportado: se busca en los bytes
+                print(f"No se pudo extraer el texto de {file_path}: {str(e)}")
+        for text in self._windows(file_path):
+            if len(self.find_in_text(text, found)) >= self.wanted:
+                break
+        return found
+
+    def matches_file(self, file_path):
+        try:
+            return len(self.find_in_file(file_path)) >= self.wanted
+        except Exception as e:
+            print(f"Error buscando en {file_path}: {str(e)}")
+            return False
+
+class ContentSearcher:
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def get_matcher(pattern, match_all=False):
+        """Devuelve el ContentMatcher de un patrón, compilado una sola vez."""
+        return ContentMatcher(pattern, match_all=match_all, extractor=TextExtractor())
+
+    @staticmethod
+    def search_in_file(file_path, pattern):
+        """Busca un patrón (regex o literales separados por '|') en un archivo."""
+        return ContentSearcher.get_matcher(pattern).matches_file(file_path)
+
+    @staticmethod
+    def match_file(matcher, file_path):
+        """Punto de entrada de los procesos del pool (debe ser importable)."""
+        return matcher.matches_file(file_path)
+
+# ==================== EXPORTADOR DE RESULTADOS ====================
+class StreamingExporter:
+    """Escribe resultados fila por fila mientras la búsqueda sigue en curso.
+
+    La memoria queda acotada por el tamaño de una fila (o de un grupo de
+    filas en Parquet), no por la cantidad de resultados. Formatos:
+
+    - csv y jsonl: a un archivo o a cualquier flujo de texto (p. ej. stdout).
+    - xlsx: xlsxwriter en modo constant_memory u openpyxl en modo
+      write_only; al llegar al límite de filas de Excel se abre otra hoja y
+      al cerrar se agrega la hoja de estadísticas por tipo.
+    - parquet: pyarrow, un grupo de filas cada PARQUET_ROW_GROUP resultados.
+
+    write() se puede llamar desde varios hilos.
+    """
+    FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.xlsx': 'xlsx', '.parquet': 'parquet'}
+    FIELDS = ['name', 'path', 'full_path', 'size', 'mtime', 'modified', 'type']
+    REQUIREMENTS = {'xlsx': ('xlsxwriter', 'openpyxl'), 'parquet': ('pyarrow',)}  # basta con uno
+    PARQUET_ROW_GROUP = 10000
+    XLSX_MAX_ROWS = 1048576  # filas por hoja en Excel, incluida la cabecera
+
+    def __init__(self, target, fmt=None):
+        """`target` es una ruta de archivo o, para csv/jsonl, un flujo de texto abierto."""
+        self.fmt = fmt or self.format_for(target)
+        if self.fmt not in self.FORMATS.values():
+            raise ValueError(f"Formato de exportación no soportado: {self.fmt}")
+        self.count = 0
+        self.stats = {}  # tipo -> [cantidad, bytes, mtime mínimo, mtime máximo]
+        self._lock = threading.Lock()
+        self._owns_stream = isinstance(target, (str, os.PathLike))
+        getattr(self, f'_open_{self.fmt}')(target)
+
+    @classmethod
+    def format_for(cls, filename):
+        fmt = cls.FORMATS.get(os.path.splitext(str(filename))[1].lower())
+        if fmt is None:
+            raise ValueError(f"Formato de exportación no soportado: {filename}")
+        return fmt
+
+    @classmethod
+    def check_available(cls, fmt):
+        """Lanza ImportError si no está instalado ninguno de los módulos que requiere `fmt`.
+
+        Solo busca los módulos, sin importarlos.
+        """
+        modules = cls.REQUIREMENTS.get(fmt)
+        if modules and not any(importlib.util.find_spec(module) for module in modules):
+            raise ImportError(f"Exportar a {fmt} requiere {' u '.join(modules)}")
+
+    def write(self, result):
+        record = result.as_record()
+        with self._lock:
+            self._write(record)
+            self.count += 1
+            stats = self.stats.get(record['type'])
+            if stats is None:
+                self.stats[record['type']] = [1, record['size'], record['mtime'], record['mtime']]
+            else:
+                stats[0] += 1
+                stats[1] += record['size']
+                stats[2] = min(stats[2], record['mtime'])
+                stats[3] = max(stats[3], record['mtime'])
+
+    def write_all(self, results):
+        for result in results:
+            self.write(result)
+        return self.count
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open_text(self, target):
+        if self._owns_stream:
+            self.stream = open(target, 'w', newline='', encoding='utf-8')
+        else:
+            self.stream = target
+        # En un flujo ajeno (p. ej. una tubería) cada fila se entrega en cuanto llega
+        self._flush = not self._owns_stream
+
+    def _close_text(self):
+        if self._owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+    def _open_csv(self, target):
+        self._open_text(target)
+        self._csv = csv.DictWriter(self.stream, fieldnames=self.FIELDS)
+        self._csv.writeheader()
+
+    def _write_csv(self, record):
+        self._csv.writerow(record)
+        if self._flush:
+            self.stream.flush()
+
+    _open_jsonl = _open_text
+    _close_csv = _close_jsonl = _close_text
+
+    def _write_jsonl(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        if self._flush:
+            self.stream.flush()
+
+    def _open_xlsx(self, filename):
+        try:
+            import xlsxwriter
+            self._workbook = xlsxwriter.Workbook(filename, {'constant_memory': True})
+            self._add_sheet = lambda title: self._workbook.add_worksheet(title)
+            self._append = lambda sheet, values: sheet.write_row(self._sheet_rows, 0, values)
+            self._save = self._workbook.close
+        except ImportError:
+            from openpyxl import Workbook
+            self._workbook = Workbook(write_only=True)
+            self._add_sheet = self._workbook.create_sheet
+            self._append = lambda sheet, values: sheet.append(values)
+            self._save = lambda: self._workbook.save(filename)
+        self._sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self._sheets += 1
+        title = 'Resultados' if self._sheets == 1 else f'Resultados {self._sheets}'
+        self._sheet = self._add_sheet(title)
+        self._sheet_rows = 0
+        self._append(self._sheet, self.FIELDS)
+        self._sheet_rows = 1
+
+    def _write_xlsx(self, record):
+        if self._sheet_rows >= self.XLSX_MAX_ROWS:
+            self._new_sheet()
+        self._append(self._sheet, [record[field] for field in self.FIELDS])
+        self._sheet_rows += 1
+
+    def _close_xlsx(self):
+        sheet = self._add_sheet('Estadísticas')
+        self._sheet_rows = 0
+        for values in [['Tipo', 'Cantidad', 'Tamaño Total (KB)', 'Fecha Mínima', 'Fecha Máxima']] + [
+                [file_type, count, round(size / 1024, 1),
+                 FileResult.format_time(oldest), FileResult.format_time(newest)]
+                for file_type, (count, size, oldest, newest) in sorted(self.stats.items())]:
+            self._append(sheet, values)
+            self._sheet_rows += 1
+        self._save()
+
+    def _open_parquet(self, filename):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._schema = pa.schema([
+            ('name', pa.string()), ('path', pa.string()), ('full_path', pa.string()),
+            ('size', pa.int64()), ('mtime', pa.float64()), ('modified', pa.string()),
+            ('type', pa.string())])
+        self._parquet = pq.ParquetWriter(filename, self._schema)
+        self._columns = {field: [] for field in self.FIELDS}
+
+    def _write_parquet(self, record):
+        for field, values in self._columns.items():
+            values.append(record[field])
+        if len(self._columns['name']) >= self.PARQUET_ROW_GROUP:
+            self._flush_parquet()
+
+    def _flush_parquet(self):
+        if self._columns['name']:
+            self._parquet.write_table(self._pa.Table.from_pydict(self._columns, schema=self._schema))
+            self._columns = {field: [] for field in self.FIELDS}
+
+    def _close_parquet(self):
+        self._flush_parquet()
+        self._parquet.close()
+
+    def _write(self, record):
+        getattr(self, f'_write_{self.fmt}')(record)
+
+    def _close(self):
+        getattr(self, f'_close_{self.fmt}')()
+
+# ==================== CACHÉ DE BASE DE DATOS MEJORADO ====================
+class EnhancedFileCacheDB:
+    SCHEMA_VERSION = 2  # 2: size en bytes y modified como entero
+    REFRESH_INTERVAL = 24 * 3600  # reescritura mínima de last_scanned sin cambios
+    
+    def __init__(self):
+        self.db_path = "file_search_cache.db"
+        self._init_db()
+    
+    def _connect(self):
+        """Abre una conexión con los pragmas por conexión ajustados para cargas masivas."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-65536")  # 64MB cache
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            
+            cursor = conn.cursor()
+            # Tabla principal
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS file_cache (
+                    path_hash TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    modified INTEGER NOT NULL,
+                    type TEXT NOT NULL,
+                    full_path TEXT NOT NULL,
+                    last_scanned REAL NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            """)
+            
+            # Columna de extensión (bases creadas por versiones anteriores no la tienen)
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(file_cache)")]
+            if 'ext' not in columns:
+                cursor.execute("ALTER TABLE file_cache ADD COLUMN ext TEXT NOT NULL DEFAULT ''")
+                # Las filas existentes quedan con ext vacía: calcularla para que los
+                # filtros por extensión o tipo no las descarten
+                conn.create_function('file_ext', 1, lambda name: os.path.splitext(name.lower())[1],
+                                     deterministic=True)
+                cursor.execute("UPDATE file_cache SET ext = file_ext(name)")
+            
+            # Versiones anteriores guardaban el tamaño en KB y la fecha como REAL
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version < 2:
+                cursor.execute("""
+                    UPDATE file_cache
+                    SET size = CAST(ROUND(size * 1024) AS INTEGER),
+                        modified = CAST(modified AS INTEGER)
+                """)
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            
+            # Tabla FTS5 (trigramas sobre el nombre) sincronizada con file_cache por triggers
+            self._init_fts(cursor)
+            
+            # Índices adicionales
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_size ON file_cache(size)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_modified ON file_cache(modified)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_path ON file_cache(path)")
+            
+            # Índice persistente de carpetas/archivos (escaneo incremental por mtime)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS index_dirs (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT NOT NULL,
+                    mtime REAL NOT NULL,
+                    scanned_at REAL NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS index_files (
+                    dir TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    PRIMARY KEY (dir, name)
+                ) WITHOUT ROWID
+            """)
+            # Generación del índice: cambia con cada modificación y valida la instantánea
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS index_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("INSERT OR IGNORE INTO index_meta VALUES ('generation', ?)",
+                           (random.getrandbits(62),))
+            conn.commit()
+    
+    def _init_fts(self, cursor):
+        """Crea la tabla FTS5 de nombres y los triggers que la mantienen al día.
+
+        Se usa el tokenizador trigram para poder buscar subcadenas. Si la
+        tabla existe con otro tokenizador (versiones anteriores nunca la
+        poblaban) se recrea y se reconstruye desde file_cache. Si SQLite no
+        soporta trigram, las búsquedas por nombre usan LIKE.
+        """
+        row = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'file_cache_fts'").fetchone()
+        if row and 'trigram' in row[0]:
+            self.fts_enabled = True
+            return
+        
+        for trigger in ('file_cache_ai', 'file_cache_ad', 'file_cache_au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute("DROP TABLE IF EXISTS file_cache_fts")
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE file_cache_fts
+                USING fts5(name, content=file_cache, tokenize='trigram')
+            """)
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+            return
+        
+        cursor.executescript("""
+            CREATE TRIGGER file_cache_ai AFTER INSERT ON file_cache BEGIN
+                INSERT INTO file_cache_fts(rowid, name) VALUES (new.rowid, new.name);
+            END;
+            CREATE TRIGGER file_cache_ad AFTER DELETE ON file_cache BEGIN
+                INSERT INTO file_cache_fts(file_cache_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+            END;
+            CREATE TRIGGER file_cache_au AFTER UPDATE OF name ON file_cache BEGIN
+                INSERT INTO file_cache_fts(file_cache_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+                INSERT INTO file_cache_fts(rowid, name) VALUES (new.rowid, new.name);
+            END;
+        """)
+        cursor.execute("INSERT INTO file_cache_fts(file_cache_fts) VALUES ('rebuild')")
+        self.fts_enabled = True
+    
+    @staticmethod
+    def _subtree_bounds(root):
+        """Límites [inferior, superior) de las rutas que cuelgan de root.
+
+        Permite filtrar un subárbol con un rango sobre un índice en lugar de
+        LIKE, que no escapa '%' ni '_' presentes en los nombres de carpeta.
+        """
+        prefix = root.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+    
+    def _name_filter(self, name_query):
+        """Traduce un NameQuery a una condición SQL sobre file_cache (fc)."""
+        group_sql, params = [], []
+        for terms in name_query.groups:
+            conditions = []
+            long_terms = [t for t in terms if len(t) >= 3] if self.fts_enabled else []
+            if long_terms:
+                conditions.append(
+                    "fc.rowid IN (SELECT rowid FROM file_cache_fts WHERE file_cache_fts MATCH ?)")
+                params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in long_terms))
+            for term in terms:
+                if term not in long_terms:
+                    conditions.append("fc.name LIKE ? ESCAPE '\\'")
+                    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                    params.append(f"%{escaped}%")
+            group_sql.append("(" + " AND ".join(conditions) + ")")
+        return "(" + " OR ".join(group_sql) + ")", params
+    
+    # Órdenes de TopK que se pueden resolver en SQL (con idx_modified / idx_size).
+    # El nombre no: lower() de SQLite solo convierte ASCII y no coincidiría con Python.
+    ORDER_CLAUSES = {
+        'recientes': "fc.modified DESC, fc.full_path",
+        'antiguos': "fc.modified ASC, fc.full_path",
+        'grandes': "fc.size DESC, fc.full_path",
+        'pequeños': "fc.size ASC, fc.full_path",
+    }
+    
+    def _cached_conditions(self, path, max_age_days):
+        cutoff_time = time.time() - (max_age_days * 24 * 3600)
+        prefix, upper = self._subtree_bounds(path)
+        return (["(fc.path = ? OR (fc.path >= ? AND fc.path < ?))", "fc.last_scanned > ?"],
+                [path, prefix, upper, cutoff_time])
+    
+    def count_indexed_cached(self, path, max_age_days=7):
+        """Cantidad de archivos indexados bajo `path` que tienen fila vigente en caché.
+
+        Se cruza con index_files: filas de archivos que ya no están en el
+        índice (p. ej. borrados antes de vigilar la carpeta) no cuentan.
+        """
+        conditions, params = self._cached_conditions(path, max_age_days)
+        with self._connect() as conn:
+            return conn.execute(f"""
+                SELECT COUNT(*) FROM index_files i
+                JOIN file_cache fc ON fc.path = i.dir AND fc.name = i.name
+                WHERE {' AND '.join(conditions)}
+            """, params).fetchone()[0]
+    
+    def get_cached_results(self, path, name_query=None, extension=None, type_extensions=None,
+                           min_size=None, max_size=None, modified_after=None, modified_before=None,
+                           max_age_days=7, page_size=1000, order=None):
+        """Genera los FileResult en caché bajo `path` con los filtros resueltos en SQL.
+
+        Nombre (FTS5 trigram), extensión, tipo, tamaño (bytes) y fecha de
+        modificación se filtran en la consulta; las filas se leen por páginas
+        de `page_size` en orden de rowid, sin límite total. Con `order` (clave
+        de ORDER_CLAUSES) salen en ese orden, así quien las consume puede
+        dejar de leer al tener los primeros que necesita.
+        """
+        conditions, params = self._cached_conditions(path, max_age_days)
+        
+        if name_query:
+            sql, name_params = self._name_filter(name_query)
+            conditions.append(sql)
+            params.extend(name_params)
+        if extension:
+            conditions.append("fc.ext = ?")
+            params.append(extension)
+        if type_extensions:
+            conditions.append(f"fc.ext IN ({', '.join('?' * len(type_extensions))})")
+            params.extend(type_extensions)
+        if min_size is not None:
+            conditions.append("fc.size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            conditions.append("fc.size < ?")
+            params.append(max_size)
+        if modified_after is not None:
+            conditions.append("fc.modified >= ?")
+            params.append(modified_after)
+        if modified_before is not None:
+            conditions.append("fc.modified < ?")
+            params.append(modified_before)
+        
+        if order is not None:
+            query = f"""
+                SELECT fc.path, fc.name, fc.size, fc.modified
+                FROM file_cache fc
+                WHERE {' AND '.join(conditions)}
+                ORDER BY {self.ORDER_CLAUSES[order]}
+                LIMIT ? OFFSET ?
+            """
+            offset = 0
+            with self._connect() as conn:
+                while True:
+                    rows = conn.execute(query, params + [page_size, offset]).fetchall()
+                    for dir_path, name, size, modified in rows:
+                        yield FileResult(dir_path, name, size, modified)
+                    if len(rows) < page_size:
+                        return
+                    offset += page_size
+        
+        query = f"""
+            SELECT fc.rowid, fc.path, fc.name, fc.size, fc.modified
+            FROM file_cache fc
+            WHERE {' AND '.join(conditions)} AND fc.rowid > ?
+            ORDER BY fc.rowid
+            LIMIT ?
+        """
+        last_rowid = 0
+        with self._connect() as conn:
+            while True:
+                rows = conn.execute(query, params + [last_rowid, page_size]).fetchall()
+                for last_rowid, dir_path, name, size, modified in rows:
+                    yield FileResult(dir_path, name, size, modified)
+                if len(rows) < page_size:
+                    break
+    
+    def update_cache(self, results):
+        """Guarda los resultados en la caché con un upsert masivo en una sola transacción.
+
+        `results` son FileResult: se almacenan el tamaño en bytes y el mtime
+        entero tal como los entrega stat. Las filas existentes solo se
+        reescriben si cambió su tamaño o fecha, o si su last_scanned tiene
+        más de REFRESH_INTERVAL (para que no caduquen en get_cached_results).
+        """
+        current_time = time.time()
+        
+        def rows():
+            for result in results:
+                try:
+                    full_path = result.full_path
+                    yield (
+                        hashlib.md5(full_path.encode()).hexdigest(), result.path, result.name,
+                        int(result.size), int(result.mtime), result.type, full_path,
+                        current_time, current_time, os.path.splitext(result.name.lower())[1]
+                    )
+                except Exception as e:
+                    print(f"Error actualizando caché para {result.name}: {str(e)}")
+        
+        with self._connect() as conn:
+            # Upsert (no REPLACE) para que los triggers de FTS vean un UPDATE
+            conn.executemany(f"""
+                INSERT INTO file_cache
+                    (path_hash, path, name, size, modified, type, full_path,
+                     last_scanned, indexed_at, ext)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path_hash) DO UPDATE SET
+                    path = excluded.path, name = excluded.name, size = excluded.size,
+                    modified = excluded.modified, type = excluded.type,
+                    full_path = excluded.full_path, last_scanned = excluded.last_scanned,
+                    ext = excluded.ext
+                WHERE file_cache.size != excluded.size
+                   OR file_cache.modified != excluded.modified
+                   OR file_cache.last_scanned < excluded.last_scanned - {self.REFRESH_INTERVAL}
+            """, rows())
+            conn.commit()
+    
+    def get_index_dirs(self, root):
+        """Devuelve {carpeta: (padre, mtime)} de las carpetas indexadas bajo root."""
+        prefix, upper = self._subtree_bounds(root)
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                SELECT path, parent, mtime FROM index_dirs
+                WHERE path = ? OR (path >= ? AND path < ?)
+            """, (root, prefix, upper))
+            return {path: (parent, mtime) for path, parent, mtime in cursor}
+    
+    def index_generation(self):
+        """Identificador del estado actual del índice persistente."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()
+            return row[0] if row else 0
+    
+    @staticmethod
+    def _bump_index_generation(conn):
+        # Aleatoria y no un contador: una base recreada no repite una generación vieja
+        conn.execute("UPDATE index_meta SET value = ? WHERE key = 'generation'",
+                     (random.getrandbits(62),))
+    
+    def update_index_dirs(self, changes, removed=()):
+        """Guarda las carpetas re-listadas y elimina las desaparecidas en una sola transacción.
+
+        `changes` es una lista de (carpeta, padre, mtime, nombres_de_archivo).
+        """
+        now = time.time()
+        with self._connect() as conn:
+            if changes or removed:
+                self._bump_index_generation(conn)
+            for path in removed:
+                conn.execute("DELETE FROM index_dirs WHERE path = ?", (path,))
+                conn.execute("DELETE FROM index_files WHERE dir = ?", (path,))
+            for path, parent, mtime, names in changes:
+                conn.execute("INSERT OR REPLACE INTO index_dirs VALUES (?, ?, ?, ?)",
+                             (path, parent, mtime, now))
+                conn.execute("DELETE FROM index_files WHERE dir = ?", (path,))
+                conn.executemany("INSERT OR IGNORE INTO index_files VALUES (?, ?)",
+                                 ((path, name) for name in names))
+            conn.commit()
+    
+    def apply_index_changes(self, dir_rows=(), added=(), removed=(), removed_trees=()):
+        """Aplica cambios puntuales al índice persistente en una sola transacción.
+
+        `dir_rows` son (carpeta, padre, mtime) actualizados, `added` y
+        `removed` son (carpeta, nombre) y `removed_trees` carpetas eliminadas
+        con todo su contenido; las bajas también salen de file_cache.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            self._bump_index_generation(conn)
+            for tree in removed_trees:
+                prefix, upper = self._subtree_bounds(tree)
+                for table, column in (('index_dirs', 'path'), ('index_files', 'dir'), ('file_cache', 'path')):
+                    conn.execute(f"DELETE FROM {table} WHERE {column} = ? OR ({column} >= ? AND {column} < ?)",
+                                 (tree, prefix, upper))
+            conn.executemany("DELETE FROM index_files WHERE dir = ? AND name = ?", removed)
+            conn.executemany("DELETE FROM file_cache WHERE path_hash = ?",
+                             ((hashlib.md5(os.path.join(d, n).encode()).hexdigest(),) for d, n in removed))
+            conn.executemany("INSERT OR IGNORE INTO index_files VALUES (?, ?)", added)
+            conn.executemany("INSERT OR REPLACE INTO index_dirs VALUES (?, ?, ?, ?)",
+                             ((path, parent, mtime, now) for path, parent, mtime in dir_rows))
+            conn.commit()
+    
+    def iter_index_files(self):
+        """Recorre (carpeta, nombre) de todos los archivos del índice persistente."""
+        with self._connect() as conn:
+            for row in conn.execute("SELECT dir, name FROM index_files"):
+                yield row
+    
+    def clear_old_entries(self, max_age_days=30):
+        cutoff_time = time.time() - (max_age_days * 24 * 3600)
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM file_cache WHERE last_scanned < ?", (cutoff_time,))
+            conn.commit()
+    
+    def clear_cache(self):
+        try:
+            if os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            self._init_db()  # Recrear la base de datos
+            return True
+        except Exception as e:
+            print(f"Error al limpiar caché: {str(e)}")
+            return False
+
+# ==================== ÍNDICE DE CONTENIDO ====================
+class ContentIndex:
+    """Índice persistente del contenido de los archivos (opcional).
+
+    "Escanear" extrae el texto de cada archivo (con TextExtractor para PDF,
+    DOCX, XLSX; leyendo los bytes para archivos de texto) y lo guarda en una
+    tabla FTS5 con tokenizador trigram, que responde búsquedas por
+    subcadena igual que ContentMatcher. Cada archivo guarda su tamaño y
+    mtime en segundos enteros (la misma precisión que los resultados de la
+    caché): en una búsqueda solo se vuelven a leer los que cambiaron o no
+    están indexados.
+    """
+    MAX_TEXT_BYTES = 10 * 1024 * 1024  # archivos de texto mayores no se indexan
+    SQL_CHUNK = 500  # valores por IN (...); SQLite admite 999 variables por consulta
+    _extractor = None  # uno por proceso
+
+    def __init__(self, db):
+        self.db = db
+        self.enabled = self._init_tables()
+
+    def _init_tables(self):
+        """Crea content_files (con el texto) y su índice FTS5 de contenido externo.
+
+        content_fts solo guarda el índice de trigramas: el texto está una sola
+        vez, en content_files.content, y los triggers mantienen el índice al
+        día. Versiones anteriores guardaban el texto dentro de content_fts;
+        esas tablas se descartan y se rellenan en el próximo escaneo.
+        """
+        with self.db._connect() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(content_files)")]
+            if columns and 'content' not in columns:
+                for trigger in ('content_files_ai', 'content_files_ad', 'content_files_au'):
+                    conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                conn.execute("DROP TABLE IF EXISTS content_fts")
+                conn.execute("DROP TABLE content_files")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS content_files (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL UNIQUE,
+                    size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL,
+                    content TEXT NOT NULL
+                )
+            """)
+            try:
+                conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS content_fts
+                    USING fts5(content, content=content_files, content_rowid=id, tokenize='trigram')
+                """)
+            except sqlite3.OperationalError:
+                return False  # SQLite sin tokenizador trigram
+            conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS content_files_ai AFTER INSERT ON content_files BEGIN
+                    INSERT INTO content_fts(rowid, content) VALUES (new.id, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS content_files_ad AFTER DELETE ON content_files BEGIN
+                    INSERT INTO content_fts(content_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS content_files_au AFTER UPDATE OF content ON content_files BEGIN
+                    INSERT INTO content_fts(content_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                    INSERT INTO content_fts(rowid, content) VALUES (new.id, new.content);
+                END;
+            """)
+            conn.commit()
+        return True
+
+    @staticmethod
+    def read_text(file_path):
+        """Texto indexable de un archivo, o None (binario, muy grande o ilegible).
+
+        Se ejecuta en los procesos del pool, por eso es estático.
+        """
+        try:
+            if ContentIndex._extractor is None:
+                ContentIndex._extractor = TextExtractor()
+            if ContentIndex._extractor.handles(file_path):
+                # Sin pasar por extracted_text: el texto queda guardado en el índice
+                return ContentIndex._extractor.extract(file_path)
+            if os.path.getsize(file_path) > ContentIndex.MAX_TEXT_BYTES:
+                return None
+            with open(file_path, 'rb') as f:
+                head = f.read(8192)
+                if b'\0' in head:
+                    return None  # binario: se sigue leyendo en cada búsqueda
+                data = head + f.read()
+            return data.decode('utf-8', errors='ignore')
+        except Exception as e:
+            print(f"No se pudo leer el contenido de {file_path}: {str(e)}")
+            return None
+
+    def update(self, root, paths, pool=None):
+        """Indexa el contenido de `paths` (archivos bajo root) que cambiaron.
+
+        Los archivos del índice bajo root que ya no están en `paths` se
+        eliminan. Devuelve la cantidad de archivos (re)indexados.
+        """
+        if not self.enabled:
+            return 0
+        prefix, upper = self.db._subtree_bounds(root)
+        with self.db._connect() as conn:
+            known = {path: (file_id, size, mtime) for file_id, path, size, mtime in conn.execute(
+                "SELECT id, path, size, mtime FROM content_files WHERE path >= ? AND path < ?",
+                (prefix, upper))}
+        
+        stale = []
+        current = set()
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            current.add(path)
+            entry = known.get(path)
+            if entry is None or entry[1] != stat.st_size or entry[2] != int(stat.st_mtime):
+                stale.append((path, stat.st_size, int(stat.st_mtime)))
+        removed = [entry[0] for path, entry in known.items() if path not in current]
+        
+        stale_paths = [path for path, _, _ in stale]
+        if pool is not None and len(stale_paths) > 1:
+            texts = pool.map(ContentIndex.read_text, stale_paths, chunksize=8)
+        else:
+            texts = map(ContentIndex.read_text, stale_paths)
+        
+        now = time.time()
+        indexed = 0
+        with self.db._connect() as conn:
+            # Los triggers de content_files actualizan content_fts
+            for file_id in removed:
+                conn.execute("DELETE FROM content_files WHERE id = ?", (file_id,))
+            for (path, size, mtime), text in zip(stale, texts):
+                if text is None:
+                    conn.execute("DELETE FROM content_files WHERE path = ?", (path,))
+                    continue
+                conn.execute("""
+                    INSERT INTO content_files (path, size, mtime, indexed_at, content) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        size = excluded.size, mtime = excluded.mtime,
+                        indexed_at = excluded.indexed_at, content = excluded.content
+                """, (path, size, mtime, now, text))
+                indexed += 1
+            conn.commit()
+        return indexed
+
+    def match(self, results, matcher):
+        """Resuelve con el índice los resultados que estén al día.
+
+        Devuelve (coincidentes, pendientes): los pendientes no están
+        indexados, cambiaron desde el escaneo o el patrón no se puede
+        responder con trigramas (regex o literales de menos de 3
+        caracteres) y hay que leerlos. Las listas de rutas e ids se consultan
+        en tandas de SQL_CHUNK para no pasar el límite de variables de SQLite.
+        """
+        if (not self.enabled or not matcher.literals
+                or min(len(literal) for literal in matcher.literals) < 3):
+            return [], results
+        
+        by_path = {result.full_path: result for result in results}
+        paths = list(by_path)
+        with self.db._connect() as conn:
+            fresh = {}
+            for start in range(0, len(paths), self.SQL_CHUNK):
+                chunk = paths[start:start + self.SQL_CHUNK]
+                rows = conn.execute(
+                    f"SELECT id, path, size, mtime FROM content_files WHERE path IN ({', '.join('?' * len(chunk))})",
+                    chunk)
+                fresh.update((file_id, path) for file_id, path, size, mtime in rows
+                             if by_path[path].size == size and int(by_path[path].mtime) == mtime)
+            if not fresh:
+                return [], results
+            
+            operator = ' AND ' if matcher.wanted > 1 else ' OR '
+            expression = operator.join('"' + literal.replace('"', '""') + '"' for literal in matcher.literals)
+            ids = list(fresh)
+            matched_ids = []
+            for start in range(0, len(ids), self.SQL_CHUNK):
+                chunk = ids[start:start + self.SQL_CHUNK]
+                matched_ids.extend(row[0] for row in conn.execute(
+                    f"SELECT rowid FROM content_fts WHERE content_fts MATCH ? AND rowid IN ({', '.join('?' * len(chunk))})",
+                    [expression] + chunk))
+        
+        fresh_paths = set(fresh.values())
+        matched = [by_path[fresh[file_id]] for file_id in matched_ids]
+        pending = [result for result in results if result.full_path not in fresh_paths]
+        return matched, pending
+
+# ==================== SISTEMA DE INDEXACIÓN MEJORADO ====================
+class CompactFileIndex:
+    """Índice de nombres de archivo guardado en buffers contiguos.
+
+    En lugar de conjuntos de rutas completas (un objeto str por archivo, y
+    repetido en varios índices), cada archivo es una posición en arrays:
+
+    - `dirs`: tabla de carpetas; cada ruta se guarda una sola vez.
+    - `file_dirs`: id de carpeta de cada archivo (DELETED marca las bajas).
+    - `names`/`name_offsets`: nombres originales en UTF-8 en un solo buffer.
+    - `keys`/`key_offsets`: los mismos nombres en minúsculas; las búsquedas
+      comparan bytes sin decodificar.
+    - `type_codes`: código de tipo de cada archivo, un byte.
+    - `trigrams`: trigrama -> ids de archivo.
+
+    Las bajas quedan marcadas y se descartan al buscar; cuando pasan de
+    COMPACT_RATIO de los archivos, compact() reconstruye los buffers sin
+    ellas. Para las altas y bajas del vigilante, `lookup` guarda nombre -> id
+    de las carpetas ya consultadas con find(). Las búsquedas solo usan
+    los métodos de acceso (_key, _find_key, _postings, ...), que
+    IndexSnapshot reimplementa sobre un archivo mapeado en memoria.
+    """
+    DELETED = 0xFFFFFFFF
+    DELETED_TYPE = 0xFF
+    COMPACT_RATIO = 0.25  # fracción de bajas a partir de la cual se compacta
+    COMPACT_MIN = 4096  # unas pocas bajas en un índice chico no justifican reconstruirlo
+    writable = True
+
+    def __init__(self):
+        self.dirs = []
+        self.dir_ids = {}
+        self.dir_files = defaultdict(partial(array, 'I'))  # id de carpeta -> ids de archivo
+        self.file_dirs = array('I')
+        self.names = bytearray()
+        self.name_offsets = array('Q', [0])
+        self.keys = bytearray()
+        self.key_offsets = array('Q', [0])
+        self.type_codes = bytearray()
+        self.trigrams = defaultdict(partial(array, 'I'))
+        self.lookup = {}  # id de carpeta -> {nombre: id de archivo}, se arma al primer find
+        self.deleted = 0
+
+    def __len__(self):
+        return len(self.file_dirs) - self.deleted
+
+    @staticmethod
+    def _encode(text):
+        # surrogatepass conserva los nombres no decodificables que entrega el sistema
+        return text.encode('utf-8', 'surrogatepass')
+
+    def _dir_id(self, dir_path, create=False):
+        dir_id = self.dir_ids.get(dir_path)
+        if dir_id is None and create:
+            dir_id = len(self.dirs)
+            self.dirs.append(dir_path)
+            self.dir_ids[dir_path] = dir_id
+        return dir_id
+
+    def append(self, dir_path, file_name):
+        """Agrega un archivo sin comprobar si ya estaba (carga desde la base de datos)."""
+        file_id = len(self.file_dirs)
+        dir_id = self._dir_id(dir_path, create=True)
+        file_lower = file_name.lower()
+        self.file_dirs.append(dir_id)
+        self.dir_files[dir_id].append(file_id)
+        self.names += self._encode(file_name)
+        self.name_offsets.append(len(self.names))
+        self.keys += self._encode(file_lower)
+        self.key_offsets.append(len(self.keys))
+        self.type_codes.append(FileResult.type_code_for(file_lower))
+        for trigram in {file_lower[i:i + 3] for i in range(len(file_lower) - 2)}:
+            self.trigrams[trigram].append(file_id)
+        lookup = self.lookup.get(dir_id)
+        if lookup is not None:
+            lookup[file_name] = file_id
+        return file_id
+
+    def add(self, dir_path, file_name):
+        if self.find(dir_path, file_name) is None:
+            self.append(dir_path, file_name)
+
+    def find(self, dir_path, file_name):
+        """Id del archivo `file_name` de `dir_path`, o None."""
+        dir_id = self._dir_id(dir_path)
+        if dir_id is None:
+            return None
+        lookup = self.lookup.get(dir_id)
+        if lookup is None:
+            # Solo se arma para las carpetas que cambian, no para todo el índice
+            lookup = self.lookup[dir_id] = {self.name(file_id): file_id
+                                            for file_id in self.dir_files.get(dir_id, ())}
+        return lookup.get(file_name)
+
+    def remove(self, dir_path, file_name):
+        file_id = self.find(dir_path, file_name)
+        if file_id is None:
+            return
+        dir_id = self.file_dirs[file_id]
+        self.dir_files[dir_id].remove(file_id)
+        del self.lookup[dir_id][file_name]
+        self.file_dirs[file_id] = self.DELETED
+        self.type_codes[file_id] = self.DELETED_TYPE
+        self.deleted += 1
+        self._compact_if_needed()
+
+    def remove_dir(self, dir_path):
+        """Quita todos los archivos de una carpeta."""
+        dir_id = self._dir_id(dir_path)
+        if dir_id is None:
+            return
+        self.lookup.pop(dir_id, None)
+        for file_id in self.dir_files.pop(dir_id, ()):
+            self.file_dirs[file_id] = self.DELETED
+            self.type_codes[file_id] = self.DELETED_TYPE
+            self.deleted += 1
+        self._compact_if_needed()
+
+    def _compact_if_needed(self):
+        if self.deleted >= self.COMPACT_MIN and self.deleted > self.COMPACT_RATIO * len(self.file_dirs):
+            self.compact()
+
+    def compact(self):
+        """Reconstruye los buffers y los trigramas sin las bajas; los ids de archivo cambian."""
+        files = CompactFileIndex()
+        for file_id in self.live_ids():
+            files.append(*self.entry(file_id))
+        self.__dict__.update(files.__dict__)
+
+    def name(self, file_id):
+        return str(self.names[self.name_offsets[file_id]:self.name_offsets[file_id + 1]], 'utf-8', 'surrogatepass')
+
+    def entry(self, file_id):
+        """(carpeta, nombre) de un archivo."""
+        return self.dirs[self.file_dirs[file_id]], self.name(file_id)
+
+    def path(self, file_id):
+        return os.path.join(*self.entry(file_id))
+
+    def names_in(self, dir_path):
+        """Nombres de los archivos indexados de una carpeta."""
+        dir_id = self._dir_id(dir_path)
+        if dir_id is None:
+            return []
+        return [self.name(file_id) for file_id in self.dir_files.get(dir_id, ())]
+
+    def dirs_under(self, root):
+        """Carpetas indexadas que son `root` o están debajo."""
+        prefix = root.rstrip(os.sep) + os.sep
+        return [d for d in self.dirs if (d == root or d.startswith(prefix)) and self.dir_files.get(self.dir_ids[d])]
+
+    def live_ids(self):
+        deleted = self.DELETED
+        return (file_id for file_id, dir_id in enumerate(self.file_dirs) if dir_id != deleted)
+
+    def ids_in_dirs(self, dir_paths):
+        for dir_path in dir_paths:
+            dir_id = self._dir_id(dir_path)
+            if dir_id is not None:
+                yield from self.dir_files.get(dir_id, ())
+
+    def _key(self, file_id):
+        return self.keys[self.key_offsets[file_id]:self.key_offsets[file_id + 1]]
+
+    def _find_key(self, term, start):
+        return self.keys.find(term, start)
+
+    def _postings(self, trigram):
+        return self.trigrams.get(trigram)
+
+    def _dir_file_ids(self, dir_id):
+        return self.dir_files.get(dir_id, ())
+
+    def _dirs_matching(self, path_lower):
+        """Ids de las carpetas cuya ruta (en minúsculas) contiene `path_lower`."""
+        return {dir_id for dir_id, d in enumerate(self.dirs) if path_lower in d.lower()}
+
+    @staticmethod
+    def _scan_buffer(find, offsets, term):
+        """Ids de las entradas de un buffer con offsets que contienen `term` (bytes).
+
+        Una búsqueda de bytes sobre el buffer completo es mucho más rápida
+        que recorrer las entradas una por una.
+        """
+        position = find(term, 0)
+        while position != -1:
+            entry_id = bisect_right(offsets, position) - 1
+            end = offsets[entry_id + 1]
+            if position + len(term) <= end:
+                yield entry_id
+                position = find(term, end)
+            else:
+                position = find(term, position + 1)
+
+    def _scan_keys(self, term):
+        """Ids cuyo nombre contiene `term`; para términos sin trigramas."""
+        return self._scan_buffer(self._find_key, self.key_offsets, term)
+
+    def _candidates(self, terms):
+        """Ids a verificar para un grupo AND: la lista de trigramas más corta."""
+        shortest = None
+        for term in terms:
+            if len(term) < 3:
+                continue
+            for i in range(len(term) - 2):
+                postings = self._postings(term[i:i + 3])
+                if postings is None:
+                    return ()
+                if shortest is None or len(postings) < len(shortest):
+                    shortest = postings
+        if shortest is not None:
+            return shortest
+        if terms:
+            return self._scan_keys(self._encode(max(terms, key=len)))
+        return range(len(self.file_dirs))
+
+    def search(self, query=None, type_code=None, path_part=None):
+        """Ids de los archivos que cumplen todos los filtros indicados.
+
+        Para cada grupo AND de la consulta se parte de los candidatos más
+        selectivos y solo esos se verifican contra todos los términos.
+        """
+        dir_filter = None
+        if path_part:
+            dir_filter = self._dirs_matching(path_part.lower())
+        
+        if query:
+            found = set()
+            for terms in query.groups:
+                encoded = [self._encode(term) for term in terms]
+                for file_id in self._candidates(terms):
+                    if file_id in found or self.file_dirs[file_id] == self.DELETED:
+                        continue
+                    key = self._key(file_id)
+                    if all(term in key for term in encoded):
+                        found.add(file_id)
+        elif type_code is not None:
+            found = [match.start() for match in re.finditer(re.escape(bytes([type_code])), self.type_codes)]
+        elif dir_filter is not None:
+            return [file_id for dir_id in dir_filter for file_id in self._dir_file_ids(dir_id)]
+        else:
+            return []
+        
+        if query and type_code is not None:
+            found = [file_id for file_id in found if self.type_codes[file_id] == type_code]
+        if dir_filter is not None:
+            found = [file_id for file_id in found if self.file_dirs[file_id] in dir_filter]
+        return list(found)
+
+class IndexSnapshot(CompactFileIndex):
+    """Instantánea binaria de solo lectura del índice, mapeada en memoria.
+
+    Guarda los mismos buffers que CompactFileIndex, sin bajas, con las
+    carpetas ordenadas por ruta y los archivos agrupados por carpeta y
+    ordenados por nombre. Al abrirla no se deserializa nada: cada sección es
+    una vista (memoryview) del archivo mapeado y las búsquedas la recorren
+    tal cual; las carpetas y los trigramas se ubican por búsqueda binaria.
+    Varias instancias del programa que abren la misma instantánea comparten
+    las páginas en la caché del sistema operativo.
+
+    La cabecera lleva la versión del formato, el orden de bytes y la
+    generación del índice en la base de datos: si no coinciden, open()
+    devuelve None y el índice se vuelve a cargar desde la base.
+    """
+    MAGIC = b'BUSCIDX\0'
+    VERSION = 1
+    HEADER = struct.Struct('<8sIBxxxq')  # magia, versión, orden de bytes, generación
+    SECTIONS = (
+        ('dir_names', 'B'), ('dir_offsets', 'Q'), ('dir_keys', 'B'), ('dir_key_offsets', 'Q'),
+        ('dir_first', 'I'), ('file_dirs', 'I'), ('names', 'B'), ('name_offsets', 'Q'),
+        ('keys', 'B'), ('key_offsets', 'Q'), ('type_codes', 'B'),
+        ('trigram_keys', 'B'), ('trigram_offsets', 'Q'), ('posting_offsets', 'Q'), ('postings', 'I'),
+    )
+    SECTION = struct.Struct('<QQ')  # posición y largo en bytes
+    writable = False
+
+    def __init__(self, mm, sections):
+        self.mm = mm
+        self.deleted = 0
+        self.view = view = memoryview(mm)
+        self.base = {}
+        for (name, fmt), (offset, length) in zip(self.SECTIONS, sections):
+            self.base[name] = offset
+            setattr(self, name, view[offset:offset + length].cast(fmt))
+        self.dir_count = len(self.dir_offsets) - 1
+
+    def close(self):
+        """Libera las vistas y el mapeo; en Windows un archivo mapeado no se puede reemplazar."""
+        for name, _ in self.SECTIONS:
+            getattr(self, name).release()
+        self.view.release()
+        try:
+            self.mm.close()
+        except BufferError:
+            pass  # queda una vista suelta: el mapeo se cierra cuando se libere
+
+    @classmethod
+    def open(cls, path, generation):
+        """Mapea la instantánea de `path`, o None si falta o no corresponde."""
+        try:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, version, big_endian, stamp = cls.HEADER.unpack_from(mm, 0)
+            if (magic != cls.MAGIC or version != cls.VERSION or stamp != generation
+                    or big_endian != (sys.byteorder == 'big')):
+                mm.close()
+                return None
+            table = cls.HEADER.size
+            sections = [cls.SECTION.unpack_from(mm, table + i * cls.SECTION.size)
+                        for i in range(len(cls.SECTIONS))]
+            if any(offset + length > len(mm) for offset, length in sections):
+                raise ValueError("instantánea truncada")
+            return cls(mm, sections)
+        except (struct.error, ValueError, TypeError) as e:
+            print(f"Instantánea del índice inválida ({path}): {str(e)}")
+            mm.close()
+            return None
+
+    @classmethod
+    def write(cls, files, path, generation):
+        """Escribe `files` (CompactFileIndex) como instantánea; devuelve si pudo.
+
+        Se escribe en un temporal y se reemplaza: quien tenga mapeada la
+        versión anterior la sigue leyendo intacta.
+        """
+        encode = cls._encode
+        by_dir = defaultdict(list)
+        for file_id in files.live_ids():
+            by_dir[files.dirs[files.file_dirs[file_id]]].append(file_id)
+        dir_paths = sorted(by_dir, key=encode)
+        
+        dir_names, dir_offsets = bytearray(), array('Q', [0])
+        dir_keys, dir_key_offsets = bytearray(), array('Q', [0])
+        dir_first = array('I', [0])
+        file_dirs = array('I')
+        names, name_offsets = bytearray(), array('Q', [0])
+        keys, key_offsets = bytearray(), array('Q', [0])
+        type_codes = bytearray()
+        remap = {}
+        for dir_id, dir_path in enumerate(dir_paths):
+            dir_names += encode(dir_path)
+            dir_offsets.append(len(dir_names))
+            dir_keys += encode(dir_path.lower())
+            dir_key_offsets.append(len(dir_keys))
+            entries = sorted((bytes(files.names[files.name_offsets[old]:files.name_offsets[old + 1]]), old)
+                             for old in by_dir[dir_path])
+            for name, old in entries:
+                remap[old] = len(file_dirs)
+                file_dirs.append(dir_id)
+                names += name
+                name_offsets.append(len(names))
+                keys += files._key(old)
+                key_offsets.append(len(keys))
+                type_codes.append(files.type_codes[old])
+            dir_first.append(len(file_dirs))
+        
+        trigram_keys, trigram_offsets = bytearray(), array('Q', [0])
+        postings, posting_offsets = array('I'), array('Q', [0])
+        # El orden de str coincide con el de sus bytes UTF-8: sirve para la búsqueda binaria
+        for trigram in sorted(files.trigrams):
+            ids = sorted(remap[old] for old in files.trigrams[trigram] if old in remap)
+            if not ids:
+                continue
+            trigram_keys += encode(trigram)
+            trigram_offsets.append(len(trigram_keys))
+            postings.extend(ids)
+            posting_offsets.append(len(postings))
+        
+        buffers = (dir_names, dir_offsets, dir_keys, dir_key_offsets, dir_first, file_dirs,
+                   names, name_offsets, keys, key_offsets, type_codes,
+                   trigram_keys, trigram_offsets, posting_offsets, postings)
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, 'wb') as f:
+                position = cls.HEADER.size + cls.SECTION.size * len(buffers)
+                table = []
+                for buffer in buffers:
+                    position += -position % 8  # secciones alineadas a 8 bytes
+                    length = len(buffer) * (buffer.itemsize if isinstance(buffer, array) else 1)
+                    table.append((position, length))
+                    position += length
+                f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, sys.byteorder == 'big', generation))
+                for entry in table:
+                    f.write(cls.SECTION.pack(*entry))
+                for (offset, _), buffer in zip(table, buffers):
+                    f.write(b'\0' * (offset - f.tell()))
+                    f.write(buffer)
+            os.replace(temp, path)
+            return True
+        except OSError as e:
+            # En Windows no se puede reemplazar un archivo mapeado por otra instancia
+            print(f"No se pudo guardar la instantánea del índice: {str(e)}")
+            with contextlib.suppress(OSError):
+                os.remove(temp)
+            return False
+
+    def to_compact(self):
+        """Copia modificable del índice (para aplicar cambios del vigilante)."""
+        files = CompactFileIndex()
+        for file_id in range(len(self.file_dirs)):
+            files.append(*self.entry(file_id))
+        return files
+
+    def __len__(self):
+        return len(self.file_dirs)
+
+    def _dir_path(self, dir_id):
+        return bytes(self.dir_names[self.dir_offsets[dir_id]:self.dir_offsets[dir_id + 1]])
+
+    def _dir_id(self, dir_path, create=False):
+        target = self._encode(dir_path)
+        dir_id = self._lower_bound(self._dir_path, self.dir_count, target)
+        if dir_id < self.dir_count and self._dir_path(dir_id) == target:
+            return dir_id
+        return None
+
+    @staticmethod
+    def _lower_bound(get, count, target):
+        """Primera posición cuyo valor (según `get`) no es menor que `target`."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if get(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entry(self, file_id):
+        dir_id = self.file_dirs[file_id]
+        return self._dir_path(dir_id).decode('utf-8', 'surrogatepass'), self.name(file_id)
+
+    def _dir_file_ids(self, dir_id):
+        return range(self.dir_first[dir_id], self.dir_first[dir_id + 1])
+
+    def names_in(self, dir_path):
+        dir_id = self._dir_id(dir_path)
+        if dir_id is None:
+            return []
+        return [self.name(file_id) for file_id in self._dir_file_ids(dir_id)]
+
+    def dirs_under(self, root):
+        # Las rutas están ordenadas: la carpeta y su subárbol se ubican por búsqueda binaria
+        prefix = self._encode(root.rstrip(os.sep) + os.sep)
+        upper = prefix[:-1] + bytes([prefix[-1] + 1])
+        first = self._lower_bound(self._dir_path, self.dir_count, prefix)
+        last = self._lower_bound(self._dir_path, self.dir_count, upper)
+        dir_ids = list(range(first, last))
+        own = self._dir_id(root)
+        if own is not None and not first <= own < last:
+            dir_ids.append(own)
+        return [self._dir_path(dir_id).decode('utf-8', 'surrogatepass') for dir_id in dir_ids]
+
+    def live_ids(self):
+        return iter(range(len(self.file_dirs)))
+
+    def ids_in_dirs(self, dir_paths):
+        for dir_path in dir_paths:
+            dir_id = self._dir_id(dir_path)
+            if dir_id is not None:
+                yield from self._dir_file_ids(dir_id)
+
+    def _key(self, file_id):
+        return bytes(self.keys[self.key_offsets[file_id]:self.key_offsets[file_id + 1]])
+
+    def _find_key(self, term, start):
+        base = self.base['keys']
+        position = self.mm.find(term, base + start, base + len(self.keys))
+        return position - base if position != -1 else -1
+
+    def _trigram(self, index):
+        return bytes(self.trigram_keys[self.trigram_offsets[index]:self.trigram_offsets[index + 1]])
+
+    def _postings(self, trigram):
+        target = self._encode(trigram)
+        count = len(self.trigram_offsets) - 1
+        index = self._lower_bound(self._trigram, count, target)
+        if index == count or self._trigram(index) != target:
+            return None
+        return self.postings[self.posting_offsets[index]:self.posting_offsets[index + 1]]
+
+    def _dirs_matching(self, path_lower):
+        base = self.base['dir_keys']
+        end = base + len(self.dir_keys)
+        def find(term, start):
+            position = self.mm.find(term, base + start, end)
+            return position - base if position != -1 else -1
+        return set(self._scan_buffer(find, self.dir_key_offsets, self._encode(path_lower)))
+
+class EnhancedFileIndexer:
+    def __init__(self, db=None):
+        self.db = db or EnhancedFileCacheDB()
+        self.files = CompactFileIndex()
+        self.snapshot_path = os.path.splitext(self.db.db_path)[0] + ".index"
+        self.last_index_time = 0
+        self.last_changed_dirs = []
+        self.loaded = False
+        self.lock = threading.RLock()  # el vigilante modifica el índice desde otro hilo
+        
+    INDEX_WORKERS = min(16, 2 * (os.cpu_count() or 1))
+    PARTITIONS_PER_WORKER = 4  # subárboles por hilo, para repartir árboles desparejos
+    
+    def build_index(self, root_path, workers=None):
+        """Actualiza el índice persistente de forma incremental.
+
+        Solo se vuelven a listar las carpetas cuyo mtime cambió desde el último
+        escaneo; para las demás se reutilizan del disco las subcarpetas ya
+        conocidas y se desciende sin listar su contenido.
+
+        El recorrido se reparte por subárboles: se recorren en anchura los
+        primeros niveles hasta tener varios subárboles por hilo, cada hilo
+        recorre los suyos y devuelve sus cambios parciales, y el hilo
+        principal los guarda a medida que llegan. Son hilos y no procesos
+        porque scandir y stat liberan el GIL: el trabajo es esperar al disco
+        o a la red, y así los listados no se copian entre procesos.
+        """
+        start_time = time.time()
+        root_path = os.path.abspath(root_path)
+        workers = workers or self.INDEX_WORKERS
+        known = self.db.get_index_dirs(root_path)
+        children = defaultdict(list)
+        for dir_path, (parent, _) in known.items():
+            children[parent].append(dir_path)
+        
+        # Recorrer en anchura hasta tener subárboles suficientes para repartir
+        part = {'changes': [], 'changed_dirs': [], 'visited': set()}
+        frontier = [root_path]
+        while frontier and len(frontier) < workers * self.PARTITIONS_PER_WORKER:
+            next_level = []
+            for current in frontier:
+                next_level.extend(self._scan_index_dir(current, known, children, part))
+            frontier = next_level
+        
+        changes = part['changes']
+        changed_dirs = part['changed_dirs']
+        visited = part['visited']
+        if frontier:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._walk_index_tree, subtree, known, children)
+                           for subtree in frontier]
+                for future in as_completed(futures):
+                    result = future.result()
+                    changes.extend(result['changes'])
+                    changed_dirs.extend(result['changed_dirs'])
+                    visited.update(result['visited'])
+                    if len(changes) >= 1000:
+                        self.db.update_index_dirs(changes)
+                        changes.clear()
+        
+        removed = [dir_path for dir_path in known if dir_path not in visited]
+        self.db.update_index_dirs(changes, removed)
+        self.last_changed_dirs = changed_dirs
+        
+        if changed_dirs or removed or not self.loaded:
+            self.load_index()
+        
+        self.last_index_time = time.time()
+        print(f"Índice actualizado en {self.last_index_time - start_time:.2f} segundos "
+              f"({len(changed_dirs)} carpetas re-listadas, {len(removed)} eliminadas)")
+    
+    def _walk_index_tree(self, top, known, children):
+        """Recorre un subárbol (en un hilo del pool) y devuelve sus cambios parciales."""
+        part = {'changes': [], 'changed_dirs': [], 'visited': set()}
+        pending = [top]
+        while pending:
+            pending.extend(self._scan_index_dir(pending.pop(), known, children, part))
+        return part
+    
+    @staticmethod
+    def _scan_index_dir(current, known, children, part):
+        """Procesa una carpeta del recorrido y devuelve las subcarpetas a visitar.
+
+        Si el mtime no cambió se reutilizan las subcarpetas conocidas; si no,
+        se lista y el listado queda en `part['changes']`.
+        """
+        try:
+            mtime = os.stat(current).st_mtime
+        except FileNotFoundError:
+            return []
+        except OSError:
+            # Error transitorio (p. ej. red): conservar lo indexado
+            part['visited'].add(current)
+            return children.get(current, [])
+        part['visited'].add(current)
+        
+        if current in known and known[current][1] == mtime:
+            return children.get(current, [])
+        
+        subdirs = []
+        names = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file():
+                            names.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError as e:
+            # Sin listado no se sabe qué cambió: conservar lo indexado, como arriba
+            print(f"Error al listar {current}: {str(e)}")
+            return children.get(current, [])
+        part['changes'].append((current, os.path.dirname(current), mtime, names))
+        part['changed_dirs'].append(current)
+        return subdirs
+    
+    def load_index(self):
+        """Carga el índice persistido: de la instantánea si está al día, si no de la base.
+
+        Al cargar desde la base se escribe una instantánea nueva y se pasa a
+        usarla mapeada, así el índice no ocupa memoria propia del proceso.
+        """
+        generation = self.db.index_generation()
+        with self.lock:
+            # La instantánea en uso se suelta antes de escribir la nueva encima
+            self._close_snapshot()
+            files = IndexSnapshot.open(self.snapshot_path, generation)
+            if files is None:
+                files = CompactFileIndex()
+                for dir_path, file_name in self.db.iter_index_files():
+                    files.append(dir_path, file_name)
+                if IndexSnapshot.write(files, self.snapshot_path, generation):
+                    files = IndexSnapshot.open(self.snapshot_path, generation) or files
+            self.files = files
+            self.loaded = True
+    
+    def _close_snapshot(self):
+        """Suelta la instantánea mapeada en uso, si la hay; el índice queda por cargar."""
+        if not self.files.writable:
+            self.files.close()
+            self.files = CompactFileIndex()
+            self.loaded = False
+    
+    def _writable_files(self):
+        """Índice modificable; la instantánea se copia con el primer cambio."""
+        if not self.files.writable:
+            snapshot = self.files
+            self.files = snapshot.to_compact()
+            snapshot.close()
+        return self.files
+    
+    def add_file(self, dir_path, file_name):
+        """Agrega un archivo al índice en memoria (sin tocar la base de datos)."""
+        with self.lock:
+            self._writable_files().add(dir_path, file_name)
+    
+    def remove_file(self, dir_path, file_name):
+        """Quita un archivo del índice en memoria."""
+        with self.lock:
+            self._writable_files().remove(dir_path, file_name)
+    
+    def remove_tree(self, root):
+        """Quita del índice en memoria todos los archivos bajo `root`."""
+        with self.lock:
+            files = self._writable_files()
+            for dir_path in files.dirs_under(root):
+                files.remove_dir(dir_path)
+    
+    def names_in(self, dir_path):
+        """Nombres indexados de una carpeta."""
+        with self.lock:
+            return self.files.names_in(dir_path)
+    
+    def paths_under(self, root):
+        """Rutas completas de los archivos indexados bajo `root`."""
+        with self.lock:
+            files = self.files
+            return [files.path(file_id) for file_id in files.ids_in_dirs(files.dirs_under(root))]
+    
+    def file_count(self):
+        with self.lock:
+            return len(self.files)
+    
+    def count_under(self, root):
+        """Cantidad de archivos indexados bajo `root`."""
+        with self.lock:
+            files = self.files
+            return sum(1 for _ in files.ids_in_dirs(files.dirs_under(root)))
+    
+    def search_index(self, name_part=None, file_type=None, path_part=None):
+        """Busca en el índice combinando los filtros indicados (intersección).
+
+        `name_part` puede ser un texto o un NameQuery (varios términos con
+        AND/OR); se resuelve con el índice de trigramas sin recorrer todos
+        los nombres.
+        """
+        if not self.loaded:
+            self.load_index()
+        
+        query = None
+        if name_part:
+            query = name_part if isinstance(name_part, NameQuery) else NameQuery(name_part)
+        type_code = None
+        if file_type:
+            if file_type not in TYPE_NAMES:
+                return set()
+            type_code = TYPE_NAMES.index(file_type)
+        with self.lock:
+            files = self.files
+            return {files.path(file_id) for file_id in files.search(query, type_code, path_part)}
+    
+    def get_all_files(self, dirs=None):
+        """Obtiene los archivos indexados con información completa.
+
+        Si se indica `dirs`, solo se consultan los archivos de esas carpetas
+        (por ejemplo, las re-listadas en el último escaneo incremental).
+        """
+        with self.lock:
+            files = self.files
+            ids = files.live_ids() if dirs is None else files.ids_in_dirs(dirs)
+            entries = [files.entry(file_id) for file_id in ids]
+        all_files = []
+        for dir_path, name in entries:
+            try:
+                stat = os.stat(os.path.join(dir_path, name))
+                all_files.append(FileResult(dir_path, name, stat.st_size, stat.st_mtime))
+            except:
+                continue
+        return all_files
+
+# ==================== VIGILANTE DE CARPETAS ====================
+class FileSystemWatcher:
+    """Mantiene el índice y la caché al día aplicando los cambios del disco.
+
+    En Linux usa inotify sobre las carpetas indexadas. En recursos de red
+    (inotify no ve los cambios hechos desde otros equipos), en otros sistemas
+    o si se agotan los watches del sistema, revisa cada `poll_interval`
+    segundos el mtime de las carpetas indexadas y vuelve a listar solo las
+    que cambiaron; en ese modo se detectan altas, bajas y renombrados, pero
+    no las modificaciones de contenido, que no cambian el mtime de la carpeta.
+
+    Los eventos se acumulan y se aplican en lote: por cada archivo tocado se
+    consulta su estado actual (existe: alta o modificación; no existe: baja),
+    así un renombrado es una baja y un alta sin depender del orden de los
+    eventos. La vigilancia parte del índice que dejó build_index; con
+    inotify, además, al empezar se refresca en la caché el stat de los
+    archivos indexados (lo cambiado antes no generó eventos).
+    """
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONT_FOLLOW = 0x02000000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+                  IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+    EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+    def __init__(self, indexer, db, poll_interval=30.0, flush_interval=0.5):
+        self.indexer = indexer
+        self.db = db
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self.roots = {}  # carpeta vigilada -> (hilo, evento de parada)
+        self.live = set()  # carpetas vigiladas con inotify (cambios al instante)
+        self.synced = set()  # de esas, las que ya tienen la caché igual al disco
+        self.changes_applied = 0
+        self._lock = threading.Lock()
+
+    def watch(self, root):
+        """Empieza a vigilar `root` (ya indexada) en un hilo propio."""
+        root = os.path.abspath(root)
+        current = self.roots.get(root)
+        if current and current[0].is_alive():
+            return
+        stop = threading.Event()
+        use_inotify = sys.platform.startswith('linux') and not AsyncNetworkScanner.network_host(root)
+        thread = threading.Thread(target=self._run_inotify if use_inotify else self._run_polling,
+                                  args=(root, stop), daemon=True)
+        self.roots[root] = (thread, stop)
+        thread.start()
+
+    def unwatch(self, root):
+        entry = self.roots.pop(os.path.abspath(root), None)
+        if entry:
+            entry[1].set()
+
+    def stop(self):
+        """Deja de vigilar todas las carpetas."""
+        for root in list(self.roots):
+            self.unwatch(root)
+
+    def covers(self, path):
+        """Indica si `path` está dentro de una carpeta vigilada con inotify (el índice está al día).
+
+        Las carpetas revisadas periódicamente no cuentan: llevan hasta
+        `poll_interval` de atraso y no ven las modificaciones de contenido.
+        """
+        path = os.path.abspath(path)
+        return any(self._within(root, path) for root in list(self.live))
+
+    def cache_synced(self, path):
+        """Indica si `path` está bajo una carpeta vigilada cuya caché coincide con el disco."""
+        path = os.path.abspath(path)
+        return any(self._within(root, path) for root in list(self.synced))
+
+    def _sync_cache(self, root):
+        """Refresca en la caché el stat de todos los archivos indexados bajo `root`.
+
+        Lo que cambió antes de empezar a vigilar no genera eventos; después de
+        esto los eventos mantienen la caché igual al disco.
+        """
+        self.db.update_cache(self.indexer.get_all_files(list(self.db.get_index_dirs(root))))
+        self.synced.add(root)
+
+    @staticmethod
+    def _within(root, path):
+        return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+    def _run_inotify(self, root, stop):
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1")
+        except (OSError, AttributeError) as e:
+            print(f"inotify no disponible ({str(e)}), se revisará {root} periódicamente")
+            return self._run_polling(root, stop)
+        
+        watches = {}  # wd -> carpeta
+        def add_watch(dir_path):
+            wd = libc.inotify_add_watch(fd, os.fsencode(dir_path), self.WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:  # fs.inotify.max_user_watches agotado
+                    raise OSError(error, "inotify_add_watch")
+                return
+            watches[wd] = dir_path  # una carpeta renombrada conserva su wd con la ruta nueva
+        
+        try:
+            try:
+                add_watch(root)
+                for dir_path in self.db.get_index_dirs(root):
+                    add_watch(dir_path)
+            except OSError as e:
+                print(f"Sin watches de inotify suficientes ({str(e)}), se revisará {root} periódicamente")
+                return self._run_polling(root, stop)
+            self.live.add(root)
+            # Los eventos que lleguen mientras tanto esperan en el descriptor
+            self._sync_cache(root)
+            
+            files, trees = set(), set()
+            last_flush = time.monotonic()
+            while not stop.is_set():
+                if select.select([fd], [], [], self.flush_interval)[0]:
+                    data = os.read(fd, 65536)
+                    offset = 0
+                    while offset < len(data):
+                        wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                        offset += self.EVENT_HEADER.size
+                        name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                        offset += length
+                        
+                        if mask & self.IN_Q_OVERFLOW:
+                            # Se perdieron eventos: comparar todas las carpetas con el disco
+                            self._poll_once(root, self._known_dirs(root), add_watch)
+                            continue
+                        if mask & self.IN_IGNORED:
+                            watches.pop(wd, None)
+                            continue
+                        dir_path = watches.get(wd)
+                        if dir_path is None:
+                            continue
+                        if mask & self.IN_DELETE_SELF:
+                            trees.add(dir_path)
+                        elif mask & self.IN_ISDIR:
+                            trees.add(os.path.join(dir_path, name))
+                        else:
+                            files.add((dir_path, name))
+                
+                if (files or trees) and time.monotonic() - last_flush >= self.flush_interval:
+                    try:
+                        self._apply(root, files, trees, on_new_dir=add_watch)
+                    except OSError as e:
+                        print(f"Error aplicando cambios en {root}: {str(e)}")
+                    files, trees = set(), set()
+                    last_flush = time.monotonic()
+        finally:
+            self.live.discard(root)
+            self.synced.discard(root)
+            os.close(fd)
+
+    def _run_polling(self, root, stop):
+        known = self._known_dirs(root)
+        while not stop.wait(self.poll_interval):
+            known = self._poll_once(root, known)
+
+    def _known_dirs(self, root):
+        return {path: mtime for path, (_, mtime) in self.db.get_index_dirs(root).items()}
+
+    def _poll_once(self, root, known, on_new_dir=None):
+        """Re-lista las carpetas cuyo mtime cambió y aplica las diferencias.
+
+        Devuelve el nuevo {carpeta: mtime} conocido.
+        """
+        children = defaultdict(set)
+        for dir_path in known:
+            if dir_path != root:
+                children[os.path.dirname(dir_path)].add(dir_path)
+        
+        files, trees, touched = set(), set(), []
+        for dir_path, mtime in known.items():
+            try:
+                if os.stat(dir_path).st_mtime == mtime:
+                    continue
+                names, subdirs = set(), set()
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.add(entry.path)
+                            elif entry.is_file():
+                                names.add(entry.name)
+                        except OSError:
+                            continue
+            except FileNotFoundError:
+                trees.add(dir_path)
+                continue
+            except OSError:
+                continue  # p. ej. red caída: se reintenta en la próxima vuelta
+            indexed = set(self.indexer.names_in(dir_path))
+            files.update((dir_path, name) for name in names ^ indexed)
+            trees.update(subdirs ^ children[dir_path])
+            touched.append(dir_path)
+        
+        if files or trees or touched:
+            self._apply(root, files, trees, touched, on_new_dir)
+            return self._known_dirs(root)
+        return known
+
+    def _apply(self, root, files, trees, touched=(), on_new_dir=None):
+        """Aplica al índice en memoria y a la base de datos los cambios acumulados.
+
+        `files` son (carpeta, nombre) tocados y `trees` carpetas creadas,
+        movidas o eliminadas; se decide qué pasó consultando el disco.
+        """
+        with self._lock:
+            files = set(files)
+            touched = set(touched)
+            removed_trees = []
+            for tree in sorted(trees):
+                if os.path.isdir(tree) and not os.path.islink(tree):
+                    # Carpeta nueva o movida desde otro lugar: se recorre completa
+                    for dir_path, _, names in os.walk(tree):
+                        if on_new_dir is not None:
+                            on_new_dir(dir_path)
+                        touched.add(dir_path)
+                        files.update((dir_path, name) for name in names)
+                else:
+                    removed_trees.append(tree)
+                    self.indexer.remove_tree(tree)
+                touched.add(os.path.dirname(tree))
+            
+            touched.update(dir_path for dir_path, _ in files)
+            added, removed, results = [], [], []
+            for dir_path, name in files:
+                try:
+                    stat = os.stat(os.path.join(dir_path, name), follow_symlinks=False)
+                    exists = S_ISREG(stat.st_mode)
+                except OSError:
+                    exists = False
+                if exists:
+                    self.indexer.add_file(dir_path, name)
+                    added.append((dir_path, name))
+                    results.append(FileResult(dir_path, name, stat.st_size, stat.st_mtime))
+                else:
+                    self.indexer.remove_file(dir_path, name)
+                    removed.append((dir_path, name))
+            
+            # Guardar el mtime nuevo evita que build_index vuelva a listar estas carpetas
+            dir_rows = []
+            for dir_path in touched:
+                if not self._within(root, dir_path):
+                    continue
+                try:
+                    dir_rows.append((dir_path, os.path.dirname(dir_path), os.stat(dir_path).st_mtime))
+                except OSError:
+                    continue
+            
+            self.db.apply_index_changes(dir_rows, added, removed, removed_trees)
+            if results:
+                self.db.update_cache(results)
+            self.changes_applied += len(added) + len(removed)
+
+# ==================== POLÍTICA DE REINTENTOS ====================
+class RetryLater(Exception):
+    """Lanzada por una tarea del pool para volver a ejecutarse más tarde con otros argumentos."""
+    def __init__(self, delay, args):
+        super().__init__(delay, args)
+        self.delay = delay
+        self.args_ = args
+
+class RetryPolicy:
+    """Decide qué errores de acceso a archivos se reintentan y cuándo.
+
+    Los errores permanentes (no existe, sin permiso, no es carpeta...) no se
+    reintentan. Los transitorios (tiempo agotado, conexión caída, recurso
+    ocupado) se reintentan con espera exponencial con jitter. Cada carpeta
+    tiene un cortacircuitos: tras `breaker_threshold` fallos transitorios
+    seguidos se deja de acceder a ella durante `breaker_reset` segundos, y
+    después se permite un intento de prueba.
+    """
+    PERMANENT_ERRNOS = {errno.ENOENT, errno.EACCES, errno.EPERM, errno.ENOTDIR,
+                        errno.EISDIR, errno.ENAMETOOLONG, errno.ELOOP, errno.EINVAL}
+    # ERROR_FILE_NOT_FOUND, PATH_NOT_FOUND, ACCESS_DENIED, INVALID_NAME, BAD_PATHNAME, DIRECTORY
+    PERMANENT_WINERRORS = {2, 3, 5, 123, 161, 267}
+
+    def __init__(self, max_retries=3, base_delay=0.2, max_delay=5.0,
+                 breaker_threshold=5, breaker_reset=30.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._lock = threading.Lock()
+        self.reset(max_retries)
+
+    def reset(self, max_retries=None):
+        """Olvida el estado de la búsqueda anterior."""
+        if max_retries is not None:
+            self.max_retries = max_retries
+        with self._lock:
+            self.failures = defaultdict(int)  # fallos transitorios seguidos por carpeta
+            self.opened = {}  # carpeta -> momento en que se abrió el cortacircuitos
+            self.tripped = set()  # carpetas cuyo cortacircuitos se abrió alguna vez
+            self.retries = 0
+            self.skipped = 0
+
+    def is_transient(self, error):
+        if not isinstance(error, OSError):  # TimeoutError también es OSError
+            return False
+        if getattr(error, 'winerror', None) in self.PERMANENT_WINERRORS:
+            return False
+        return error.errno not in self.PERMANENT_ERRNOS
+
+    def should_retry(self, error, attempt, directory):
+        """Indica si un error en el intento `attempt` (desde 0) merece otro intento."""
+        if not self.is_transient(error):
+            return False
+        self.record_failure(directory)
+        if attempt + 1 >= self.max_retries or not self.allow(directory):
+            return False
+        with self._lock:
+            self.retries += 1
+        return True
+
+    def backoff(self, attempt):
+        """Espera antes del intento `attempt + 1`: exponencial, con jitter."""
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def allow(self, directory):
+        """Indica si el cortacircuitos de la carpeta permite acceder a ella."""
+        with self._lock:
+            opened = self.opened.get(directory)
+            if opened is None:
+                return True
+            if time.monotonic() - opened >= self.breaker_reset:
+                # Semiabierto: se deja pasar un intento; si falla se vuelve a abrir
+                del self.opened[directory]
+                self.failures[directory] = self.breaker_threshold - 1
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self, directory):
+        if self.failures.get(directory):
+            with self._lock:
+                self.failures.pop(directory, None)
+
+    def record_failure(self, directory):
+        with self._lock:
+            self.failures[directory] += 1
+            if self.failures[directory] >= self.breaker_threshold and directory not in self.opened:
+                self.opened[directory] = time.monotonic()
+                self.tripped.add(directory)
+
+# ==================== POOL DE TRABAJO ADAPTATIVO ====================
+class AdaptiveWorkerPool:
+    """Hilos persistentes alimentados desde una cola acotada.
+
+    El recorrido del disco encola tareas con submit() y sigue listando
+    carpetas mientras los hilos resuelven los stat, sin barreras por lote;
+    si la cola se llena, submit() espera. La cantidad de hilos sigue a la
+    latencia media observada por tarea: con stat de microsegundos (disco
+    local) bastan pocos hilos, con decenas de milisegundos (recurso de red)
+    hacen falta muchos para solapar las esperas.
+
+    Una tarea que lanza RetryLater no ocupa un hilo mientras espera: se
+    guarda en un montículo por hora de vencimiento y un hilo temporizador la
+    vuelve a encolar cuando toca.
+    """
+    LATENCY_PER_WORKER = 0.001  # cada milisegundo de latencia media justifica un hilo más
+    IDLE_TIMEOUT = 30  # segundos sin trabajo antes de que termine un hilo sobrante
+
+    def __init__(self, min_workers=2, max_workers=32, queue_size=2000):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.tasks = queue.Queue(maxsize=queue_size)
+        self.latency = 0.0  # media móvil exponencial, en segundos
+        self.workers = 0
+        self.target = min_workers
+        self._lock = threading.Lock()
+        self._delayed = []  # montículo de (vencimiento, orden, tarea)
+        self._delayed_seq = 0
+        self._in_transit = 0  # reintentos vencidos que aún no entraron a la cola
+        self._delayed_cond = threading.Condition(self._lock)
+        self._timer = None
+
+    def submit(self, fn, args, sink):
+        """Encola fn(*args); si el resultado no es None se entrega a sink."""
+        self._grow()
+        self.tasks.put((fn, args, sink))
+
+    def submit_later(self, delay, fn, args, sink):
+        """Encola fn(*args) dentro de `delay` segundos sin bloquear ningún hilo."""
+        with self._lock:
+            self._delayed_seq += 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, self._delayed_seq, (fn, args, sink)))
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._release_delayed, daemon=True)
+                self._timer.start()
+            self._delayed_cond.notify_all()
+
+    def join(self):
+        """Espera a que terminen todas las tareas, incluidos los reintentos diferidos."""
+        while True:
+            self.tasks.join()
+            with self._lock:
+                # Un reintento se agenda antes de marcar su tarea como terminada
+                if not self._delayed and not self._in_transit:
+                    return
+                self._delayed_cond.wait()
+
+    def cancel(self):
+        """Descarta las tareas que todavía no empezaron."""
+        with self._lock:
+            self._delayed.clear()
+            self._delayed_cond.notify_all()
+        while True:
+            try:
+                self.tasks.get_nowait()
+            except queue.Empty:
+                return
+            self.tasks.task_done()
+
+    def _grow(self):
+        with self._lock:
+            self._spawn()
+
+    def _release_delayed(self):
+        while True:
+            with self._lock:
+                while not self._delayed or self._delayed[0][0] > time.monotonic():
+                    timeout = self._delayed[0][0] - time.monotonic() if self._delayed else None
+                    self._delayed_cond.wait(timeout)
+                _, _, task = heapq.heappop(self._delayed)
+                self._in_transit += 1
+                self._spawn()
+            # Fuera del lock: con la cola llena put() espera a que los hilos avancen
+            self.tasks.put(task)
+            with self._lock:
+                self._in_transit -= 1
+                self._delayed_cond.notify_all()
+
+    def _spawn(self):
+        # Llamar con self._lock tomado
+        while self.workers < self.target:
+            self.workers += 1
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def _work(self):
+        while True:
+            try:
+                fn, args, sink = self.tasks.get(timeout=self.IDLE_TIMEOUT)
+            except queue.Empty:
+                with self._lock:
+                    if self.workers > self.min_workers:
+                        self.workers -= 1
+                        return
+                continue
+            
+            start = time.perf_counter()
+            try:
+                result = fn(*args)
+                if result is not None:
+                    sink(result)
+            except RetryLater as retry:
+                self.submit_later(retry.delay, fn, retry.args_, sink)
+            except Exception as e:
+                print(f"Error en tarea del pool: {str(e)}")
+            finally:
+                self.tasks.task_done()
+            elapsed = time.perf_counter() - start
+            
+            with self._lock:
+                self.latency += 0.05 * (elapsed - self.latency)
+                self.target = max(self.min_workers, min(
+                    self.max_workers, int(self.latency / self.LATENCY_PER_WORKER) + 1))
+                if self.workers > self.target:
+                    self.workers -= 1
+                    return
+                if not self.tasks.empty():
+                    self._spawn()
+
+# ==================== ESCÁNER ASÍNCRONO PARA RED ====================
+class AsyncNetworkScanner:
+    """Recorrido de recursos de red con cientos de operaciones en vuelo.
+
+    En SMB/NFS cada listado y cada stat esperan un viaje de ida y vuelta al
+    servidor: el límite es la latencia, no la CPU. Un bucle asyncio en un hilo
+    propio reparte carpetas entre corrutinas que delegan las llamadas
+    bloqueantes en un ThreadPoolExecutor acotado; un semáforo global limita
+    las operaciones en vuelo y otro por servidor evita saturar un único host.
+    """
+    NETWORK_FS = {'cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'afs', '9p', 'fuse.sshfs', 'davfs'}
+    DRIVE_REMOTE = 4  # GetDriveTypeW
+
+    def __init__(self, max_in_flight=256, per_host_limit=64, dir_workers=64):
+        self.max_in_flight = max_in_flight
+        self.per_host_limit = per_host_limit
+        self.dir_workers = dir_workers
+        self.executor = None  # ThreadPoolExecutor, se crea al primer uso y persiste
+        self.dirs_scanned = 0
+        self.files_seen = 0
+        self.max_backlog = 5000  # resultados sin consumir antes de frenar el recorrido
+
+    @classmethod
+    def network_host(cls, path, mounts=None):
+        """Devuelve el servidor de una ruta de red, o None si la ruta es local."""
+        path = os.path.abspath(path)
+        if path[:2] in ('\\\\', '//'):
+            return re.split(r'[\\/]', path[2:], 1)[0].lower() or None
+        if os.name == 'nt':
+            drive = os.path.splitdrive(path)[0]
+            if drive:
+                try:
+                    import ctypes
+                    if ctypes.windll.kernel32.GetDriveTypeW(drive + '\\') == cls.DRIVE_REMOTE:
+                        return drive.upper()
+                except (AttributeError, OSError):
+                    pass
+            return None
+        # Punto de montaje más largo que contiene la ruta
+        for mount_point, host in cls.mount_table() if mounts is None else mounts:
+            if path == mount_point or path.startswith(mount_point.rstrip('/') + '/'):
+                return host
+        return None
+
+    @classmethod
+    def mount_table(cls):
+        """Lee /proc/mounts: [(punto_de_montaje, servidor o None)], el más largo primero."""
+        mounts = []
+        try:
+            with open('/proc/mounts', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 3:
+                        continue
+                    source, mount_point, fs_type = fields[:3]
+                    host = None
+                    if fs_type in cls.NETWORK_FS:
+                        host = re.split(r'[/:]', source.lstrip('/'), 1)[0].lower() or source
+                    mounts.append((mount_point.replace('\\040', ' '), host))
+        except OSError:
+            pass
+        mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+        return mounts
+
+    def scan(self, path, accepts, process, done, stop_event, pause_event,
+             retry_policy, timeout=600, on_dir=None):
+        """Recorre `path` y agrega a la cola `done` los resultados de `process`.
+
+        `accepts(root, entry)` filtra por nombre sin tocar el disco y
+        `process(root, entry)` hace el stat en los hilos del executor; si
+        `done` acumula demasiados resultados sin consumir, el recorrido espera.
+        Genera (carpeta, [], carpetas_pendientes) por cada directorio
+        listado, con la misma forma que `NetworkOptimizedSearcher._scan_tree`,
+        para que quien consume pueda informar el progreso. Los errores se
+        reintentan según `retry_policy` (RetryPolicy), esperando con
+        asyncio.sleep, y el recorrido termina a los `timeout` segundos.
+        `on_dir(carpeta, mtime)` se llama tras listar cada carpeta, antes de
+        procesar sus archivos.
+        """
+        import asyncio  # solo se carga si hay rutas de red que recorrer
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                               thread_name_prefix='net-scan')
+        self.dirs_scanned = 0
+        self.files_seen = 0
+        progress = queue.Queue()
+        cancel = threading.Event()
+        thread = threading.Thread(
+            target=asyncio.run,
+            args=(self._run(path, accepts, process, done, progress, cancel,
+                            stop_event, pause_event, retry_policy, timeout, on_dir),),
+            daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = progress.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            cancel.set()
+            thread.join()
+
+    async def _run(self, path, accepts, process, done, progress, cancel,
+                   stop_event, pause_event, retry_policy, timeout, on_dir):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        per_host = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        mounts = [] if os.name == 'nt' else self.mount_table()
+        root_host = self.network_host(path, mounts) or ''
+        pending = asyncio.Queue()
+        pending.put_nowait(path)
+
+        def stopped():
+            return cancel.is_set() or stop_event.is_set() or loop.time() > deadline
+
+        async def call(host, directory, fn, *args):
+            attempt = 0
+            while True:
+                try:
+                    async with in_flight, per_host[host]:
+                        result = await asyncio.wait_for(
+                            loop.run_in_executor(self.executor, fn, *args),
+                            max(0.0, deadline - loop.time()))
+                    retry_policy.record_success(directory)
+                    return result
+                except (OSError, asyncio.TimeoutError) as e:
+                    # Antes de 3.11 asyncio.TimeoutError no es el TimeoutError incorporado
+                    error = e if isinstance(e, OSError) else TimeoutError(str(e))
+                    if stopped() or not retry_policy.should_retry(error, attempt, directory):
+                        raise
+                # Espera sin bloquear ningún hilo antes de reintentar
+                await asyncio.sleep(retry_policy.backoff(attempt))
+                attempt += 1
+
+        async def handle_file(host, root, entry):
+            if not retry_policy.allow(root):
+                return
+            result = await call(host, root, process, root, entry)
+            if result is not None:
+                done.append(result)
+
+        async def walk():
+            while True:
+                current = await pending.get()
+                try:
+                    while (pause_event.is_set() or len(done) > self.max_backlog) \
+                            and not stopped():
+                        await asyncio.sleep(0.05)
+                    if stopped():
+                        continue
+                    # Una carpeta local puede contener montajes de otros servidores
+                    host = (root_host if os.name == 'nt'
+                            else self.network_host(current, mounts) or root_host)
+                    try:
+                        entries = await call(host, current, _list_dir, current)
+                    except (OSError, asyncio.TimeoutError) as e:
+                        print(f"Error al listar {current}: {str(e)}")
+                        entries = ([], [], None)
+                    dirs, files, mtime = entries
+                    if on_dir is not None:
+                        on_dir(current, mtime)
+                    for sub in dirs:
+                        pending.put_nowait(sub)
+                    self.dirs_scanned += 1
+                    self.files_seen += len(files)
+                    results = await asyncio.gather(
+                        *(handle_file(host, current, entry) for entry in files
+                          if accepts(current, entry)),
+                        return_exceptions=True)
+                    for error in results:
+                        if error is not None and not isinstance(error, (OSError, asyncio.TimeoutError)):
+                            print(f"Error procesando archivo en {current}: {str(error)}")
+                    progress.put((current, [], pending.qsize()))
+                finally:
+                    pending.task_done()
+
+        async def watch():
+            while not stopped():
+                await asyncio.sleep(0.1)
+
+        workers = [asyncio.create_task(walk()) for _ in range(self.dir_workers)]
+        finished = asyncio.create_task(pending.join())
+        watcher = asyncio.create_task(watch())
+        try:
+            await asyncio.wait({finished, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in workers + [finished, watcher]:
+                task.cancel()
+            await asyncio.gather(*workers, finished, watcher, return_exceptions=True)
+            progress.put(None)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+def _list_dir(path):
+    """Lista una carpeta: (subcarpetas, archivos como os.DirEntry, mtime de la carpeta)."""
+    mtime = os.stat(path).st_mtime
+    dirs, files = [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file():
+                    files.append(entry)
+            except OSError:
+                continue
+    return dirs, files, mtime
+
+# ==================== CACHÉ DE RESULTADOS ====================
+class ResultCache:
+    """Caché LRU acotada de resultados de stat, por carpeta y nombre.
+
+    Persiste entre búsquedas de la misma sesión. El límite es doble: cantidad
+    de entradas y un costo aproximado en bytes (el nombre domina el tamaño
+    de cada entrada), y el desalojo quita la entrada menos usada en O(1).
+    Cada carpeta guarda el mtime con el que se llenaron sus entradas; si al
+    volver a listarla el mtime cambió (se crearon, borraron o renombraron
+    archivos), sus entradas se descartan. Como reescribir un archivo en su
+    lugar no cambia el mtime de la carpeta, `get` además compara el tamaño y
+    el mtime guardados con el stat actual del archivo.
+    """
+    ENTRY_OVERHEAD = 200  # bytes aproximados de una entrada sin contar el nombre
+
+    def __init__(self, max_entries=100000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (carpeta, nombre) -> FileResult
+        self._by_dir = defaultdict(set)  # carpeta -> nombres en caché
+        self._dir_mtimes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, root, name, stat):
+        """Devuelve el resultado en caché si sigue coincidiendo con `stat`."""
+        with self._lock:
+            result = self._entries.get((root, name))
+            if (result is None or result.size != stat.st_size
+                    or result.mtime != stat.st_mtime):
+                self.misses += 1
+                return None
+            self._entries.move_to_end((root, name))
+            self.hits += 1
+            return result
+
+    def put(self, root, result):
+        """Guarda un resultado; devuelve False si ya estaba en caché sin cambios."""
+        key = (root, result.name)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                if cached.size == result.size and cached.mtime == result.mtime:
+                    return False
+                self._entries[key] = result
+                return True
+            self._entries[key] = result
+            self._by_dir[root].add(result.name)
+            self._bytes += self.ENTRY_OVERHEAD + len(result.name)
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                (old_root, old_name), _ = self._entries.popitem(last=False)
+                self._forget(old_root, old_name)
+            return True
+
+    def check_dir(self, root, mtime):
+        """Descarta las entradas de `root` si su mtime cambió desde que se llenaron."""
+        with self._lock:
+            previous = self._dir_mtimes.get(root)
+            self._dir_mtimes[root] = mtime
+            if previous is None or previous == mtime:
+                return
+            for name in self._by_dir.pop(root, ()):
+                del self._entries[(root, name)]
+                self._bytes -= self.ENTRY_OVERHEAD + len(name)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_dir.clear()
+            self._dir_mtimes.clear()
+            self._bytes = 0
+
+    def _forget(self, root, name):
+        # Llamar con self._lock tomado
+        self._bytes -= self.ENTRY_OVERHEAD + len(name)
+        names = self._by_dir.get(root)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._by_dir[root]
+                self._dir_mtimes.pop(root, None)
+
+# ==================== BUSCADOR MEJORADO PARA RED ====================
+class NetworkOptimizedSearcher:
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self.pause_event = threading.Event()
+        self.worker_pool = AdaptiveWorkerPool()  # persiste entre búsquedas
+        self.network_scanner = AsyncNetworkScanner()
+        self.async_network_scan = True  # recorrer rutas de red con el escáner asíncrono
+        self.max_results = 10000
+        self.timeout = 600  # 10 minutos para redes lentas
+        self.batch_size = 500  # Tamaño de lote reducido para red
+        self.file_cache = ResultCache(max_entries=100000)  # persiste entre búsquedas
+        self.fresh_results = []  # resultados con stat nuevo, pendientes de guardar en la base
+        self.max_retries = 3  # Reintentos para operaciones de red
+        self.retry_policy = RetryPolicy(self.max_retries)
+        self.db = EnhancedFileCacheDB()
+        self.indexer = EnhancedFileIndexer(self.db)
+        self.use_cache = True
+        self.use_index = True
+        self.path_validator = PathValidator()
+        self.content_pool = None  # ProcessPoolExecutor, se crea al primer uso
+        self.content_index = ContentIndex(self.db)
+        self.watcher = FileSystemWatcher(self.indexer, self.db)
+        self.dirs_scanned = 0
+        self.files_seen = 0
+        self.result_count = 0
+
+    def search(self, path, search_term, extension, type_extensions, callback, progress_callback, 
+              search_content=False, content_pattern=None, stat_filter=None, top_k=None,
+              order='recientes', content_match_all=False):
+        """Realiza una búsqueda optimizada para red.
+
+        `stat_filter` (StatFilter) limita tamaño y fecha: se resuelve en SQL en
+        la caché y con el stat del recorrido en el índice y en el disco.
+
+        Con `top_k` solo se entregan los `top_k` mejores según `order` (clave
+        de TopK.ORDERS), ya ordenados y al final de la búsqueda; durante el
+        recorrido se guardan en un heap acotado. Si la carpeta está vigilada
+        con inotify y la caché o el índice alcanzan para demostrar cuáles son, no se
+        recorre el disco (ver _top_without_walk).
+
+        Con `content_match_all` un patrón de literales separados por '|' exige
+        que el archivo contenga todos, no solo uno.
+        """
+        self.stop_event.clear()
+        self.pause_event.clear()
+        self.file_cache.reset_stats()
+        self.fresh_results = []
+        self.retry_policy.reset(self.max_retries)
+        self.result_count = 0
+        
+        start_time = time.time()
+        result_count = 0
+        
+        name_query = NameQuery(search_term)
+        extension = extension.lower() if extension else None
+        content_matcher = (ContentSearcher.get_matcher(content_pattern, content_match_all)
+                           if search_content and content_pattern else None)
+        top = TopK(top_k, order) if top_k else None
+        # En modo top-K el heap ya acota los resultados: max_results no corta el recorrido
+        max_results = float('inf') if top is not None else self.max_results
+        
+        # Las fases pueden encontrar el mismo archivo: cada uno se entrega una sola vez
+        emitted = set()
+        def emit(result):
+            if top is not None:
+                top.offer(result)  # TopK no repite archivos
+                return
+            if len(emitted) >= max_results:
+                return
+            key = (result.folder, result.name)
+            if key not in emitted:
+                emitted.add(key)
+                callback(result)
+                if len(emitted) >= max_results:
+                    # Alcanzado el máximo no hace falta seguir en ninguna fase
+                    self.stop_event.set()
+        
+        def found():
+            return len(top) if top is not None else len(emitted)
+        
+        try:
+            if not os.path.isdir(path):
+                progress_callback(0, 0)
+                return
+
+            index_type = None if not type_extensions else TYPE_NAMES[FileResult.type_code_for(extension)] if extension else None
+            covered = self.use_index and self.watcher.covers(path)
+            complete = top is not None and covered and self._top_without_walk(
+                top, path, name_query, extension, type_extensions, index_type,
+                content_matcher, stat_filter)
+            result_count = found()
+
+            # Fase 1: Buscar en el índice
+            if self.use_index and not complete:
+                indexed_results = self.indexer.search_index(name_query, index_type, path)
+                
+                batch = []
+                for full_path in indexed_results:
+                    if self.stop_event.is_set():
+                        break
+                    
+                    result = self._indexed_result(path, full_path, name_query, extension,
+                                                  type_extensions, stat_filter)
+                    if result is None:
+                        continue
+                    batch.append(result)
+                    if len(batch) >= self.batch_size:
+                        for result in self._filter_content(batch, content_matcher):
+                            emit(result)
+                        batch = []
+                
+                for result in self._filter_content(batch, content_matcher):
+                    emit(result)
+                result_count = found()
+
+            # Fase 2: Buscar en la caché de la base de datos (filtros resueltos en SQL).
+            # En modo top-K no: sus datos pueden estar viejos y la fase 1 (carpeta
+            # vigilada) o la 3 ya hacen stat de todos los archivos
+            if self.use_cache and top is None and result_count < 100:
+                cached_results = self.db.get_cached_results(
+                    path, name_query, extension, type_extensions,
+                    **(stat_filter.query_args() if stat_filter else {}))
+                batch = []
+                for result in cached_results:
+                    if self.stop_event.is_set() or result_count >= max_results:
+                        break
+                    
+                    batch.append(result)
+                    if len(batch) >= self.batch_size:
+                        for match in self._filter_content(batch, content_matcher):
+                            emit(match)
+                        result_count = found()
+                        batch = []
+                
+                for match in self._filter_content(batch, content_matcher):
+                    emit(match)
+                result_count = found()
+
+            # Fase 3: Búsqueda en disco si es necesario (un solo recorrido con scandir).
+            # Bajo una carpeta vigilada con inotify el índice ya está al día y no hace falta.
+            if (top is not None or result_count < 50 or not self.use_index) and not covered:
+                last_update_time = time.time()
+                done = deque()  # resultados de los hilos, pendientes de entregar
+
+                # En rutas de red el recorrido lo hace el escáner asíncrono, que
+                # ya deja en `done` los resultados; `entries` llega vacío
+                network = self.async_network_scan and AsyncNetworkScanner.network_host(path)
+                if network:
+                    walker = self.network_scanner.scan(
+                        path,
+                        lambda root, entry: self._accepts(root, entry, name_query, extension, type_extensions),
+                        self._process_file, done, self.stop_event, self.pause_event,
+                        self.retry_policy, self.timeout - (time.time() - start_time),
+                        self.file_cache.check_dir)
+                else:
+                    walker = self._scan_tree(path)
+
+                for root, entries, dirs_pending in walker:
+                    if network:
+                        self.dirs_scanned = self.network_scanner.dirs_scanned
+                        self.files_seen = self.network_scanner.files_seen
+                    if self.stop_event.is_set() or (time.time() - start_time) > self.timeout \
+                            or result_count >= max_results:
+                        break
+
+                    for entry in entries:
+                        if self.stop_event.is_set() or result_count >= max_results:
+                            break
+
+                        while self.pause_event.is_set():
+                            time.sleep(0.1)
+                            if self.stop_event.is_set():
+                                break
+
+                        # Los filtros por nombre no tocan el disco: solo se encola el stat
+                        if self._accepts(root, entry, name_query, extension, type_extensions):
+                            self.worker_pool.submit(
+                                self._process_network_file, (root, entry), done.append)
+
+                    if len(done) >= self.batch_size:
+                        self._process_batch(done, emit, content_matcher, stat_filter)
+                        result_count = found()
+
+                    # El total no se conoce de antemano: se estima con las carpetas pendientes
+                    current_time = time.time()
+                    if current_time - last_update_time > 0.5:
+                        progress = self.dirs_scanned / (self.dirs_scanned + dirs_pending) * 100
+                        progress_callback(progress, result_count, (self.dirs_scanned, self.files_seen))
+                        last_update_time = current_time
+
+                if network:
+                    walker.close()
+                    self.dirs_scanned = self.network_scanner.dirs_scanned
+                    self.files_seen = self.network_scanner.files_seen
+                if self.stop_event.is_set():
+                    self.worker_pool.cancel()
+                self.worker_pool.join()
+                self._process_batch(done, emit, content_matcher, stat_filter)
+                result_count = found()
+
+                # Actualizar la caché de la base de datos
+                if self.fresh_results:
+                    self.db.update_cache(self.fresh_results)
+                    self.fresh_results = []
+
+            if top is not None:
+                for result in top.results():
+                    callback(result)
+                result_count = len(top)
+
+            self.result_count = result_count
+            progress_callback(100, result_count, (self.dirs_scanned, self.files_seen))
+        except Exception as e:
+            progress_callback(0, 0)
+            print(f"Error en la búsqueda: {str(e)}")
+
+    def _indexed_result(self, root, full_path, name_query, extension, type_extensions, stat_filter):
+        """FileResult de un archivo encontrado en el índice, o None si no cumple los filtros."""
+        # Validar ruta segura
+        if not self.path_validator.is_safe_path(root, full_path):
+            return None
+        
+        file = os.path.basename(full_path)
+        file_lower = file.lower()
+        file_ext = os.path.splitext(file_lower)[1]
+        
+        if extension and file_ext != extension:
+            return None
+        if type_extensions and file_ext not in type_extensions:
+            return None
+        if name_query and not name_query.matches(file_lower):
+            return None
+        
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return None
+        if stat_filter and not stat_filter.matches(stat.st_size, stat.st_mtime):
+            return None
+        return FileResult(os.path.dirname(full_path), file, stat.st_size, stat.st_mtime)
+
+    def _top_without_walk(self, top, path, name_query, extension, type_extensions, index_type,
+                          content_matcher, stat_filter):
+        """Llena `top` sin recorrer el disco cuando se puede demostrar que está completo.
+
+        Se llama solo con la carpeta vigilada (el índice está al día). Por
+        fecha o tamaño hace falta además que el vigilante haya sincronizado la
+        caché con el disco y que todos los archivos indexados tengan fila en
+        ella: SQL entrega las filas ya ordenadas y se deja de leer en cuanto
+        el heap se llena. Cada fila se compara con el disco
+        antes de ofrecerla: las de archivos borrados se descartan y, si una
+        cambió, su lugar en el orden no vale y se busca normalmente. Por
+        nombre, los candidatos del índice se ordenan antes del stat y se corta
+        igual. Como los candidatos llegan en orden, lo que queda sin leer no
+        puede mejorar el heap lleno.
+        Devuelve False si no se pudo demostrar y hay que buscar normalmente.
+        """
+        changed = []
+        if top.order in self.db.ORDER_CLAUSES:
+            if (not self.use_cache or not self.watcher.cache_synced(path)
+                    or self.db.count_indexed_cached(path) < self.indexer.count_under(path)):
+                return False
+            candidates = self._unchanged(self.db.get_cached_results(
+                path, name_query, extension, type_extensions,
+                page_size=max(top.k, 100), order=top.order,
+                **(stat_filter.query_args() if stat_filter else {})), changed)
+        elif top.order == 'nombre':
+            paths = sorted(self.indexer.search_index(name_query, index_type, path),
+                           key=lambda full_path: (os.path.basename(full_path).lower(), full_path))
+            candidates = (result for result in (
+                self._indexed_result(path, full_path, name_query, extension, type_extensions, stat_filter)
+                for full_path in paths) if result is not None)
+        else:
+            return False
+        
+        # Por lotes completos: la búsqueda en contenido no conserva el orden dentro del lote
+        batch = []
+        for result in candidates:
+            if self.stop_event.is_set():
+                break
+            batch.append(result)
+            if len(batch) >= top.k:
+                for match in self._filter_content(batch, content_matcher):
+                    top.offer(match)
+                batch = []
+                if top.full:
+                    break
+        for match in self._filter_content(batch, content_matcher):
+            top.offer(match)
+        if changed:
+            top.clear()
+            return False
+        return True
+
+    @staticmethod
+    def _unchanged(results, changed):
+        """Los resultados de la caché que siguen igual en disco.
+
+        Los de archivos que ya no existen se saltan. Ante el primero que
+        cambió (o que no se pudo consultar) se agrega a `changed` y se corta.
+        """
+        for result in results:
+            try:
+                stat = os.stat(result.full_path)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                changed.append(result)
+                return
+            if stat.st_size != result.size or int(stat.st_mtime) != result.mtime:
+                changed.append(result)
+                return
+            yield result
+
+    def _process_batch(self, done, callback, content_matcher=None, stat_filter=None):
+        """Entrega los resultados que los hilos del pool dejaron en `done`.
+
+        Los filtros por nombre y el stat ya se resolvieron en los hilos; aquí
+        se guardan en la caché (también los que no pasan `stat_filter`, que
+        sirven a otras búsquedas) y la búsqueda en contenido de los que pasan
+        se hace en el pool de procesos.
+        """
+        results = []
+        for _ in range(len(done)):
+            result = done.popleft()
+            if self.file_cache.put(result.path, result):
+                self.fresh_results.append(result)
+            if stat_filter and not stat_filter.matches(result.size, result.mtime):
+                continue
+            results.append(result)
+        
+        for result in self._filter_content(results, content_matcher):
+            callback(result)
+
+    def _filter_content(self, results, content_matcher):
+        """Devuelve los resultados cuyo contenido cumple `content_matcher`.
+
+        Lo que el índice de contenido puede responder no se lee del disco. El
+        resto se reparte entre procesos (la búsqueda es intensiva en CPU); con
+        pocos archivos o si el pool no está disponible se buscan en este mismo
+        proceso.
+        """
+        if content_matcher is None or not results:
+            return results
+        indexed, results = self.content_index.match(results, content_matcher)
+        if not results:
+            return indexed
+        paths = [result.full_path for result in results]
+        if len(paths) >= 4:
+            try:
+                matches = list(self._get_content_pool().map(
+                    partial(ContentSearcher.match_file, content_matcher), paths,
+                    chunksize=max(1, len(paths) // (4 * (os.cpu_count() or 1)))))
+                return indexed + [result for result, match in zip(results, matches) if match]
+            except (BrokenExecutor, OSError, RuntimeError) as e:
+                print(f"Pool de búsqueda en contenido no disponible: {str(e)}")
+                self.content_pool = None
+        return indexed + [result for result, path in zip(results, paths) if content_matcher.matches_file(path)]
+
+    def _get_content_pool(self):
+        if self.content_pool is None:
+            from concurrent.futures import ProcessPoolExecutor  # carga multiprocessing
+            self.content_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return self.content_pool
+
+    def index_content(self, root):
+        """Actualiza el índice de contenido de los archivos indexados bajo root."""
+        root = os.path.abspath(root)
+        paths = self.indexer.paths_under(root)
+        try:
+            return self.content_index.update(root, paths, self._get_content_pool())
+        except (BrokenExecutor, OSError, RuntimeError):
+            self.content_pool = None
+            return self.content_index.update(root, paths)
+
+    def _process_network_file(self, root, entry, attempt=0):
+        """Procesa un archivo aplicando la política de reintentos.
+
+        Los errores transitorios no duermen en el hilo: RetryLater hace que el
+        pool vuelva a encolar la tarea cuando vence la espera.
+        """
+        if not self.retry_policy.allow(root):
+            return None
+        try:
+            result = self._process_file(root, entry)
+        except (OSError, TimeoutError) as e:
+            if self.retry_policy.should_retry(e, attempt, root):
+                raise RetryLater(self.retry_policy.backoff(attempt), (root, entry, attempt + 1))
+            return None
+        self.retry_policy.record_success(root)
+        return result
+
+    def _accepts(self, root, entry, name_query, extension, type_extensions):
+        """Aplica los filtros que solo dependen del nombre del archivo."""
+        file_lower = entry.name.lower()
+        file_ext = os.path.splitext(file_lower)[1]
+        
+        if extension and file_ext != extension:
+            return False
+        if type_extensions and file_ext not in type_extensions:
+            return False
+        if name_query and not name_query.matches(file_lower):
+            return False
+        
+        # Validar ruta segura
+        return self.path_validator.is_safe_path(root, entry.path)
+
+    def _process_file(self, root, entry):
+        """Obtiene el resultado de un archivo que ya pasó los filtros.
+
+        `entry` es el os.DirEntry obtenido por `_scan_tree`: el tipo ya viene
+        del listado del directorio y su stat() queda en caché, así que no se
+        repiten isfile/stat por cada candidato. Una entrada de `file_cache`
+        solo se reutiliza si su tamaño y mtime coinciden con ese stat.
+        """
+        file = entry.name
+        try:
+            stat = entry.stat()
+            cached = self.file_cache.get(root, file, stat)
+            if cached is not None:
+                return cached
+                
+            return FileResult(root, file, stat.st_size, stat.st_mtime)
+        except OSError:
+            raise  # la política de reintentos decide qué hacer
+        except Exception as e:
+            print(f"Error procesando archivo {file}: {str(e)}")
+            return None
+
+    def _scan_tree(self, path):
+        """Recorre el árbol una sola vez con os.scandir.
+
+        Genera (carpeta, archivos, carpetas_pendientes) por cada directorio,
+        donde archivos son los os.DirEntry de tipo archivo. Mantiene
+        `dirs_scanned` y `files_seen` para informar el progreso sin necesidad
+        de contar los archivos antes de empezar. El mtime de cada carpeta
+        invalida en `file_cache` las entradas que quedaron viejas.
+        """
+        self.dirs_scanned = 0
+        self.files_seen = 0
+        pending = [(path, None)]  # (carpeta, DirEntry con el que se encontró)
+        while pending:
+            if self.stop_event.is_set():
+                return
+            current, dir_entry = pending.pop()
+            files = []
+            try:
+                stat = dir_entry.stat(follow_symlinks=False) if dir_entry else os.stat(current)
+                self.file_cache.check_dir(current, stat.st_mtime)
+            except OSError:
+                self.file_cache.check_dir(current, None)
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append((entry.path, entry))
+                            elif entry.is_file():
+                                files.append(entry)
+                        except OSError:
+                            continue
+            except OSError as e:
+                print(f"Error al listar {current}: {str(e)}")
+            self.dirs_scanned += 1
+            self.files_seen += len(files)
+            yield current, files, len(pending)
+    
+    @property
+    def cache_hits(self):
+        return self.file_cache.hits
+
+    @property
+    def cache_misses(self):
+        return self.file_cache.misses
+
+    def summary(self):
+        """Resumen de la última búsqueda para mostrar al terminar."""
+        return {
+            'results': self.result_count,
+            'dirs_scanned': self.dirs_scanned,
+            'files_seen': self.files_seen,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'retries': self.retry_policy.retries,
+            'skipped': self.retry_policy.skipped,
+            'unreachable_dirs': sorted(self.retry_policy.tripped),
+        }
+
+    def stop(self):
+        """Detiene la búsqueda actual."""
+        self.stop_event.set()
+        self.worker_pool.cancel()
+    
+    def pause(self):
+        """Pausa la búsqueda actual."""
+        self.pause_event.set()
+    
+    def resume(self):
+        """Reanuda la búsqueda pausada."""
+        self.pause_event.clear()
+
+
+# ==================== API SIN INTERFAZ GRÁFICA ====================
+def search_files(path, name=None, extension=None, file_type=None, content=None,
+                 searcher=None, progress=None, min_size=None, max_size=None,
+                 modified_after=None, modified_before=None, top_k=None, order='recientes',
+                 match_all=False):
+    """Genera los FileResult que cumplen los filtros a medida que se encuentran.
+
+    Usa el mismo NetworkOptimizedSearcher que la interfaz (índice, caché y
+    recorrido del disco) en un hilo aparte. `file_type` es una clave de
+    FILE_TYPES y `content` un patrón para buscar dentro de los archivos (con
+    `match_all`, sus literales separados por '|' deben aparecer todos).
+    Los tamaños van en bytes y las fechas en epoch (mínimos inclusivos,
+    máximos exclusivos).
+    Con `top_k` solo se generan los `top_k` primeros según `order` (clave de
+    TopK.ORDERS), ordenados y al terminar la búsqueda.
+    `progress(porcentaje, resultados, (carpetas, archivos))` recibe el avance.
+    Si se deja de consumir el generador, la búsqueda se detiene.
+    """
+    searcher = searcher or NetworkOptimizedSearcher()
+    type_extensions = [ext.lower() for ext in FILE_TYPES.get(file_type, [])]
+    stat_filter = StatFilter(min_size, max_size, modified_after, modified_before)
+    results = queue.Queue(maxsize=10000)
+    finished = object()
+
+    def progress_callback(value, count, scanned=None):
+        if progress is not None:
+            progress(value, count, scanned)
+
+    def run():
+        try:
+            searcher.search(path, name or '', extension or '', type_extensions,
+                            results.put, progress_callback, bool(content), content, stat_filter,
+                            top_k, order, match_all)
+        finally:
+            results.put(finished)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            result = results.get()
+            if result is finished:
+                return
+            yield result
+    finally:
+        searcher.stop()
+        # Vaciar la cola para que el hilo no quede bloqueado en put()
+        while thread.is_alive():
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+def index_folder(path, index_content=False, searcher=None):
+    """Actualiza el índice (y opcionalmente el de contenido) de `path`.
+
+    Devuelve un resumen con los archivos indexados y las carpetas re-listadas.
+    """
+    searcher = searcher or NetworkOptimizedSearcher()
+    indexer = searcher.indexer
+    indexer.build_index(path)
+    searcher.db.update_cache(indexer.get_all_files(indexer.last_changed_dirs))
+    summary = {
+        'indexed_files': indexer.file_count(),
+        'changed_dirs': len(indexer.last_changed_dirs),
+    }
+    if index_content:
+        summary['content_updated'] = searcher.index_content(path)
+    return summary
+
+# ==================== LÍNEA DE COMANDOS ====================
+def _argument(parse):
+    """Adapta un conversor que lanza ValueError a un `type` de argparse con su mensaje."""
+    def convert(text):
+        try:
+            return parse(text)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return convert
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='motor_busqueda', description="Búsqueda de archivos sin interfaz gráfica.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    search = commands.add_parser('buscar', help="buscar archivos y escribir los resultados en la salida estándar")
+    search.add_argument('ruta')
+    search.add_argument('-n', '--nombre', default='',
+                        help='términos del nombre: espacios = AND, "|" = OR, comillas = frase')
+    search.add_argument('-e', '--extension', default='', help="extensión exacta, p. ej. .pdf")
+    search.add_argument('-t', '--tipo', choices=list(FILE_TYPES), help="tipo de archivo")
+    search.add_argument('-c', '--contenido', help="patrón a buscar dentro de los archivos")
+    search.add_argument('--todas', action='store_true',
+                        help='con -c: el archivo debe contener todas las palabras separadas por "|"')
+    search.add_argument('-f', '--formato', choices=['jsonl', 'csv'], default='jsonl',
+                        help="formato de la salida estándar")
+    search.add_argument('-o', '--salida',
+                        help="escribir en un archivo .csv, .jsonl, .xlsx o .parquet en lugar de stdout")
+    search.add_argument('--min-tamano', type=_argument(StatFilter.parse_size),
+                        help="tamaño mínimo, p. ej. 500K, 10M")
+    search.add_argument('--max-tamano', type=_argument(StatFilter.parse_size),
+                        help="tamaño máximo (excluido), p. ej. 1G")
+    search.add_argument('--desde', type=_argument(StatFilter.parse_date),
+                        help="modificados desde esta fecha (AAAA-MM-DD, incluida)")
+    search.add_argument('--hasta', type=_argument(StatFilter.parse_date),
+                        help="modificados antes de esta fecha (AAAA-MM-DD, excluida)")
+    search.add_argument('-m', '--max', type=int, default=10000, help="máximo de resultados")
+    search.add_argument('--primeros', type=int, metavar='N',
+                        help="solo los N primeros según --orden, ya ordenados")
+    search.add_argument('--orden', choices=list(TopK.ORDERS), default='recientes',
+                        help="orden de --primeros (por defecto: recientes)")
+    search.add_argument('--sin-indice', action='store_true', help="no usar el índice")
+    search.add_argument('--sin-cache', action='store_true', help="no usar la caché")
+    
+    scan = commands.add_parser('escanear', help="actualizar el índice de una carpeta")
+    scan.add_argument('ruta')
+    scan.add_argument('--contenido', action='store_true', help="indexar también el contenido")
+    
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.ruta):
+        parser.error(f"la ruta no existe o no es una carpeta: {args.ruta}")
+    args.ruta = os.path.abspath(args.ruta)
+    if getattr(args, 'primeros', None) is not None and args.primeros < 1:
+        parser.error("--primeros debe ser mayor que cero")
+    if getattr(args, 'salida', None):
+        try:
+            StreamingExporter.check_available(StreamingExporter.format_for(args.salida))
+        except (ValueError, ImportError) as e:
+            parser.error(str(e))
+    
+    out = sys.stdout
+    try:
+        # Los mensajes de diagnóstico van a stderr para no mezclarse con los resultados
+        with contextlib.redirect_stdout(sys.stderr):
+            searcher = NetworkOptimizedSearcher()
+            if args.command == 'escanear':
+                summary = index_folder(args.ruta, args.contenido, searcher)
+                out.write(json.dumps(summary, ensure_ascii=False) + '\n')
+                return 0
+            
+            searcher.max_results = args.max
+            searcher.use_index = not args.sin_indice
+            searcher.use_cache = not args.sin_cache
+            results = search_files(args.ruta, args.nombre, args.extension.lower(), args.tipo,
+                                   args.contenido, searcher, min_size=args.min_tamano,
+                                   max_size=args.max_tamano, modified_after=args.desde,
+                                   modified_before=args.hasta, top_k=args.primeros,
+                                   order=args.orden, match_all=args.todas)
+            with StreamingExporter(args.salida or out,
+                                   None if args.salida else args.formato) as exporter:
+                exporter.write_all(results)
+            results.close()
+            return 0
+    except BrokenPipeError:
+        # La salida se cerró antes de tiempo (p. ej. "| head"): no es un error
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Carpeta de trabajo temporal: la caché y el índice se crean en la ruta actual."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Árbol de prueba con 30 archivos de texto en dos niveles."""
+    root = tmp_path / 'datos'
+    (root / 'sub').mkdir(parents=True)
+    for i in range(20):
+        (root / f'informe_{i}.txt').write_text(f'informe {i}\n')
+    for i in range(10):
+        (root / 'sub' / f'acta_{i}.txt').write_text(f'acta {i}\n')
+    return root
@@ -0,0 +1,26 @@
+import json
+
+import motor_busqueda
+
+
+def run(capsys, *argv):
+    assert motor_busqueda.main(list(argv)) == 0
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_search_lists_all_matches(workdir, tree, capsys):
+    rows = run(capsys, 'buscar', str(tree))
+    assert len(rows) == 30
+
+
+def test_max_limits_results(workdir, tree, capsys):
+    rows = run(capsys, 'buscar', str(tree), '-m', '5')
+    assert len(rows) == 5
+    assert len({row['full_path'] for row in rows}) == 5
+
+
+def test_max_limits_results_from_index(workdir, tree, capsys):
+    run(capsys, 'escanear', str(tree))
+    rows = run(capsys, 'buscar', str(tree), '-n', 'informe', '-m', '3')
+    assert len(rows) == 3
+    assert all(row['name'].startswith('informe') for row in rows)
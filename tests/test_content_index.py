@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from motor_busqueda import ContentIndex, ContentMatcher, EnhancedFileCacheDB, FileResult
+
+
+@pytest.fixture
+def index(workdir):
+    content = ContentIndex(EnhancedFileCacheDB())
+    if not content.enabled:
+        pytest.skip("SQLite sin FTS5")
+    return content
+
+
+def results_for(root, count):
+    results = []
+    for i in range(count):
+        path = root / f'nota_{i}.txt'
+        path.write_text('presupuesto anual\n' if i % 3 == 0 else 'otra cosa\n')
+        st = path.stat()
+        results.append(FileResult(str(root), path.name, st.st_size, st.st_mtime))
+    return results
+
+
+@pytest.mark.parametrize('chunk', [7, ContentIndex.SQL_CHUNK])
+def test_match_splits_long_lists(index, tmp_path, monkeypatch, chunk):
+    monkeypatch.setattr(ContentIndex, 'SQL_CHUNK', chunk)
+    root = tmp_path / 'notas'
+    root.mkdir()
+    results = results_for(root, 1200)
+    assert index.update(str(root), [r.full_path for r in results]) == 1200
+
+    matched, pending = index.match(results, ContentMatcher('presupuesto'))
+    assert pending == []
+    assert sorted(r.name for r in matched) == sorted(f'nota_{i}.txt' for i in range(0, 1200, 3))
+
+
+def test_match_leaves_changed_files_pending(index, tmp_path):
+    root = tmp_path / 'notas'
+    root.mkdir()
+    results = results_for(root, 10)
+    index.update(str(root), [r.full_path for r in results])
+    os.utime(root / 'nota_0.txt', (0, results[0].mtime + 10))
+    results[0] = FileResult(str(root), 'nota_0.txt', results[0].size, results[0].mtime + 10)
+
+    matched, pending = index.match(results, ContentMatcher('presupuesto'))
+    assert [r.name for r in pending] == ['nota_0.txt']
+    assert sorted(r.name for r in matched) == ['nota_3.txt', 'nota_6.txt', 'nota_9.txt']
@@ -0,0 +1,158 @@
+import os
+
+from motor_busqueda import (CompactFileIndex, EnhancedFileIndexer, IndexSnapshot, NameQuery,
+                            TYPE_NAMES)
+
+
+def build(count=20, folders=('/datos/a', '/datos/b')):
+    files = CompactFileIndex()
+    for folder in folders:
+        for i in range(count):
+            files.append(folder, f'informe_{i}.txt')
+        files.append(folder, 'foto.jpg')
+    return files
+
+
+def paths(files, ids):
+    return {files.path(file_id) for file_id in ids}
+
+
+def check_consistent(files):
+    """Los trigramas, las carpetas y `find` apuntan a los archivos correctos.
+
+    Las bajas posteriores a la última compactación siguen en los trigramas,
+    pero marcadas.
+    """
+    live = set(files.live_ids())
+    for trigram, postings in files.trigrams.items():
+        for file_id in postings:
+            assert file_id in live or files.file_dirs[file_id] == CompactFileIndex.DELETED
+            assert trigram in files.name(file_id).lower()
+    for folder in files.dirs:
+        for name in files.names_in(folder):
+            file_id = files.find(folder, name)
+            assert file_id in live
+            assert files.entry(file_id) == (folder, name)
+
+
+def test_search_by_terms_type_and_path():
+    files = build()
+    assert paths(files, files.search(NameQuery('informe_1'))) == {
+        f'{folder}/informe_{i}.txt' for folder in ('/datos/a', '/datos/b')
+        for i in [1] + list(range(10, 20))}
+    assert paths(files, files.search(NameQuery('foto | informe_3'))) == {
+        '/datos/a/foto.jpg', '/datos/b/foto.jpg', '/datos/a/informe_3.txt', '/datos/b/informe_3.txt'}
+    assert paths(files, files.search(type_code=TYPE_NAMES.index('Imágenes'))) == {
+        '/datos/a/foto.jpg', '/datos/b/foto.jpg'}
+    assert paths(files, files.search(NameQuery('jp'), path_part='/b')) == {'/datos/b/foto.jpg'}
+
+
+def test_remove_marks_deleted_without_compacting_small_indexes():
+    files = build()
+    files.remove('/datos/a', 'informe_1.txt')
+    assert files.deleted == 1
+    assert len(files) == len(files.file_dirs) - 1
+    assert files.find('/datos/a', 'informe_1.txt') is None
+    assert '/datos/a/informe_1.txt' not in paths(files, files.search(NameQuery('informe_1')))
+
+
+def test_compact_after_passing_ratio(monkeypatch):
+    monkeypatch.setattr(CompactFileIndex, 'COMPACT_MIN', 4)
+    files = build()
+    total = len(files.file_dirs)
+    removed = 0
+    while files.deleted == removed and removed < total:
+        files.remove('/datos/a', f'informe_{removed}.txt')
+        removed += 1
+    # Al pasar COMPACT_RATIO los buffers se reconstruyen sin las bajas
+    assert removed > CompactFileIndex.COMPACT_RATIO * total
+    assert files.deleted == 0
+    assert len(files.file_dirs) == len(files) == total - removed
+    assert {file_id for postings in files.trigrams.values() for file_id in postings} == set(files.live_ids())
+    check_consistent(files)
+    assert paths(files, files.search(NameQuery('informe_1'))) == (
+        {f'/datos/b/informe_{i}.txt' for i in [1] + list(range(10, 20))}
+        | {f'/datos/a/informe_{i}.txt' for i in [1] + list(range(10, 20)) if i >= removed})
+    assert files.find('/datos/a', 'informe_0.txt') is None
+    # Las altas y bajas siguen funcionando con los ids nuevos
+    files.add('/datos/a', 'informe_0.txt')
+    files.remove('/datos/b', 'foto.jpg')
+    check_consistent(files)
+    assert files.find('/datos/a', 'informe_0.txt') is not None
+    assert paths(files, files.search(NameQuery('foto'))) == {'/datos/a/foto.jpg'}
+
+
+def test_compact_after_removing_folders(monkeypatch):
+    monkeypatch.setattr(CompactFileIndex, 'COMPACT_MIN', 4)
+    files = build(folders=('/datos/a', '/datos/b', '/datos/c'))
+    files.find('/datos/a', 'foto.jpg')  # arma la búsqueda por nombre de la carpeta
+    files.remove_dir('/datos/a')
+    files.remove_dir('/datos/b')
+    assert files.deleted == 0
+    assert files.names_in('/datos/a') == []
+    assert files.find('/datos/a', 'foto.jpg') is None
+    check_consistent(files)
+    assert paths(files, files.search(NameQuery('foto'))) == {'/datos/c/foto.jpg'}
+
+
+def snapshot_of(files, tmp_path, generation=7):
+    path = str(tmp_path / 'indice.index')
+    assert IndexSnapshot.write(files, path, generation)
+    return path
+
+
+def test_snapshot_round_trip(tmp_path):
+    files = build()
+    files.append('/datos/ñandú', 'año.txt')
+    files.remove('/datos/b', 'informe_5.txt')
+    path = snapshot_of(files, tmp_path)
+    snapshot = IndexSnapshot.open(path, 7)
+    try:
+        assert not snapshot.writable
+        assert len(snapshot) == len(files)
+        assert {snapshot.entry(i) for i in snapshot.live_ids()} == {files.entry(i) for i in files.live_ids()}
+        for query in ('informe_1', 'foto | año', 'in', 'informe 5', 'ñandú'):
+            assert paths(snapshot, snapshot.search(NameQuery(query))) == paths(
+                files, files.search(NameQuery(query)))
+        code = TYPE_NAMES.index('Imágenes')
+        assert paths(snapshot, snapshot.search(type_code=code)) == paths(files, files.search(type_code=code))
+        assert sorted(snapshot.names_in('/datos/b')) == sorted(files.names_in('/datos/b'))
+        assert sorted(snapshot.dirs_under('/datos')) == ['/datos/a', '/datos/b', '/datos/ñandú']
+        # La copia modificable conserva todo
+        copy = snapshot.to_compact()
+        assert {copy.entry(i) for i in copy.live_ids()} == {files.entry(i) for i in files.live_ids()}
+    finally:
+        snapshot.close()
+
+
+def test_snapshot_rejects_other_generation_or_damage(tmp_path):
+    path = snapshot_of(build(), tmp_path)
+    assert IndexSnapshot.open(path, 8) is None
+    assert IndexSnapshot.open(str(tmp_path / 'no_existe.index'), 7) is None
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+    assert IndexSnapshot.open(path, 7) is None
+
+
+def test_load_index_rebuilds_snapshot_when_generation_changes(workdir, tree):
+    indexer = EnhancedFileIndexer()
+    indexer.build_index(str(tree))
+    indexer.load_index()
+    assert isinstance(indexer.files, IndexSnapshot)
+    first = indexer.db.index_generation()
+    assert indexer.file_count() == 30
+    
+    (tree / 'sub' / 'nuevo.txt').write_text('nuevo')
+    os.remove(tree / 'informe_0.txt')
+    other = EnhancedFileIndexer()  # otra instancia actualiza la base
+    other.build_index(str(tree))
+    assert other.db.index_generation() != first
+    
+    # La instantánea vieja no corresponde a la generación nueva: se rehace desde la base
+    indexer.load_index()
+    assert isinstance(indexer.files, IndexSnapshot)
+    found = indexer.search_index('nuevo')
+    assert found == {os.path.join(str(tree), 'sub', 'nuevo.txt')}
+    assert not indexer.search_index('informe_0.txt')
+    assert indexer.file_count() == 30
+    assert IndexSnapshot.open(indexer.snapshot_path, indexer.db.index_generation()) is not None
@@ -0,0 +1,157 @@
+import sqlite3
+import time
+
+import pytest
+
+from motor_busqueda import EnhancedFileCacheDB, FileResult, NameQuery, StatFilter
+
+NOW = 1700000000
+
+
+def test_name_query_parsing():
+    assert NameQuery('Informe 2023').groups == [['informe', '2023']]
+    assert NameQuery('"informe final" 2023 | acta').groups == [['informe final', '2023'], ['acta']]
+    assert NameQuery('a|  |b').groups == [['a'], ['b']]
+    assert not NameQuery('')
+    assert not NameQuery(None)
+    assert not NameQuery(' | ')
+
+
+@pytest.mark.parametrize('text, name, expected', [
+    ('informe 2023', 'informe_ventas_2023.pdf', True),
+    ('informe 2023', 'informe_ventas_2022.pdf', False),
+    ('2023 informe', 'informe_ventas_2023.pdf', True),
+    ('"informe final"', 'el informe final.docx', True),
+    ('"informe final"', 'informe_final.docx', False),
+    ('acta | informe 2023', 'acta_junta.pdf', True),
+    ('acta | informe 2023', 'informe_2022.pdf', False),
+    ('INFORME', 'informe.pdf', True),
+])
+def test_name_query_matches(text, name, expected):
+    assert NameQuery(text).matches(name) is expected
+
+
+@pytest.fixture
+def db(workdir):
+    db = EnhancedFileCacheDB()
+    db.update_cache([
+        FileResult('/datos', 'informe_2023.pdf', 1000, NOW - 100),
+        FileResult('/datos', 'informe_2022.pdf', 5000, NOW - 400 * 86400),
+        FileResult('/datos/sub', 'acta.DOCX', 20000, NOW - 10),
+        FileResult('/datos/sub', 'foto.jpg', 2048, NOW),
+        FileResult('/datos/50%_off', 'ab.txt', 10, NOW),
+        FileResult('/datos2', 'informe_2023.pdf', 1000, NOW),
+    ])
+    return db
+
+
+def names(results):
+    return sorted(r.full_path for r in results)
+
+
+def test_cached_results_stay_under_path(db):
+    assert names(db.get_cached_results('/datos/sub')) == ['/datos/sub/acta.DOCX', '/datos/sub/foto.jpg']
+    assert names(db.get_cached_results('/datos/50%_off')) == ['/datos/50%_off/ab.txt']
+    # '/datos2' comparte el prefijo de texto pero no está dentro de '/datos'
+    assert len(names(db.get_cached_results('/datos'))) == 5
+
+
+@pytest.mark.parametrize('fts', [True, False])
+def test_cached_results_filter_by_name(db, fts):
+    db.fts_enabled = db.fts_enabled and fts
+    def query(text):
+        return names(db.get_cached_results('/datos', NameQuery(text)))
+    assert query('informe 2023') == ['/datos/informe_2023.pdf']
+    assert query('acta | jpg') == ['/datos/sub/acta.DOCX', '/datos/sub/foto.jpg']
+    # Términos de menos de 3 caracteres: no tienen trigramas y van por LIKE
+    assert query('ab') == ['/datos/50%_off/ab.txt']
+    assert query('informe 22') == ['/datos/informe_2022.pdf']
+    # % y _ son literales, no comodines
+    assert query('%') == []
+    assert query('e_2') == ['/datos/informe_2022.pdf', '/datos/informe_2023.pdf']
+    assert query('"acta.docx"') == ['/datos/sub/acta.DOCX']
+
+
+def test_cached_results_filter_by_extension_and_type(db):
+    assert names(db.get_cached_results('/datos', extension='.docx')) == ['/datos/sub/acta.DOCX']
+    assert names(db.get_cached_results('/datos', type_extensions=['.jpg', '.txt'])) == [
+        '/datos/50%_off/ab.txt', '/datos/sub/foto.jpg']
+
+
+def test_cached_results_filter_by_size_and_date(db):
+    def query(**bounds):
+        return names(db.get_cached_results('/datos', **bounds))
+    # Mínimos inclusivos, máximos exclusivos
+    assert query(min_size=2048) == ['/datos/informe_2022.pdf', '/datos/sub/acta.DOCX', '/datos/sub/foto.jpg']
+    assert query(max_size=2048) == ['/datos/50%_off/ab.txt', '/datos/informe_2023.pdf']
+    assert query(min_size=1000, max_size=5000) == ['/datos/informe_2023.pdf', '/datos/sub/foto.jpg']
+    assert query(modified_after=NOW - 10) == [
+        '/datos/50%_off/ab.txt', '/datos/sub/acta.DOCX', '/datos/sub/foto.jpg']
+    assert query(modified_before=NOW - 10) == ['/datos/informe_2022.pdf', '/datos/informe_2023.pdf']
+    assert query(**StatFilter(min_size=1000, modified_after=NOW - 86400).query_args()) == [
+        '/datos/informe_2023.pdf', '/datos/sub/acta.DOCX', '/datos/sub/foto.jpg']
+
+
+def test_cached_results_order_and_paging(db):
+    results = db.get_cached_results('/datos', order='grandes', page_size=2)
+    assert [r.name for r in results] == ['acta.DOCX', 'informe_2022.pdf', 'foto.jpg', 'informe_2023.pdf', 'ab.txt']
+    assert len(list(db.get_cached_results('/datos', page_size=2))) == 5
+
+
+def test_old_schema_is_migrated(workdir):
+    # Base de una versión anterior: sin ext, tamaño en KB y fecha REAL
+    with sqlite3.connect('file_search_cache.db') as conn:
+        conn.execute("""
+            CREATE TABLE file_cache (
+                path_hash TEXT PRIMARY KEY, path TEXT NOT NULL, name TEXT NOT NULL,
+                size INTEGER NOT NULL, modified INTEGER NOT NULL, type TEXT NOT NULL,
+                full_path TEXT NOT NULL, last_scanned REAL NOT NULL, indexed_at REAL NOT NULL)
+        """)
+        now = time.time()
+        conn.executemany("INSERT INTO file_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            ('h1', '/datos', 'Informe.PDF', 1.5, NOW + 0.75, 'Documentos', '/datos/Informe.PDF', now, now),
+            ('h2', '/datos', 'foto.jpg', 2, NOW, 'Imágenes', '/datos/foto.jpg', now, now),
+        ])
+    db = EnhancedFileCacheDB()
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == EnhancedFileCacheDB.SCHEMA_VERSION
+        rows = conn.execute("SELECT name, size, modified, ext FROM file_cache ORDER BY name").fetchall()
+    assert rows == [('Informe.PDF', 1536, NOW, '.pdf'), ('foto.jpg', 2048, NOW, '.jpg')]
+    # Las filas viejas aparecen en los filtros por extensión, tipo y nombre
+    assert names(db.get_cached_results('/datos', extension='.pdf')) == ['/datos/Informe.PDF']
+    assert names(db.get_cached_results('/datos', type_extensions=['.jpg'])) == ['/datos/foto.jpg']
+    assert names(db.get_cached_results('/datos', NameQuery('informe'))) == ['/datos/Informe.PDF']
+    # Abrirla de nuevo no vuelve a convertir los tamaños
+    EnhancedFileCacheDB()
+    assert [r.size for r in db.get_cached_results('/datos', order='grandes')] == [2048, 1536]
+
+
+def test_stat_filter_bounds():
+    stat_filter = StatFilter(min_size=100, max_size=200, modified_after=NOW, modified_before=NOW + 10)
+    assert stat_filter.matches(100, NOW)
+    assert not stat_filter.matches(99, NOW)
+    assert not stat_filter.matches(200, NOW)
+    assert not stat_filter.matches(150, NOW - 1)
+    assert not stat_filter.matches(150, NOW + 10)
+    assert StatFilter(max_size=200).matches(0, 0)
+    assert not StatFilter()
+    assert StatFilter(modified_before=0)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('500', 500), ('500K', 500 * 1024), ('10 MB', 10 * 1024 ** 2), ('1,5g', int(1.5 * 1024 ** 3)),
+])
+def test_stat_filter_parse_size(text, expected):
+    assert StatFilter.parse_size(text) == expected
+
+
+@pytest.mark.parametrize('text', ['', 'diez', '10X', '-5K'])
+def test_stat_filter_rejects_bad_size(text):
+    with pytest.raises(ValueError):
+        StatFilter.parse_size(text)
+
+
+def test_stat_filter_parse_date():
+    assert StatFilter.parse_date('2024-01-31') == time.mktime((2024, 1, 31, 0, 0, 0, 0, 0, -1))
+    with pytest.raises(ValueError):
+        StatFilter.parse_date('31/01/2024')
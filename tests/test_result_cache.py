@@ -0,0 +1,41 @@
+import os
+
+from motor_busqueda import FileResult, NetworkOptimizedSearcher, ResultCache
+
+
+def entry_for(path):
+    with os.scandir(os.path.dirname(path)) as it:
+        return next(e for e in it if e.path == str(path))
+
+
+def test_hit_requires_same_stat(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_text('uno')
+    st = path.stat()
+    cache = ResultCache()
+    cache.put(str(tmp_path), FileResult(str(tmp_path), 'a.txt', st.st_size, st.st_mtime))
+    assert cache.get(str(tmp_path), 'a.txt', st) is not None
+
+    path.write_text('uno dos')
+    os.utime(path, (st.st_atime, st.st_mtime + 10))
+    assert cache.get(str(tmp_path), 'a.txt', path.stat()) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_file_rewritten_in_place_is_not_stale(tmp_path):
+    """Reescribir un archivo no cambia el mtime de la carpeta."""
+    path = tmp_path / 'a.txt'
+    path.write_text('uno')
+    searcher = NetworkOptimizedSearcher()
+    root = str(tmp_path)
+    searcher.file_cache.check_dir(root, os.stat(root).st_mtime)
+    first = searcher._process_file(root, entry_for(path))
+    searcher.file_cache.put(root, first)
+
+    dir_mtime = os.stat(root).st_mtime
+    path.write_text('uno dos tres')
+    os.utime(path, (first.mtime, first.mtime + 10))
+    searcher.file_cache.check_dir(root, dir_mtime)
+    second = searcher._process_file(root, entry_for(path))
+    assert (second.size, second.mtime) == (len('uno dos tres'), first.mtime + 10)
+    assert searcher.file_cache.put(root, second)
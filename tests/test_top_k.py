@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+
+import pytest
+
+from motor_busqueda import FileResult, NetworkOptimizedSearcher, TopK, index_folder, search_files
+
+
+def result(name, size=0, mtime=0, folder='/datos'):
+    return FileResult(folder, name, size, mtime)
+
+
+def names(top):
+    return [r.name for r in top.results()]
+
+
+@pytest.mark.parametrize('order, expected', [
+    ('recientes', ['/datos/c', '/datos/a', '/datos/d']),
+    ('antiguos', ['/datos/b', '/datos/e', '/datos/d']),
+    ('grandes', ['/datos/b', '/datos/d', '/datos/a']),
+    ('pequeños', ['/datos/e', '/datos/c', '/datos/a']),
+    ('nombre', ['/datos/a', '/otra/A', '/datos/b']),
+])
+def test_orders_keep_the_best_k(order, expected):
+    top = TopK(3, order)
+    for r in [result('a', 30, 40), result('b', 50, 10), result('c', 20, 50),
+              result('d', 40, 30), result('e', 10, 20), result('A', 30, 30, '/otra')]:
+        top.offer(r)
+    assert len(top) == 3 and top.full
+    # Los empates (d y A en fecha, a y A en tamaño y nombre) se resuelven por ruta completa
+    assert [r.full_path for r in top.results()] == expected
+
+
+def test_ties_do_not_depend_on_arrival_order():
+    files = [result(f'f{i}', 10, 100) for i in range(6)]
+    first, second = TopK(3, 'recientes'), TopK(3, 'recientes')
+    for r in files:
+        first.offer(r)
+    for r in reversed(files):
+        second.offer(r)
+    assert names(first) == names(second) == ['f0', 'f1', 'f2']
+
+
+def test_same_file_is_kept_once():
+    top = TopK(3, 'grandes')
+    assert top.offer(result('a', 10))
+    assert not top.offer(result('a', 10))
+    assert len(top) == 1
+
+
+def test_reoffered_file_with_new_stats_replaces_entry():
+    top = TopK(2, 'recientes')
+    top.offer(result('a', mtime=10))
+    top.offer(result('b', mtime=20))
+    assert top.offer(result('a', mtime=30))
+    assert [(r.name, r.mtime) for r in top.results()] == [('a', 30), ('b', 20)]
+    # Con datos peores también vale el último: el archivo no queda repetido
+    top.offer(result('a', mtime=5))
+    assert [(r.name, r.mtime) for r in top.results()] == [('b', 20), ('a', 5)]
+    top.offer(result('c', mtime=15))
+    assert [(r.name, r.mtime) for r in top.results()] == [('b', 20), ('c', 15)]
+
+
+def make_tree(root):
+    os.makedirs(root)
+    now = time.time()
+    for i in range(20):
+        path = os.path.join(root, f'f{i}.txt')
+        with open(path, 'w') as f:
+            f.write('x' * i)
+        os.utime(path, (now - 1000 + i * 10,) * 2)
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason="requiere inotify")
+def test_early_termination_skips_deleted_file_cache_row(workdir, monkeypatch):
+    root = str(workdir / 'datos')
+    make_tree(root)
+    searcher = NetworkOptimizedSearcher()
+    searcher.use_index = False
+    assert len(list(search_files(root, searcher=searcher))) == 20  # llena la caché
+    searcher.use_index = True
+    # Borrado antes de vigilar: la caché conserva la fila del archivo más reciente
+    os.remove(os.path.join(root, 'f19.txt'))
+    index_folder(root, searcher=searcher)
+    searcher.watcher.watch(root)
+    try:
+        deadline = time.time() + 10
+        while not searcher.watcher.cache_synced(root) and time.time() < deadline:
+            time.sleep(0.05)
+        assert searcher.watcher.cache_synced(root)
+        
+        def no_walk(path):
+            raise AssertionError("la búsqueda recorrió el disco")
+        monkeypatch.setattr(searcher, '_scan_tree', no_walk)
+        top = [r.name for r in search_files(root, searcher=searcher, top_k=3, order='recientes')]
+        assert top == ['f18.txt', 'f17.txt', 'f16.txt']
+        top = [r.name for r in search_files(root, searcher=searcher, top_k=2, order='grandes')]
+        assert top == ['f18.txt', 'f17.txt']
+    finally:
+        searcher.watcher.stop()